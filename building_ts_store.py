@@ -0,0 +1,232 @@
+# this script contains the out-of-core store of the building heat demand time series: instead of one CSV file, the
+# time series are written batch by batch of buildings to a NPY file (memory-mapped, one contiguous column per building)
+# in the case study folder, with a manifest of the columns, the seed and a hash of the building data. The store is read lazily, only the columns that are
+# accessed are loaded into memory, so the time series of city-scale case studies do not have to fit into the RAM.
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+
+MANIFEST_FILE = 'manifest.json'
+DATA_FILE = 'Building_TS.npy'
+SUM_FILE = 'Building_TS_sum.npy'
+YEARLY_FILE = 'Building_TS_yearly.npy'
+
+
+def get_store_path(case_study_name: str, config: dict) -> str:
+    """Return the folder of the building time series store of a case study.
+
+    :param case_study_name: name of the case study
+    :type case_study_name: str
+    :param config: configuration dictionary
+    :type config: dict
+    :return: path of the store folder
+    :rtype: str
+    """
+
+    return os.path.join(case_study_name, config['building_data']['building_TS_store'])
+
+
+def _write_manifest(path: str, manifest: dict):
+    # write to a temporary file and rename it, so that a reader never sees a partially written manifest
+    tmp_path = os.path.join(path, MANIFEST_FILE + '.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+
+
+def get_file_hash(path: str) -> str:
+    """Return a hash of the content of a file, e.g. of the building data the time series are generated for.
+
+    :param path: path of the file
+    :type path: str
+    :return: hex digest of the hash
+    :rtype: str
+    """
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+
+def create_store(path: str, num_hours: int, columns: list, seed: int = None, buildings_hash: str = None) -> np.memmap:
+    """Create an empty store for the time series of the given buildings. The manifest is marked as incomplete until
+    finalize_store is called.
+
+    :param path: folder of the store
+    :type path: str
+    :param num_hours: number of time steps
+    :type num_hours: int
+    :param columns: names of the building columns, e.g. building_0, building_1, ...
+    :type columns: list
+    :param seed: master seed of the time series, stored in the manifest, defaults to None
+    :type seed: int, optional
+    :param buildings_hash: hash of the building data (see get_file_hash), stored in the manifest, defaults to None
+    :type buildings_hash: str, optional
+    :return: memory-mapped array (time steps x buildings, column-major) to write the time series in Wh to
+    :rtype: np.memmap
+    """
+
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    _write_manifest(path, {'columns': list(columns), 'num_hours': num_hours, 'dtype': 'uint32', 'unit': 'Wh',
+                           'data_file': DATA_FILE, 'sum_file': SUM_FILE, 'yearly_file': YEARLY_FILE, 'seed': seed, 'buildings_hash': buildings_hash,
+                           'batches': [], 'complete': False})
+
+    return np.lib.format.open_memmap(os.path.join(path, DATA_FILE), mode='w+', dtype=np.uint32, shape=(num_hours, len(columns)), fortran_order=True)
+
+
+def write_batch(path: str, ar_store: np.memmap, start: int, building_HD_TS: np.ndarray):
+    """Write the time series of a batch of buildings to the store and record the batch in the manifest.
+
+    :param path: folder of the store
+    :type path: str
+    :param ar_store: memory-mapped array of the store (see create_store)
+    :type ar_store: np.memmap
+    :param start: column of the first building of the batch
+    :type start: int
+    :param building_HD_TS: numpy array (time steps x buildings of the batch) with the heating demand in kW
+    :type building_HD_TS: np.ndarray
+    """
+
+    # convert to Wh and cast to uint32 as the CSV file
+    ar_store[:, start:start + building_HD_TS.shape[1]] = (building_HD_TS * 1e3).astype(np.uint32)
+    ar_store.flush()
+
+    with open(os.path.join(path, MANIFEST_FILE), 'r') as file:
+        manifest = json.load(file)
+    manifest['batches'].append([start, start + building_HD_TS.shape[1]])
+    _write_manifest(path, manifest)
+
+
+def finalize_store(path: str, ar_store: np.memmap, ar_yearly_TS: np.ndarray) -> 'BuildingTSStore':
+    """Write the sum over all buildings per time step and the yearly sum per building and mark the store as complete.
+
+    :param path: folder of the store
+    :type path: str
+    :param ar_store: memory-mapped array of the store (see create_store)
+    :type ar_store: np.memmap
+    :param ar_yearly_TS: numpy array with the sum of the time series of every building in Wh
+    :type ar_yearly_TS: np.ndarray
+    :return: the store opened for reading
+    :rtype: BuildingTSStore
+    """
+
+    ar_sum = np.zeros(ar_store.shape[0], dtype=np.uint64)
+    for start in range(0, ar_store.shape[1], 1000):
+        ar_sum += ar_store[:, start:start + 1000].sum(axis=1, dtype=np.uint64)
+    np.save(os.path.join(path, SUM_FILE), ar_sum)
+    np.save(os.path.join(path, YEARLY_FILE), np.asarray(ar_yearly_TS))
+    ar_store.flush()
+
+    with open(os.path.join(path, MANIFEST_FILE), 'r') as file:
+        manifest = json.load(file)
+    manifest['complete'] = True
+    manifest['created'] = time.time()
+    _write_manifest(path, manifest)
+
+    return BuildingTSStore(path)
+
+
+def read_store(path: str, buildings_hash: str = None, seed: int = None) -> 'BuildingTSStore':
+    """Open a store for lazy reading.
+
+    :param path: folder of the store
+    :type path: str
+    :param buildings_hash: hash of the current building data (see get_file_hash), a store generated for other building
+        data is not read. Defaults to None, which does not check the building data
+    :type buildings_hash: str, optional
+    :param seed: master seed the time series must be generated with, defaults to None, which does not check the seed
+    :type seed: int, optional
+    :return: the store, None if it does not exist, is incomplete (e.g. the generation was aborted) or does not match
+        the building data or the seed
+    :rtype: BuildingTSStore
+    """
+
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r') as file:
+        manifest = json.load(file)
+    if not manifest['complete']:
+        return None
+    if buildings_hash is not None and manifest.get('buildings_hash') != buildings_hash:
+        return None
+    if seed is not None and manifest.get('seed') != seed:
+        return None
+
+    return BuildingTSStore(path)
+
+
+class BuildingTSStore:
+    """Lazy reader of a building time series store. It is indexed like the dataframe of the CSV file: 'hour', 'sum' and
+    the building columns (a name or a list of names) return series or dataframes in Wh, only the accessed columns are
+    read from the memory-mapped file.
+    """
+
+    def __init__(self, path: str):
+        """Constructor method for the BuildingTSStore class.
+
+        :param path: folder of the store
+        :type path: str
+        """
+
+        with open(os.path.join(path, MANIFEST_FILE), 'r') as file:
+            self.manifest = json.load(file)
+        self.path = path
+        self.building_columns = self.manifest['columns']
+        self.columns = ['hour'] + self.building_columns + ['sum']
+        self._position = {c: i for i, c in enumerate(self.building_columns)}
+        self._data = np.load(os.path.join(path, self.manifest['data_file']), mmap_mode='r')
+        self._hours = np.arange(1, self.manifest['num_hours'] + 1, dtype=np.uint32)
+
+    def __len__(self) -> int:
+        return self.manifest['num_hours']
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._position or column in ('hour', 'sum')
+
+    def _column(self, column: str) -> np.ndarray:
+        if column == 'hour':
+            return self._hours
+        if column == 'sum':
+            return np.load(os.path.join(self.path, self.manifest['sum_file']))
+        return np.asarray(self._data[:, self._position[column]])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return pd.Series(self._column(key), name=key)
+
+        # a list of building columns is read at once
+        key = list(key)
+        if all(c in self._position for c in key):
+            values = self._data[:, [self._position[c] for c in key]]
+            return pd.DataFrame(values, columns=key)
+        return pd.DataFrame({c: self._column(c) for c in key})
+
+    def get_yearly_sum(self) -> np.ndarray:
+        """Return the sum of the time series of every building (in the order of the building columns) in Wh.
+
+        :return: numpy array with the yearly sums
+        :rtype: np.ndarray
+        """
+
+        return np.load(os.path.join(self.path, self.manifest['yearly_file']))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Load the complete store into a dataframe in the layout of the CSV file.
+
+        :return: dataframe with the hour, the building columns and the sum
+        :rtype: pd.DataFrame
+        """
+
+        return self[self.columns]
@@ -0,0 +1,317 @@
+# this script contains the cache of built models and solutions: the model of a scenario is written as MPS file together
+# with the symbol map of its columns, keyed on the content of the input files and the configuration options that change
+# the model. An unchanged scenario (e.g. solved again with another MIP gap or solver) is then solved from the MPS file
+# instead of building the constraints again. If also the solver settings are unchanged, the exported results of the
+# previous run are restored without solving.
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import types
+import weakref
+
+from pyomo.environ import Var
+
+
+# configuration options that change the built model, the solver options (solver, mip_gap, threads) do not
+MODEL_CONFIG_KEYS = ['tighten_bounds', 'eliminate_equalities']
+# configuration options that change the solution
+SOLUTION_CONFIG_KEYS = MODEL_CONFIG_KEYS + ['solver', 'mip_gap', 'backend', 'warm_start', 'benders', 'lazy_constraints']
+SOLUTION_DIR = 'solutions'
+SUMMARY_FILE = 'summary.json'
+MODEL_FILE = 'model.mps'
+SYMBOL_MAP_FILE = 'symbol_map.json'
+META_FILE = 'meta.json'
+
+
+def get_cache_key(input_files: list, config: dict, code_files: list = None, config_keys: list = None) -> str:
+    """Return the cache key of a model: a hash of the content of the input files, the model options of the
+    configuration and the source files that build the model.
+
+    :param input_files: paths of the input files (see data.get_model_input_files)
+    :type input_files: list
+    :param config: configuration dictionary
+    :type config: dict
+    :param code_files: paths of the source files that build the model, defaults to None
+    :type code_files: list, optional
+    :param config_keys: configuration options in the key, defaults to MODEL_CONFIG_KEYS (SOLUTION_CONFIG_KEYS for solutions)
+    :type config_keys: list, optional
+    :return: hex digest of the hash
+    :rtype: str
+    """
+
+    sha = hashlib.sha256()
+    for path in list(input_files) + list(code_files or []):
+        sha.update(os.path.basename(path).encode())
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                sha.update(chunk)
+    sha.update(json.dumps({k: config.get(k) for k in (config_keys or MODEL_CONFIG_KEYS)}, sort_keys=True).encode())
+
+    return sha.hexdigest()
+
+
+def get_code_files(module: types.ModuleType) -> list:
+    """Return the source files of a module and of all modules of the repository it uses, directly or through other
+    modules of the repository (e.g. model -> clustering -> building_ts_store). The modules are found through the
+    imported modules, functions and classes of the module, independent of the modules imported by the entry point.
+
+    :param module: the module, e.g. model
+    :type module: types.ModuleType
+    :return: sorted paths of the source files
+    :rtype: list
+    """
+
+    folder = os.path.dirname(os.path.abspath(module.__file__))
+    code_files = set()
+    modules = [module]
+    while modules:
+        mod = modules.pop()
+        path = os.path.abspath(mod.__file__)
+        if path in code_files:
+            continue
+        code_files.add(path)
+        for obj in vars(mod).values():
+            if isinstance(obj, types.ModuleType):
+                dep = obj
+            elif isinstance(getattr(obj, '__module__', None), str):
+                dep = sys.modules.get(obj.__module__)
+            else:
+                continue
+            if getattr(dep, '__file__', None) is not None and os.path.dirname(os.path.abspath(dep.__file__)) == folder:
+                modules.append(dep)
+
+    return sorted(code_files)
+
+
+def lookup_model(key: str, config: dict) -> str:
+    """Return the folder of a cached model and mark it as used (for the LRU eviction).
+
+    :param key: cache key (see get_cache_key)
+    :type key: str
+    :param config: configuration dictionary
+    :type config: dict
+    :return: folder of the cached model, None if the model is not cached
+    :rtype: str
+    """
+
+    entry = os.path.join(config['model_cache']['cache_dir'], key)
+    if not all(os.path.exists(os.path.join(entry, f)) for f in (MODEL_FILE, SYMBOL_MAP_FILE, META_FILE)):
+        return None
+
+    os.utime(os.path.join(entry, META_FILE))
+    print("Info: Model found in the cache: " + entry)
+
+    return entry
+
+
+def store_model(dh_model, key: str, config: dict) -> str:
+    """Write a built model as MPS file with the symbol map of its columns (column name -> variable name and index) to
+    the cache and evict the least recently used models above the size limit.
+
+    :param dh_model: model with built constraints
+    :type dh_model: HeatNetworkModel
+    :param key: cache key (see get_cache_key)
+    :type key: str
+    :param config: configuration dictionary
+    :type config: dict
+    :return: folder of the cached model
+    :rtype: str
+    """
+
+    start = time.time()
+    entry = os.path.join(config['model_cache']['cache_dir'], key)
+    tmp_entry = entry + '.' + str(os.getpid()) + '.tmp'
+    os.makedirs(tmp_entry, exist_ok=True)
+
+    _, smap_id = dh_model.write(os.path.join(tmp_entry, MODEL_FILE), format='mps', io_options={'symbolic_solver_labels': False})
+    symbol_map = {}
+    for label, obj in dh_model.solutions.symbol_map[smap_id].bySymbol.items():
+        if isinstance(obj, weakref.ref):
+            obj = obj()
+        if obj is None or obj.ctype is not Var:
+            continue
+        symbol_map[label] = [obj.parent_component().name, obj.index()]
+
+    with open(os.path.join(tmp_entry, SYMBOL_MAP_FILE), 'w') as file:
+        # numpy integers of the index sets are written as plain numbers
+        json.dump(symbol_map, file, default=lambda o: o.item())
+    with open(os.path.join(tmp_entry, META_FILE), 'w') as file:
+        json.dump({'model': dh_model.name, 'created': time.time()}, file)
+
+    # the folder is renamed at once, so that concurrent runs never read an incomplete entry
+    if os.path.exists(entry):
+        shutil.rmtree(tmp_entry)
+    else:
+        os.replace(tmp_entry, entry)
+
+    print("Done: write model to the cache")
+    print("Time: ", time.time() - start)
+
+    evict_models(config['model_cache']['cache_dir'], config)
+
+    return entry
+
+
+def read_symbol_map(entry: str) -> dict:
+    """Read the symbol map of a cached model.
+
+    :param entry: folder of the cached model
+    :type entry: str
+    :return: dictionary column name -> (variable name, index)
+    :rtype: dict
+    """
+
+    with open(os.path.join(entry, SYMBOL_MAP_FILE), 'r') as file:
+        symbol_map = json.load(file)
+
+    # the indices of multidimensional variables are tuples in the model
+    return {label: (name, tuple(idx) if isinstance(idx, list) else idx) for label, (name, idx) in symbol_map.items()}
+
+
+def evict_models(cache_dir: str, config: dict):
+    """Remove the least recently used entries (models or solutions) from a cache folder until its size is below
+    max_size_mb.
+
+    :param cache_dir: folder of the cached models or solutions
+    :type cache_dir: str
+    :param config: configuration dictionary
+    :type config: dict
+    """
+
+    max_size = config['model_cache']['max_size_mb'] * 1024 ** 2
+    if not os.path.exists(cache_dir):
+        return
+
+    entries = []
+    for key in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, key)
+        if key.endswith('.tmp') or not os.path.exists(os.path.join(entry, META_FILE)):
+            continue
+        size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(entry) for f in files)
+        entries.append((os.path.getmtime(os.path.join(entry, META_FILE)), size, entry))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total_size <= max_size:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total_size -= size
+        print("Info: Removed entry from the cache (size limit): " + entry)
+
+
+def lookup_solution(key: str, config: dict) -> str:
+    """Return the folder of a cached solution and mark it as used (for the LRU eviction).
+
+    :param key: cache key with the solver settings (see get_cache_key with SOLUTION_CONFIG_KEYS)
+    :type key: str
+    :param config: configuration dictionary
+    :type config: dict
+    :return: folder of the cached solution, None if the solution is not cached
+    :rtype: str
+    """
+
+    entry = os.path.join(config['model_cache']['cache_dir'], SOLUTION_DIR, key)
+    if not all(os.path.exists(os.path.join(entry, f)) for f in (SUMMARY_FILE, META_FILE)):
+        return None
+
+    os.utime(os.path.join(entry, META_FILE))
+
+    return entry
+
+
+def store_solution(key: str, scenario_folder: str, summary: dict, config: dict) -> str:
+    """Copy the exported results (output, expost and report folder) of a solved scenario to the cache.
+
+    :param key: cache key with the solver settings (see get_cache_key with SOLUTION_CONFIG_KEYS)
+    :type key: str
+    :param scenario_folder: folder of the scenario
+    :type scenario_folder: str
+    :param summary: summary of the run (see model.run_model)
+    :type summary: dict
+    :param config: configuration dictionary
+    :type config: dict
+    :return: folder of the cached solution
+    :rtype: str
+    """
+
+    solution_dir = os.path.join(config['model_cache']['cache_dir'], SOLUTION_DIR)
+    entry = os.path.join(solution_dir, key)
+    tmp_entry = entry + '.' + str(os.getpid()) + '.tmp'
+    if os.path.exists(tmp_entry):
+        shutil.rmtree(tmp_entry)
+    os.makedirs(tmp_entry)
+
+    for folder in (config['output_dir'], config['expost_dir'], config['report_dir']):
+        if os.path.exists(os.path.join(scenario_folder, folder)):
+            shutil.copytree(os.path.join(scenario_folder, folder), os.path.join(tmp_entry, folder))
+
+    with open(os.path.join(tmp_entry, SUMMARY_FILE), 'w') as file:
+        json.dump(summary, file, default=float)
+    with open(os.path.join(tmp_entry, META_FILE), 'w') as file:
+        json.dump({'scenario': scenario_folder, 'created': time.time()}, file)
+
+    if os.path.exists(entry):
+        shutil.rmtree(entry)
+    os.replace(tmp_entry, entry)
+
+    evict_models(solution_dir, config)
+
+    return entry
+
+
+def restore_solution(entry: str, scenario_folder: str, config: dict) -> dict:
+    """Copy the cached results (output, expost and report folder) back to the scenario folder.
+
+    :param entry: folder of the cached solution (see lookup_solution)
+    :type entry: str
+    :param scenario_folder: folder of the scenario
+    :type scenario_folder: str
+    :param config: configuration dictionary
+    :type config: dict
+    :return: summary of the cached run
+    :rtype: dict
+    """
+
+    for folder in (config['output_dir'], config['expost_dir'], config['report_dir']):
+        if os.path.exists(os.path.join(entry, folder)):
+            shutil.copytree(os.path.join(entry, folder), os.path.join(scenario_folder, folder), dirs_exist_ok=True)
+            print("Restored: ", folder)
+
+    with open(os.path.join(entry, SUMMARY_FILE), 'r') as file:
+        return json.load(file)
+
+
+def clear_cache(config: dict, part: str = 'all'):
+    """Invalidate the cache by removing the cached models, the cached solutions or both.
+
+    :param config: configuration dictionary
+    :type config: dict
+    :param part: 'models', 'solutions' or 'all', defaults to 'all'
+    :type part: str, optional
+    """
+
+    cache_dir = config['model_cache']['cache_dir']
+    if not os.path.exists(cache_dir):
+        return
+
+    for key in os.listdir(cache_dir):
+        is_solutions = key == SOLUTION_DIR
+        if part == 'all' or (part == 'solutions') == is_solutions:
+            shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+
+    print("Done: cleared the " + ('cache' if part == 'all' else 'cached ' + part) + " in " + cache_dir)
+
+
+if __name__ == "__main__":
+    import data
+
+    parser = argparse.ArgumentParser(description="Invalidate the cache of built models and solutions")
+    parser.add_argument('--clear', choices=['models', 'solutions', 'all'], default='all', help="part of the cache to remove")
+    args = parser.parse_args()
+
+    clear_cache(data.load_config(), args.clear)
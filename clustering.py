@@ -14,6 +14,7 @@ from pyproj import CRS
 from sklearn.cluster import KMeans
 import time
 import data
+import building_ts_store
 
 def read_geo_data_from_disk(case_study_name: str, config: dict) -> gpd.GeoDataFrame:
     """Read the building data for a given casestudy from the disk and return a geodataframe.
@@ -101,16 +102,28 @@ def read_wasteHeatProfiles_from_disk(gdf_heat_gen: gpd.GeoDataFrame, case_study_
             cprint("Done: load waste heat profiles", 'green')
             return df_waste_heat_profiles
 
-def read_building_TS_from_disk(case_study_name: str, config: dict) -> pd.DataFrame:
+def read_building_TS_from_disk(case_study_name: str, config: dict) -> pd.DataFrame | building_ts_store.BuildingTSStore:
     """Read the building heat demand time series for a given casestudy from the disk and return a dataframe.
 
+    If the time series were generated to the out-of-core store (store: 'npy' in the config), the store is returned
+    instead. It is read lazily and indexed like the dataframe, only the columns of the accessed buildings are loaded.
+    A store that was generated for other building data (or with another random_seed than set in the config) is not
+    read.
+
     :param case_study_name: name of the case study
     :type case_study_name: str
     :param config: configuration dictionary
     :type config: dict
-    :return: dataframe with building heat demand time series of the buildings
-    :rtype: pd.DataFrame
+    :return: dataframe (or building_ts_store.BuildingTSStore) with building heat demand time series of the buildings
+    :rtype: pd.DataFrame | building_ts_store.BuildingTSStore
     """
+    if config['time_series']['store'] == 'npy':
+        buildings_hash = building_ts_store.get_file_hash(os.path.join(case_study_name, config['building_data']['buildings_gdf']))
+        store = building_ts_store.read_store(building_ts_store.get_store_path(case_study_name, config), buildings_hash, config.get('random_seed'))
+        if store is not None:
+            return store
+        cprint("Warning: no complete building time series store of the current building data and random_seed found, reading the CSV file", 'yellow')
+
     path_building_TS = os.path.join(case_study_name, config['building_data']['building_TS'])
     df_builidng_TS = pd.read_csv(path_building_TS, sep=',')
 
@@ -420,6 +433,107 @@ def add_hot_water_demand(building_cluster: gpd.GeoDataFrame, cluster_TS: pd.Data
     return cluster_TS
 
 
+def aggregate_typical_days(input_dict: dict, num_typical_days: int) -> dict:
+    """Aggregate the heat demand and waste heat profiles of the optimisation model input to representative days.
+
+    The daily profiles of all heat nodes and waste heat units are normalised and clustered with k-means. Every cluster
+    is represented by its medoid, i.e. the real day closest to the cluster centre, and weighted with the number of days
+    in the cluster. The day with the highest hourly demand is kept as a representative day of its own, so the sizing
+    of the network and the generation units sees the peak load. The returned input dictionary holds the profiles of the
+    representative days (hours 1 to 24 * num_typical_days) and a 'time_structure' entry with the weights of the periods
+    and the assignment of every day of the year to its representative period.
+
+    :param input_dict: input data of the optimisation model from disk (with renamed columns)
+    :type input_dict: dict
+    :param num_typical_days: number of representative days
+    :type num_typical_days: int
+    :return: input data of the optimisation model on the representative days, the unchanged input data if the profiles can not be aggregated
+    :rtype: dict
+    """
+
+    hours_per_period = 24
+
+    cprint("Start: aggregate time series to " + str(num_typical_days) + " typical days")
+    start = time.time()
+
+    df_heat_demand = input_dict['heat_demand'].sort_values('hour').reset_index(drop=True)
+    df_waste_heat_prof = input_dict['waste_heat_prof']
+    num_hours = len(df_heat_demand)
+    num_days = num_hours // hours_per_period
+
+    if num_hours % hours_per_period != 0 or num_typical_days >= num_days:
+        cprint("Warning: heat demand with " + str(num_hours) + " hours can not be aggregated to " + str(num_typical_days) + " typical days, the full time series is used", 'red')
+        return input_dict
+    if df_waste_heat_prof is not None and len(df_waste_heat_prof) != num_hours:
+        cprint("Warning: waste heat profiles and heat demand have a different length, the full time series is used", 'red')
+        return input_dict
+
+    # hourly profiles as (days, hours per day, profiles), the waste heat profiles follow the demand hour by hour
+    demand_columns = [c for c in df_heat_demand.columns if c != 'hour']
+    ar_demand = df_heat_demand[demand_columns].to_numpy(dtype=float).reshape(num_days, hours_per_period, -1)
+    ar_profiles = ar_demand
+    if df_waste_heat_prof is not None:
+        df_waste_heat_prof = df_waste_heat_prof.sort_values('hour').reset_index(drop=True)
+        wh_columns = [c for c in df_waste_heat_prof.columns if c != 'hour']
+        ar_waste_heat = df_waste_heat_prof[wh_columns].to_numpy(dtype=float).reshape(num_days, hours_per_period, -1)
+        ar_profiles = np.concatenate([ar_demand, ar_waste_heat], axis=2)
+
+    # normalise every profile to its maximum so that all nodes and units have the same influence on the clustering
+    ar_max = ar_profiles.max(axis=(0, 1))
+    ar_max[ar_max == 0] = 1
+    ar_features = (ar_profiles / ar_max).reshape(num_days, -1)
+
+    # the day with the highest hourly demand is kept as an extreme period, the other days are clustered
+    peak_days = []
+    if num_typical_days > 1:
+        peak_days = [int(ar_demand.sum(axis=2).max(axis=1).argmax())]
+    cluster_days = np.setdiff1d(np.arange(num_days), peak_days)
+
+    kmeans = KMeans(n_clusters=num_typical_days - len(peak_days), n_init=10, random_state=0)
+    labels = kmeans.fit_predict(ar_features[cluster_days])
+
+    representative_days = list(peak_days)
+    day_cluster = np.empty(num_days, dtype=int)
+    day_cluster[peak_days] = -1
+    day_cluster[cluster_days] = labels
+    for c in range(kmeans.n_clusters):
+        members = cluster_days[labels == c]
+        distance = np.linalg.norm(ar_features[members] - kmeans.cluster_centers_[c], axis=1)
+        representative_days.append(int(members[distance.argmin()]))
+
+    # order the representative periods chronologically and map every day of the year to its period
+    order = np.argsort(representative_days)
+    representative_days = np.array(representative_days)[order]
+    period_of_cluster = np.empty(len(order), dtype=int)
+    period_of_cluster[order] = np.arange(len(order))
+    period_of_day = period_of_cluster[np.where(day_cluster == -1, 0, day_cluster + len(peak_days))]
+    period_weights = np.bincount(period_of_day, minlength=num_typical_days).astype(float)
+
+    # profiles of the representative days with a new hourly index
+    new_hours = np.arange(1, num_typical_days * hours_per_period + 1)
+    df_heat_demand_agg = pd.DataFrame(ar_demand[representative_days].reshape(-1, len(demand_columns)), columns=demand_columns)
+    df_heat_demand_agg.insert(0, 'hour', new_hours)
+
+    df_waste_heat_prof_agg = None
+    if df_waste_heat_prof is not None:
+        df_waste_heat_prof_agg = pd.DataFrame(ar_waste_heat[representative_days].reshape(-1, len(wh_columns)), columns=wh_columns)
+        df_waste_heat_prof_agg.insert(0, 'hour', new_hours)
+
+    input_dict_agg = dict(input_dict)
+    input_dict_agg['heat_demand'] = df_heat_demand_agg
+    input_dict_agg['waste_heat_prof'] = df_waste_heat_prof_agg
+    input_dict_agg['time_structure'] = {
+        'hours_per_period': hours_per_period,
+        'period_weights': period_weights,
+        'period_of_day': period_of_day,
+        'representative_days': representative_days
+    }
+
+    cprint("Done: aggregate time series to typical days (" + str(round(time.time() - start, 2)) + " s)", 'green')
+
+    return input_dict_agg
+
+
 def perform_complete_clustering(case_study_name: str, scenario_name: str) -> None:
     """Perform the complete clustering process and save the data for the optimisation model.
 
@@ -10,6 +10,42 @@ from termcolor import cprint
 
 
 
+def get_model_data_path(casestudy: str, scenario: str, config: dict) -> str:
+    """returns the folder of the input data of the optimization model of a scenario.
+
+    :param casestudy: name of the case study
+    :type casestudy: str
+    :param scenario: name of the scenario
+    :type scenario: str
+    :param config: configuration dictionary
+    :type config: dict
+    :return: path of the folder
+    :rtype: str
+    """
+
+    return os.path.join(casestudy, config['scenario_dir'], scenario, config['data_dir'], config['model_data']['root_dir'])
+
+
+def get_model_input_files(casestudy: str, scenario: str, config: dict) -> list:
+    """returns the paths of the input files of the optimization model that are read by load_data_from_disk, files
+    that do not exist are left out.
+
+    :param casestudy: name of the case study
+    :type casestudy: str
+    :param scenario: name of the scenario
+    :type scenario: str
+    :param config: configuration dictionary
+    :type config: dict
+    :return: list of file paths
+    :rtype: list
+    """
+
+    data_path = get_model_data_path(casestudy, scenario, config)
+    file_keys = ['heat_dem', 'heat_gen_units', 'heat_network', 'heat_nodes', 'wh_profiles', 'cost_parameter']
+
+    return [os.path.join(data_path, config['model_data'][k]) for k in file_keys if os.path.exists(os.path.join(data_path, config['model_data'][k]))]
+
+
 def load_data_from_disk(casestudy: str, scenario: str, config: dict) -> dict:
     """loads the data required for the optimization model from disk.
 
@@ -24,11 +60,7 @@ def load_data_from_disk(casestudy: str, scenario: str, config: dict) -> dict:
     """
 
 
-    scenario_dir = config['scenario_dir']
-    data_dir = config['data_dir']
-    heat_root_dir = config['model_data']['root_dir']
-
-    data_path = os.path.join(casestudy, scenario_dir, scenario, data_dir, heat_root_dir)
+    data_path = get_model_data_path(casestudy, scenario, config)
 
     print("Loading data from: ", data_path)
 
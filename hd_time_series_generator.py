@@ -2,8 +2,11 @@ import numpy as np
 import pandas as pd
 from termcolor import cprint
 import os
-from numba import jit
+import time
+import numba
+from numba import jit, njit, prange
 import data
+import building_ts_store
 import geopandas as gpd
 from data import load_temp_data
 
@@ -52,7 +55,7 @@ def write_hdts_to_disk(df_heating: pd. DataFrame, casestudy: str, config: dict):
 
 
 ## new functions for the fast implementation
-def fast_TS_generator(case_study_name: str, save_to_disk = False) -> pd.DataFrame: 
+def fast_TS_generator(case_study_name: str, save_to_disk = False, seed: int = None) -> pd.DataFrame | building_ts_store.BuildingTSStore:
     """Performs a complete run of the time series generator for a given case study.
 
     This function loads the necessary data, processes it, and generates time series data for buildings.
@@ -68,12 +71,21 @@ def fast_TS_generator(case_study_name: str, save_to_disk = False) -> pd.DataFram
     8. Aggregate dwelling-level time series into building-level time series.
     9. Save the resulting time series to disk as a CSV file.
 
+    With store: 'npy' (time_series in the config), the buildings are generated in batches that are always written to
+    the building time series store of the case study (see generate_building_ts_store), the store is returned instead
+    of the dataframe.
+
     :param case_study_name: name of the case study
     :type case_study_name: str
-    :param save_to_disk: set to true if you want to write the results into a csv. file, defaults to False
+    :param save_to_disk: set to true if you want to write the results into a csv. file, defaults to False. Not used
+        with store: 'npy', the store is always written
     :type save_to_disk: bool, optional
-    :return: a pandas dataframe with the generated time series data in hourly resolution for all buildings
-    :rtype: pd.DataFrame
+    :param seed: master seed of the random numbers, the same seed gives the same time series. Defaults to None, which
+        uses random_seed of the config or, if it is not set, a new seed that is printed
+    :type seed: int, optional
+    :return: a pandas dataframe with the generated time series data in hourly resolution for all buildings, with
+        store: 'npy' the store opened for lazy reading, which is indexed like the dataframe
+    :rtype: pd.DataFrame | building_ts_store.BuildingTSStore
     """
 
     print("Start processing for case study: ", case_study_name)
@@ -108,12 +120,33 @@ def fast_TS_generator(case_study_name: str, save_to_disk = False) -> pd.DataFram
     # convert the dataframe to individual arrays; from building data to dwelling data
     ar_building_id, ar_num_of_dwellings, ar_GeneralisedThermCond, ar_GeneralisedThermCap, ar_MaxDemand, ar_temp_setpoint, ar_temp_setback, ar_solar_gain_scalor, ar_internal_gain_scalor = convert_buildings_to_dwellings(gdf_buildings)
 
+    # master seed of the random numbers of all dwellings
+    if seed is None:
+        seed = config.get('random_seed')
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+        print("Info: random seed of the time series (set random_seed in the config to reproduce them): ", seed)
+
     cprint(f"Start generating time series for: {len(ar_building_id)} dwellings. Estimated computational time is: {round(len(ar_building_id)/378,0)} seconds.")
-    dwelling_HD_TS = fast_generate_building_ts(ar_building_id, ar_GeneralisedThermCond, ar_GeneralisedThermCap, ar_MaxDemand, ar_temp_setpoint, ar_temp_setback, ar_Tout, ar_WDWE, ar_transition_matrix_WD, ar_transition_matrix_WE, ar_solar_gain_profile, ar_solar_gain_scalor, ar_internal_gain_scalor)
+
+    # out-of-core mode: the buildings are generated in batches and written to the store, which is returned for lazy reading
+    if config['time_series']['store'] == 'npy':
+        if not save_to_disk:
+            print("Info: the time series are written to the building time series store (store: 'npy' in the config)")
+        store = generate_building_ts_store(case_study_name, config, ar_building_id, ar_GeneralisedThermCond, ar_GeneralisedThermCap, ar_MaxDemand, ar_temp_setpoint, ar_temp_setback, ar_Tout, ar_WDWE, ar_transition_matrix_WD, ar_transition_matrix_WE, ar_solar_gain_profile, ar_solar_gain_scalor, ar_internal_gain_scalor, seed=seed)
+        cprint("Done: generate time series", 'green')
+
+        # check the results
+        check_yearly_demand_deviation(gdf_buildings, ar_yearly_TS=store.get_yearly_sum())
+
+        return store
+
+    # the dwellings are generated in chunks and summed up per building, so only one chunk of dwelling time series is kept in memory
+    building_HD_TS = generate_building_ts_chunked(ar_building_id, ar_GeneralisedThermCond, ar_GeneralisedThermCap, ar_MaxDemand, ar_temp_setpoint, ar_temp_setback, ar_Tout, ar_WDWE, ar_transition_matrix_WD, ar_transition_matrix_WE, ar_solar_gain_profile, ar_solar_gain_scalor, ar_internal_gain_scalor, seed=seed, chunk_size=config['time_series']['chunk_size'])
     cprint("Done: generate time series", 'green')
 
-    # convert the dwelling time series to building time series
-    df_building_HD_TS  = convert_dwelling_TS_to_building_TS(dwelling_HD_TS, ar_building_id)
+    # convert the building time series to a dataframe
+    df_building_HD_TS = convert_building_TS_to_dataframe(building_HD_TS)
 
     # check the results
     check_yearly_demand_deviation(gdf_buildings, df_building_HD_TS)
@@ -153,16 +186,21 @@ def calc_WD_WE_sequence(df_temperature: pd.DataFrame) -> np.ndarray:
    
     return ar_WEWDseq
 
-def check_yearly_demand_deviation(gdf_buildings: gpd.GeoDataFrame, df_heat_demand: pd.DataFrame):
+def check_yearly_demand_deviation(gdf_buildings: gpd.GeoDataFrame, df_heat_demand: pd.DataFrame = None, ar_yearly_TS: np.ndarray = None):
     """Check deviation of the yearly demand of the buildings from the sum of the heating demand time series.
 
     :param gdf_buildings: geodataframe with the building data
     :type gdf_buildings: gpd.GeoDataFrame
-    :param df_heat_demand: dataframe with the heating demand time series
-    :type df_heat_demand: pd.DataFrame
+    :param df_heat_demand: dataframe with the heating demand time series, defaults to None
+    :type df_heat_demand: pd.DataFrame, optional
+    :param ar_yearly_TS: A numpy array with the sum of the time series of every building in Wh, used instead of df_heat_demand, defaults to None
+    :type ar_yearly_TS: np.ndarray, optional
     """
+    if ar_yearly_TS is None:
+        ar_yearly_TS = df_heat_demand.iloc[:, 1:].sum(axis=0).values
+
     # calculate the difference on building level
-    diff_abs = 1e3* gdf_buildings['YearlyDemand'] - df_heat_demand.iloc[:, 1:].sum(axis=0).values
+    diff_abs = 1e3* gdf_buildings['YearlyDemand'] - ar_yearly_TS
     diff_percent = diff_abs / (1e3 * gdf_buildings['YearlyDemand']) * 100
     diff_percent[gdf_buildings['YearlyDemand'] == 0] = 0
 
@@ -281,25 +319,176 @@ def convert_dwelling_TS_to_building_TS(dwelling_HD_TS: np.ndarray, ar_building_i
     # regroup the data by building id and sum the values
     df_dwelling_HD_TS = df_dwelling_HD_TS.groupby('building_id').sum()
 
-    # transpose the datatframe
-    df_dwelling_HD_TS = df_dwelling_HD_TS.T
+    # transpose the datatframe and convert it to the format of the building time series
+    return convert_building_TS_to_dataframe(df_dwelling_HD_TS.to_numpy().T)
 
-    # rename the columns 
-    df_dwelling_HD_TS.columns = ['building_' + str(i) for i in range(0, len(df_dwelling_HD_TS.columns) )]
+
+def convert_building_TS_to_dataframe(building_HD_TS: np.ndarray) -> pd.DataFrame:
+    """Convert the heating demand time series of the buildings to a pandas dataframe with an hour column and one column
+    per building (building_0, building_1, ... in the order of the building ids) in Wh.
+
+    :param building_HD_TS: numpy array (time steps x buildings) with the heating demand time series in kW
+    :type building_HD_TS: np.ndarray
+    :return: pandas dataframe with the heating demand time series for all buildings
+    :rtype: pd.DataFrame
+    """
+
+    # convert to Wh and cast to uint32 to save memory
+    df_building_HD_TS = pd.DataFrame((building_HD_TS * 1e3).astype('uint32'), columns=['building_' + str(i) for i in range(building_HD_TS.shape[1])])
 
     # add a column for the hour
-    df_dwelling_HD_TS.insert(0, 'hour', range(1, len(df_dwelling_HD_TS) + 1))
+    df_building_HD_TS.insert(0, 'hour', np.arange(1, len(df_building_HD_TS) + 1, dtype='uint32'))
+
+    return df_building_HD_TS
+
+
+def generate_building_ts_chunked(ar_building_id: np.ndarray, ar_GeneralisedThermCond: np.ndarray, ar_GeneralisedThermCap: np.ndarray, ar_MaxDemand: np.ndarray, ar_temp_setpoint: np.ndarray, ar_temp_setback: np.ndarray, ar_Tout: np.ndarray, ar_WDWE: np.ndarray, ar_transition_matrix_WD: np.ndarray, ar_transition_matrix_WE: np.ndarray, ar_solar_gain_profile: np.ndarray, scalor_solar_gain: np.ndarray, scalor_internal_gain: np.ndarray, seed: int = None, chunk_size: int = 10000, ar_dwelling_index: np.ndarray = None) -> np.ndarray:
+    """Generates the heating demand time series of all dwellings chunk by chunk and sums them up per building.
+
+    Every chunk of dwellings is generated by fast_generate_building_ts and added to a preallocated (time steps x buildings)
+    array, so the peak memory depends on the number of buildings and the chunk size instead of the number of dwellings.
+    With a seed, the result does not depend on the chunk size (every dwelling keeps its random stream).
+
+    The parameters are the same as for fast_generate_building_ts, in addition:
+
+    :param seed: master seed of the random numbers, defaults to None (global numpy random state)
+    :type seed: int, optional
+    :param chunk_size: number of dwellings per chunk, defaults to 10000
+    :type chunk_size: int, optional
+    :param ar_dwelling_index: A numpy array with the index of each dwelling in the case study, defaults to None (numbered from 0)
+    :type ar_dwelling_index: np.ndarray, optional
+    :return: A numpy array (time steps x buildings) with the heating demand time series of the buildings in the order of the building ids.
+    :rtype: np.ndarray
+    """
 
-    # Multiply all columns except the first one by 1e3 to convert to Wh
-    df_dwelling_HD_TS.iloc[:, 1:] = df_dwelling_HD_TS.iloc[:, 1:] * 1e3
+    # position of the building of every dwelling in the output array (buildings sorted by id as in convert_dwelling_TS_to_building_TS)
+    _, ar_building_pos = np.unique(ar_building_id, return_inverse=True)
+    building_HD_TS = np.zeros((len(ar_Tout), ar_building_pos.max() + 1 if len(ar_building_pos) > 0 else 0))
+    if ar_dwelling_index is None:
+        ar_dwelling_index = np.arange(len(ar_building_id))
 
-    # Cast the DataFrame to uint32 to save memory
-    df_dwelling_HD_TS_cast = df_dwelling_HD_TS.astype('uint32')
+    for start in range(0, len(ar_building_id), chunk_size):
+        chunk = slice(start, min(start + chunk_size, len(ar_building_id)))
+        dwelling_HD_TS = fast_generate_building_ts(ar_building_id[chunk], ar_GeneralisedThermCond[chunk], ar_GeneralisedThermCap[chunk], ar_MaxDemand[chunk], ar_temp_setpoint[chunk], ar_temp_setback[chunk], ar_Tout, ar_WDWE, ar_transition_matrix_WD, ar_transition_matrix_WE, ar_solar_gain_profile, scalor_solar_gain[chunk], scalor_internal_gain[chunk],
+                                                   seed=seed, ar_dwelling_index=ar_dwelling_index[chunk])
+        accumulate_dwelling_ts(dwelling_HD_TS, ar_building_pos[chunk], building_HD_TS)
 
-    return df_dwelling_HD_TS_cast
+        if len(ar_building_id) > chunk_size:
+            print(f"Info: generated {chunk.stop} of {len(ar_building_id)} dwellings")
+
+    return building_HD_TS
+
+
+def generate_building_ts_store(case_study_name: str, config: dict, ar_building_id: np.ndarray, ar_GeneralisedThermCond: np.ndarray, ar_GeneralisedThermCap: np.ndarray, ar_MaxDemand: np.ndarray, ar_temp_setpoint: np.ndarray, ar_temp_setback: np.ndarray, ar_Tout: np.ndarray, ar_WDWE: np.ndarray, ar_transition_matrix_WD: np.ndarray, ar_transition_matrix_WE: np.ndarray, ar_solar_gain_profile: np.ndarray, scalor_solar_gain: np.ndarray, scalor_internal_gain: np.ndarray, seed: int = None) -> building_ts_store.BuildingTSStore:
+    """Generates the heating demand time series of the buildings in batches and writes every batch to the building
+    time series store of the case study (see building_ts_store), so that only one batch is kept in memory.
+
+    The buildings are processed in batches of building_chunk_size (time_series in the config), the dwellings of a batch
+    in chunks of chunk_size. The dwellings keep their index in the case study, so with a seed the time series are the
+    same as without batches. The manifest of the store records the seed and a hash of the building data, so that a
+    store of other building data is not read (see clustering.read_building_TS_from_disk). The parameters are the same
+    as for fast_generate_building_ts, in addition:
+
+    :param case_study_name: name of the case study
+    :type case_study_name: str
+    :param config: configuration dictionary
+    :type config: dict
+    :param seed: master seed of the random numbers, defaults to None (global numpy random state)
+    :type seed: int, optional
+    :return: the store opened for lazy reading
+    :rtype: building_ts_store.BuildingTSStore
+    """
+
+    # position of the building of every dwelling in the store (buildings sorted by id as in convert_dwelling_TS_to_building_TS)
+    _, ar_building_pos = np.unique(ar_building_id, return_inverse=True)
+    num_buildings = ar_building_pos.max() + 1 if len(ar_building_pos) > 0 else 0
+    batch_size = config['time_series']['building_chunk_size']
+
+    path = building_ts_store.get_store_path(case_study_name, config)
+    buildings_hash = building_ts_store.get_file_hash(os.path.join(case_study_name, config['building_data']['buildings_gdf']))
+    ar_store = building_ts_store.create_store(path, len(ar_Tout), ['building_' + str(i) for i in range(num_buildings)], seed, buildings_hash)
+    ar_yearly_TS = np.zeros(num_buildings)
+
+    for start in range(0, num_buildings, batch_size):
+        stop = min(start + batch_size, num_buildings)
+        ar_dwelling_index = np.flatnonzero((ar_building_pos >= start) & (ar_building_pos < stop))
+
+        building_HD_TS = generate_building_ts_chunked(ar_building_id[ar_dwelling_index], ar_GeneralisedThermCond[ar_dwelling_index], ar_GeneralisedThermCap[ar_dwelling_index], ar_MaxDemand[ar_dwelling_index], ar_temp_setpoint[ar_dwelling_index], ar_temp_setback[ar_dwelling_index], ar_Tout, ar_WDWE, ar_transition_matrix_WD, ar_transition_matrix_WE, ar_solar_gain_profile, scalor_solar_gain[ar_dwelling_index], scalor_internal_gain[ar_dwelling_index],
+                                                      seed=seed, chunk_size=config['time_series']['chunk_size'], ar_dwelling_index=ar_dwelling_index)
+        building_ts_store.write_batch(path, ar_store, start, building_HD_TS)
+        ar_yearly_TS[start:stop] = ar_store[:, start:stop].sum(axis=0, dtype=np.uint64)
+
+        print(f"Info: wrote buildings {start} to {stop} of {num_buildings} to the store")
+
+    store = building_ts_store.finalize_store(path, ar_store, ar_yearly_TS)
+    cprint("Done: write time series to " + path, 'green')
+
+    return store
+
+
+def _synthetic_weather(num_hours: int, rng: np.random.Generator) -> tuple:
+    # outside temperature with a yearly cycle and a daily solar gain profile for the benchmark and the checks
+    hours = np.arange(num_hours)
+    ar_Tout = 8.0 - 10.0 * np.cos(2 * np.pi * hours / 8760) + rng.normal(0, 2, num_hours)
+    ar_solar_gain = np.clip(np.sin(2 * np.pi * (hours % 24 - 6) / 24), 0, None)
+    return ar_Tout, ar_solar_gain
+
+
+def check_chunk_invariance(num_dwellings: int = 100, num_buildings: int = 30, seed: int = 0, num_days: int = 365) -> bool:
+    """Checks that the building time series generated with a seed are bit-identical for chunks of one dwelling and one
+    chunk of all dwellings, on random dwellings. A failed check raises an AssertionError.
+
+    :param num_dwellings: number of dwellings, defaults to 100
+    :type num_dwellings: int, optional
+    :param num_buildings: number of buildings the dwellings are assigned to, defaults to 30
+    :type num_buildings: int, optional
+    :param seed: master seed, defaults to 0
+    :type seed: int, optional
+    :param num_days: number of days, defaults to 365
+    :type num_days: int, optional
+    :return: True if the time series are identical
+    :rtype: bool
+    """
+
+    rng = np.random.default_rng(1)
+    ar_Tout, ar_solar_gain = _synthetic_weather(num_days * 24, rng)
+    ar_WDWE = (np.arange(num_days) % 7 < 5).astype(int)
+    ar_transition_matrix_WD = rng.uniform(0.05, 0.95, (144, 2))
+    ar_transition_matrix_WE = rng.uniform(0.05, 0.95, (144, 2))
+    ar_building_id = np.sort(rng.integers(0, num_buildings, num_dwellings)).astype(float)
+    ar_params = [rng.uniform(0.05, 0.3, num_dwellings), rng.uniform(3.0, 15.0, num_dwellings), rng.uniform(5.0, 20.0, num_dwellings),
+                 rng.uniform(20.0, 23.0, num_dwellings), rng.uniform(16.0, 19.0, num_dwellings)]
+    ar_scalors = [rng.uniform(0.0, 1.0, num_dwellings), rng.uniform(0.0, 0.5, num_dwellings)]
+
+    results = [generate_building_ts_chunked(ar_building_id, *ar_params, ar_Tout, ar_WDWE, ar_transition_matrix_WD, ar_transition_matrix_WE, ar_solar_gain, *ar_scalors, seed=seed, chunk_size=chunk_size)
+               for chunk_size in (1, num_dwellings)]
+    assert np.array_equal(results[0], results[1]), "The time series depend on the chunk size"
+
+    print("Done: time series are identical for chunk sizes 1 and " + str(num_dwellings))
+
+    return True
+
+
+@njit(parallel=True)
+def accumulate_dwelling_ts(dwelling_HD_TS: np.ndarray, ar_building_pos: np.ndarray, building_HD_TS: np.ndarray):
+    """Adds the heating demand time series of dwellings to the time series of their buildings.
+
+    The time steps are distributed over the cores, so no two threads write to the same element.
+
+    :param dwelling_HD_TS: A numpy array (time steps x dwellings) with the heating demand time series of the dwellings.
+    :type dwelling_HD_TS: np.ndarray
+    :param ar_building_pos: A numpy array with the column of the building of each dwelling in building_HD_TS.
+    :type ar_building_pos: np.ndarray
+    :param building_HD_TS: A numpy array (time steps x buildings) to which the time series are added.
+    :type building_HD_TS: np.ndarray
+    """
+
+    for i in prange(dwelling_HD_TS.shape[0]):
+        for j in range(dwelling_HD_TS.shape[1]):
+            building_HD_TS[i, ar_building_pos[j]] += dwelling_HD_TS[i, j]
 
 #@jit -> vectorized implementation instead
-def fast_generate_building_ts(ar_building_id: np.ndarray, ar_GeneralisedThermCond: np.ndarray, ar_GeneralisedThermCap: np.ndarray, ar_MaxDemand: np.ndarray, ar_temp_setpoint: np.ndarray, ar_temp_setback: np.ndarray, ar_Tout: np.ndarray, ar_WDWE: np.ndarray, ar_transition_matrix_WD: np.ndarray, ar_transition_matrix_WE: np.ndarray, ar_solar_gain_profile: np.ndarray, scalor_solar_gain: np.ndarray, scalor_internal_gain: np.ndarray) -> np.ndarray:
+def fast_generate_building_ts(ar_building_id: np.ndarray, ar_GeneralisedThermCond: np.ndarray, ar_GeneralisedThermCap: np.ndarray, ar_MaxDemand: np.ndarray, ar_temp_setpoint: np.ndarray, ar_temp_setback: np.ndarray, ar_Tout: np.ndarray, ar_WDWE: np.ndarray, ar_transition_matrix_WD: np.ndarray, ar_transition_matrix_WE: np.ndarray, ar_solar_gain_profile: np.ndarray, scalor_solar_gain: np.ndarray, scalor_internal_gain: np.ndarray, seed: int = None, ar_dwelling_index: np.ndarray = None) -> np.ndarray:
     """This function generates the heating demand time series for all dwellings.
 
     This function provides a fast implementation of the heating demand time series generator. It uses vectorized operations to speed up the calculations.
@@ -331,28 +520,41 @@ def fast_generate_building_ts(ar_building_id: np.ndarray, ar_GeneralisedThermCon
     :type scalor_solar_gain: np.ndarray
     :param scalor_internal_gain: A numpy array with the scaling factor for the internal gain for each dwelling.
     :type scalor_internal_gain: np.ndarray
+    :param seed: master seed of the random numbers, every dwelling draws from its own stream (see get_dwelling_random_numbers).
+        Defaults to None, which draws from the global numpy random state.
+    :type seed: int, optional
+    :param ar_dwelling_index: A numpy array with the index of each dwelling in the case study, which selects its random
+        stream. Defaults to None, which numbers the dwellings from 0. Set it when generating a subset of the dwellings
+        (e.g. a chunk), so that every dwelling gets the same time series as in a single run.
+    :type ar_dwelling_index: np.ndarray, optional
     :return: A numpy array with the heating demand time series for all dwellings.
     :rtype: np.ndarray
     """
 
-    # initialise an empty array for the heating demand for all dwellings and the time steps
-    ar_heating_demand = np.zeros((len(ar_Tout), len(ar_building_id)))
+    # draw the random numbers of every dwelling from its own stream: the occupancy chains of weekdays and weekends and
+    # the deviation of the initial indoor temperature from the setpoint
+    if seed is not None:
+        if ar_dwelling_index is None:
+            ar_dwelling_index = np.arange(len(ar_building_id))
+        ar_uniform, ar_T_in_deviation = get_dwelling_random_numbers(seed, ar_dwelling_index, len(ar_transition_matrix_WD) + len(ar_transition_matrix_WE))
+        ar_random_WD, ar_random_WE = ar_uniform[:, :len(ar_transition_matrix_WD)], ar_uniform[:, len(ar_transition_matrix_WD):]
+    else:
+        ar_random_WD, ar_random_WE, ar_T_in_deviation = None, None, np.random.randn(len(ar_building_id))
+    ar_T_in_deviation = ar_T_in_deviation * 0.1
 
     # Vectorized implementation
-    # Generate occupancy time series for all buildings
-    yearly_states = np.array([calc_yearly_occupancy(ar_WDWE, ar_transition_matrix_WD, ar_transition_matrix_WE) for _ in range(len(ar_building_id))])
-    ar_Tset = np.array([assign_temp(yearly_states[i], ar_temp_setpoint[i], ar_temp_setback[i]) for i in range(len(ar_building_id))]).T
-  
-    # calculte the solar gain with same profile for all buildings
-    ar_solar_gain = ar_solar_gain_profile
-    # calculate the internal gaing profile with a different profile for each building
-    ar_internal_gain = yearly_states.T.astype(int)
+    # Generate occupancy time series for all buildings at once, (time steps x dwellings) with one contiguous column per dwelling
+    yearly_states = calc_yearly_occupancy_batch(ar_WDWE, ar_transition_matrix_WD, ar_transition_matrix_WE, len(ar_building_id), ar_random_WD, ar_random_WE)
 
-    # Generate heating demand time series for all buildings
-    ar_heating_demand = np.array([
-        fast_calculate_hd_ts(ar_Tout, ar_Tset[:, j], ar_internal_gain[:,j], ar_solar_gain, ar_MaxDemand[j], ar_GeneralisedThermCond[j], ar_GeneralisedThermCap[j], scalor_solar_gain[j], scalor_internal_gain[j])[0]
-        for j in range(len(ar_building_id))
-    ]).T
+    # initialise the output array for the heating demand for all time steps and dwellings (column-major, so every dwelling writes one contiguous column)
+    ar_heating_demand = np.zeros((len(ar_Tout), len(ar_building_id)), order='F')
+
+    # Generate heating demand time series for all buildings in parallel, the solar gain profile is the same for all buildings,
+    # the internal gain and the setpoint temperature follow the occupancy of each dwelling
+    fast_calculate_hd_ts_batch(np.ascontiguousarray(ar_Tout, dtype=np.float64), np.ascontiguousarray(ar_solar_gain_profile, dtype=np.float64), yearly_states,
+                               np.asarray(ar_temp_setpoint, dtype=np.float64), np.asarray(ar_temp_setback, dtype=np.float64), np.asarray(ar_MaxDemand, dtype=np.float64),
+                               np.asarray(ar_GeneralisedThermCond, dtype=np.float64), np.asarray(ar_GeneralisedThermCap, dtype=np.float64),
+                               np.asarray(scalor_solar_gain, dtype=np.float64), np.asarray(scalor_internal_gain, dtype=np.float64), ar_T_in_deviation, ar_heating_demand)
 
     return ar_heating_demand
 
@@ -424,6 +626,116 @@ def fast_calculate_hd_ts(ar_Tout: np.ndarray, ar_Tset: np.ndarray, ar_internal_g
 
 
 
+@njit(parallel=True)
+def fast_calculate_hd_ts_batch(ar_Tout: np.ndarray, ar_solar_gain: np.ndarray, ar_states: np.ndarray, ar_temp_setpoint: np.ndarray, ar_temp_setback: np.ndarray, ar_max_heat_power: np.ndarray, ar_thermal_conductance: np.ndarray, ar_thermal_storage_capacity: np.ndarray, ar_scalor_solar_gain: np.ndarray, ar_scalor_internal_gain: np.ndarray, ar_T_in_deviation: np.ndarray, ar_heating_demand: np.ndarray):
+    """Fast calculation of the heating demand time series for all dwellings at once.
+
+    Same model as fast_calculate_hd_ts, the dwellings are distributed over the cores (numba.prange, the number of threads
+    is set by NUMBA_NUM_THREADS or numba.set_num_threads). The setpoint temperature and the internal gain are derived from
+    the occupancy inside the kernel and the heating demand is written directly into the preallocated output array.
+
+    :param ar_Tout: A numpy array with the outside temperature for each time step in °C.
+    :type ar_Tout: np.ndarray
+    :param ar_solar_gain: A numpy array with the solar gain for each time step in kW, the same for all dwellings.
+    :type ar_solar_gain: np.ndarray
+    :param ar_states: A numpy array (time steps x dwellings) with the occupancy (1 occupied, 0 unoccupied) of each dwelling.
+    :type ar_states: np.ndarray
+    :param ar_temp_setpoint: A numpy array with the setpoint temperature for each dwelling in °C.
+    :type ar_temp_setpoint: np.ndarray
+    :param ar_temp_setback: A numpy array with the setback temperature for each dwelling in °C.
+    :type ar_temp_setback: np.ndarray
+    :param ar_max_heat_power: A numpy array with the maximum heating power for each dwelling in kW.
+    :type ar_max_heat_power: np.ndarray
+    :param ar_thermal_conductance: A numpy array with the generalised thermal conductance for each dwelling in kW/K.
+    :type ar_thermal_conductance: np.ndarray
+    :param ar_thermal_storage_capacity: A numpy array with the generalised thermal storage capacity for each dwelling in kWh/K.
+    :type ar_thermal_storage_capacity: np.ndarray
+    :param ar_scalor_solar_gain: A numpy array with the scaling factor for the solar gain for each dwelling.
+    :type ar_scalor_solar_gain: np.ndarray
+    :param ar_scalor_internal_gain: A numpy array with the scaling factor for the internal gain for each dwelling.
+    :type ar_scalor_internal_gain: np.ndarray
+    :param ar_T_in_deviation: A numpy array with the deviation of the initial indoor temperature from the setpoint for each dwelling in K.
+    :type ar_T_in_deviation: np.ndarray
+    :param ar_heating_demand: A numpy array (time steps x dwellings) to which the heating demand time series are written in kW.
+    :type ar_heating_demand: np.ndarray
+    """
+
+    num_steps = len(ar_Tout)
+    for j in prange(ar_states.shape[1]):
+        max_heat_power = ar_max_heat_power[j]
+        thermal_coductance = ar_thermal_conductance[j]
+        thermal_storage_capacity = ar_thermal_storage_capacity[j]
+        scalor_solar_gain = ar_scalor_solar_gain[j]
+        scalor_internal_gain = ar_scalor_internal_gain[j]
+
+        # set values for the first time step, the heating demand is just based on the current termal losses
+        T_set = ar_temp_setpoint[j] if ar_states[0, j] > 0.5 else ar_temp_setback[j]
+        T_in = T_set + ar_T_in_deviation[j]
+        actual_heating_power = max(0.0, min(max_heat_power, thermal_coductance * (T_in - ar_Tout[0])))
+        ar_heating_demand[0, j] = actual_heating_power
+
+        # iterate over the time steps, only the values of the previous time step are kept
+        for i in range(1, num_steps):
+            Q_losses = thermal_coductance * (T_in - ar_Tout[i-1]) # for t-1
+            total_gain = ar_states[i-1, j] * scalor_internal_gain + ar_solar_gain[i-1] * scalor_solar_gain # for t-1
+            T_in = T_in + (actual_heating_power + total_gain - Q_losses) / thermal_storage_capacity
+
+            T_set = ar_temp_setpoint[j] if ar_states[i, j] > 0.5 else ar_temp_setback[j]
+            heat_demand = thermal_coductance * (T_in - ar_Tout[i]) + thermal_storage_capacity * (T_set - T_in)
+            actual_heating_power = max(0.0, min(max_heat_power, heat_demand))
+            ar_heating_demand[i, j] = actual_heating_power
+
+
+def benchmark_hd_kernel(num_dwellings: int = 100000, thread_counts: list = None, num_hours: int = 8760) -> pd.DataFrame:
+    """Measures the throughput of fast_calculate_hd_ts_batch for a number of threads on random dwellings, e.g. to check
+    that the time series generation scales with the cores.
+
+    :param num_dwellings: number of dwellings, defaults to 100000
+    :type num_dwellings: int, optional
+    :param thread_counts: numbers of threads to measure, defaults to 1, 2, 4, ... up to the number of cores
+    :type thread_counts: list, optional
+    :param num_hours: number of time steps, defaults to 8760
+    :type num_hours: int, optional
+    :return: a pandas dataframe with the time, the dwellings per second and the speedup per number of threads
+    :rtype: pd.DataFrame
+    """
+
+    if thread_counts is None:
+        thread_counts = [2 ** k for k in range(int(np.log2(numba.config.NUMBA_NUM_THREADS)) + 1)]
+        if thread_counts[-1] != numba.config.NUMBA_NUM_THREADS:
+            thread_counts.append(numba.config.NUMBA_NUM_THREADS)
+    if max(thread_counts) > numba.config.NUMBA_NUM_THREADS:
+        cprint("Warning: numba has " + str(numba.config.NUMBA_NUM_THREADS) + " threads (NUMBA_NUM_THREADS), larger thread counts are skipped", 'yellow')
+        thread_counts = [t for t in thread_counts if t <= numba.config.NUMBA_NUM_THREADS]
+
+    rng = np.random.default_rng(0)
+    ar_Tout, ar_solar_gain = _synthetic_weather(num_hours, rng)
+    ar_states = np.asfortranarray((rng.random((num_hours, num_dwellings)) < 0.6).astype(np.float64))
+    ar_params = [rng.uniform(20.0, 23.0, num_dwellings), rng.uniform(16.0, 19.0, num_dwellings), rng.uniform(5.0, 20.0, num_dwellings),
+                 rng.uniform(0.05, 0.3, num_dwellings), rng.uniform(3.0, 15.0, num_dwellings), rng.uniform(0.0, 1.0, num_dwellings),
+                 rng.uniform(0.0, 0.5, num_dwellings), rng.normal(0, 0.1, num_dwellings)]
+    ar_heating_demand = np.zeros((num_hours, num_dwellings), order='F')
+
+    # compile the kernel before the measurement
+    fast_calculate_hd_ts_batch(ar_Tout, ar_solar_gain, ar_states[:, :2], *[p[:2] for p in ar_params], ar_heating_demand[:, :2])
+
+    default_threads = numba.get_num_threads()
+    results = []
+    for threads in thread_counts:
+        numba.set_num_threads(threads)
+        start = time.time()
+        fast_calculate_hd_ts_batch(ar_Tout, ar_solar_gain, ar_states, *ar_params, ar_heating_demand)
+        duration = time.time() - start
+        results.append({'Threads': threads, 'Time in s': duration, 'Dwellings per s': num_dwellings / duration})
+        print(f"Threads: {threads}, Time: {duration:.2f} s, Dwellings per s: {num_dwellings / duration:.0f}")
+    numba.set_num_threads(default_threads)
+
+    df_results = pd.DataFrame(results)
+    df_results['Speedup'] = df_results['Time in s'].iloc[0] / df_results['Time in s']
+
+    return df_results
+
+
 @jit
 def calc_yearly_occupancy(ar_WDWE: np.ndarray, ar_transition_matrix_WD: np.ndarray, ar_transition_matrix_WE: np.ndarray) -> np.ndarray:
     """Calculates the yearly occupancy time series for a given sequence of business days and weekends by Markov Chain Monte Carlo (MCMC) simulation.
@@ -454,6 +766,117 @@ def calc_yearly_occupancy(ar_WDWE: np.ndarray, ar_transition_matrix_WD: np.ndarr
     return yearly_states
 
 
+def get_dwelling_random_numbers(seed: int, ar_dwelling_index: np.ndarray, num_uniform: int) -> tuple:
+    """Draws the random numbers of the dwellings, every dwelling from its own independent stream.
+
+    The streams are blocks of one counter-based generator (Philox) keyed on the master seed: the stream of dwelling j
+    starts at the counter j * (blocks per dwelling). The random numbers of a dwelling therefore do not depend on the
+    other dwellings, and the results are identical however the dwellings are split into chunks or worker processes.
+    Consecutive dwellings are drawn in bulk, without a generator per dwelling.
+
+    :param seed: master seed
+    :type seed: int
+    :param ar_dwelling_index: A numpy array with the index of each dwelling in the case study.
+    :type ar_dwelling_index: np.ndarray
+    :param num_uniform: number of uniform random numbers per dwelling
+    :type num_uniform: int
+    :return: A numpy array (dwellings x num_uniform) with uniform random numbers in [0, 1) and a numpy array with one
+        standard normal random number per dwelling.
+    :rtype: tuple
+    """
+
+    # the 128 bit key of Philox derived from the seed, every counter step gives 4 random 64 bit integers
+    key = np.random.SeedSequence(seed).generate_state(2, np.uint64)
+    num_raw = num_uniform + 2  # two more uniform numbers per dwelling for the normal number (Box-Muller)
+    blocks = -(-num_raw // 4)
+
+    ar_dwelling_index = np.asarray(ar_dwelling_index, dtype=np.int64)
+    ar_raw = np.empty((len(ar_dwelling_index), blocks * 4), dtype=np.uint64)
+
+    # runs of consecutive dwelling indices are drawn from one generator
+    run_starts = np.flatnonzero(np.diff(ar_dwelling_index, prepend=-2) != 1)
+    for start, stop in zip(run_starts, np.append(run_starts[1:], len(ar_dwelling_index))):
+        bit_generator = np.random.Philox(key=key, counter=int(ar_dwelling_index[start]) * blocks)
+        ar_raw[start:stop] = bit_generator.random_raw((stop - start) * blocks * 4).reshape(stop - start, blocks * 4)
+
+    # uniform numbers in [0, 1) from the upper 53 bits
+    ar_uniform = (ar_raw[:, :num_raw] >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+    # standard normal number by the Box-Muller transform, 1 - u is in (0, 1]
+    ar_normal = np.sqrt(-2.0 * np.log(1.0 - ar_uniform[:, num_uniform])) * np.cos(2.0 * np.pi * ar_uniform[:, num_uniform + 1])
+
+    return ar_uniform[:, :num_uniform], ar_normal
+
+
+def calc_yearly_occupancy_batch(ar_WDWE: np.ndarray, ar_transition_matrix_WD: np.ndarray, ar_transition_matrix_WE: np.ndarray, num_dwellings: int, ar_random_WD: np.ndarray = None, ar_random_WE: np.ndarray = None) -> np.ndarray:
+    """Calculates the yearly occupancy time series of all dwellings at once, same model as calc_yearly_occupancy.
+
+    The weekday and weekend chains of all dwellings are drawn by generate_mcchains, the yearly time series are built by
+    indexing the daily chains with the sequence of business days and weekends.
+
+    :param ar_WDWE: A numpy array with the sequence of business days and weekends.
+    :type ar_WDWE: np.ndarray
+    :param ar_transition_matrix_WD: A numpy array with the transition matrix for weekdays.
+    :type ar_transition_matrix_WD: np.ndarray
+    :param ar_transition_matrix_WE: A numpy array with the transition matrix for weekends.
+    :type ar_transition_matrix_WE: np.ndarray
+    :param num_dwellings: number of dwellings
+    :type num_dwellings: int
+    :param ar_random_WD: A numpy array (dwellings x steps) with the uniform random numbers of the weekday chains, defaults to None (drawn from the global numpy random state)
+    :type ar_random_WD: np.ndarray, optional
+    :param ar_random_WE: A numpy array (dwellings x steps) with the uniform random numbers of the weekend chains, defaults to None (drawn from the global numpy random state)
+    :type ar_random_WE: np.ndarray, optional
+    :return: A numpy array (time steps x dwellings, column-major) with the yearly occupancy (1 occupied, 0 unoccupied) in hourly resolution.
+    :rtype: np.ndarray
+    """
+
+    # daily chains per dwelling: index 0 weekend, index 1 weekday
+    daily_states = np.stack([generate_mcchains(ar_transition_matrix_WE, num_dwellings, ar_random=ar_random_WE),
+                             generate_mcchains(ar_transition_matrix_WD, num_dwellings, ar_random=ar_random_WD)], axis=1)
+
+    # select the chain of every day (dwellings x days x hours of the day) and flatten the days
+    yearly_states = daily_states[:, (np.asarray(ar_WDWE) == 1).astype(np.intp), :].reshape(num_dwellings, -1)
+
+    return yearly_states.T
+
+
+def generate_mcchains(ar_transition_matrix: np.ndarray, num_chains: int, ini_prob = 0.2, resample = True, ar_random: np.ndarray = None) -> np.ndarray:
+    """Generates Markov Chain Monte Carlo (MCMC) chains for one day of several dwellings at once, same model as
+    fast_generate_mcchain. The random numbers of all chains and steps are drawn as one matrix, every step of the walk
+    is a vectorized comparison over all chains.
+
+    :param ar_transition_matrix: A numpy array with the transition matrix for one day.
+    :type ar_transition_matrix: np.ndarray
+    :param num_chains: number of chains (dwellings)
+    :type num_chains: int
+    :param ini_prob: probability for active for the first time step, defaults to 0.2
+    :type ini_prob: float, optional
+    :param resample: boole flag: if True the 10-min profile is converted to hourly resolution, defaults to True
+    :type resample: bool, optional
+    :param ar_random: A numpy array (chains x steps) with uniform random numbers in [0, 1), defaults to None (drawn from the global numpy random state)
+    :type ar_random: np.ndarray, optional
+    :return: a numpy array (chains x time steps) with the MCMC chains in hourly (or 10-min) resolution
+    :rtype: np.ndarray
+    """
+
+    num_steps = len(ar_transition_matrix)
+    if ar_random is None:
+        ar_random = np.random.rand(num_chains, num_steps)
+
+    states = np.empty((num_chains, num_steps), dtype=bool)
+    states[:, 0] = ar_random[:, 0] < ini_prob
+    for i in range(1, num_steps):
+        # the transition probability of column 1 if the previous state is active, of column 0 otherwise
+        prob = np.where(states[:, i - 1], ar_transition_matrix[i - 1, 1], ar_transition_matrix[i - 1, 0])
+        states[:, i] = ar_random[:, i] < prob
+
+    if not resample:
+        return states.astype(np.int8)
+
+    # resample the states to 24 insted of 144 steps, active if more than half of the 6 steps are active
+    return (states.reshape(num_chains, -1, 6).sum(axis=2) > 3).astype(np.int8)
+
+
 def assign_temp(ar_states: np.ndarray, T_setpoint = 22.0, T_setback = 18.0) -> np.ndarray:
     """Assigns the setpoint temperature to the states based on the occupancy time series.
 
@@ -0,0 +1,619 @@
+# this script contains the matrix backend of the optimisation model: the formulation of the HeatNetworkModel is
+# assembled as sparse coefficient matrices and passed to the solvers in memory, without Pyomo expressions
+
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from pyomo.environ import value
+from termcolor import cprint
+
+
+class MatrixModel:
+    """Sparse coefficient matrix representation of a linear (mixed-integer) model.
+
+    Columns are added in blocks, one block per model variable indexed over a product of sets. Rows are added in blocks,
+    one block per constraint family, with a sense ('E', 'L', 'G') and a right hand side per row. The coefficients are
+    collected as COO triplets and converted to a CSR matrix once the model is complete.
+    """
+
+    def __init__(self):
+        """Constructor method for the MatrixModel class. Initializes empty column and row blocks.
+        """
+
+        self.var_blocks = {}
+        self.row_blocks = {}
+        self.num_cols = 0
+        self.num_rows = 0
+
+        self._col_lower = []
+        self._col_upper = []
+        self._col_cost = []
+        self._col_integer = []
+        self._row_sense = []
+        self._row_rhs = []
+        self._coo_rows = []
+        self._coo_cols = []
+        self._coo_vals = []
+
+        self.A = None
+
+    def add_variables(self, name: str, index_sets: tuple, lower=0.0, upper=np.inf, cost=0.0, integer=False) -> int:
+        """Add a block of columns for a variable indexed over the product of the given sets.
+
+        :param name: name of the variable, used for the mapping of the solution
+        :type name: str
+        :param index_sets: tuple of lists with the elements of the index sets
+        :type index_sets: tuple
+        :param lower: lower bound(s) of the columns, defaults to 0.0
+        :type lower: float or np.ndarray, optional
+        :param upper: upper bound(s) of the columns, defaults to np.inf
+        :type upper: float or np.ndarray, optional
+        :param cost: objective coefficient(s) of the columns, defaults to 0.0
+        :type cost: float or np.ndarray, optional
+        :param integer: set to true for integer columns, defaults to False
+        :type integer: bool, optional
+        :return: offset of the first column of the block
+        :rtype: int
+        """
+
+        shape = tuple(len(s) for s in index_sets)
+        size = int(np.prod(shape))
+        offset = self.num_cols
+
+        self.var_blocks[name] = {'offset': offset, 'shape': shape, 'index_sets': index_sets}
+        self._col_lower.append(np.broadcast_to(np.asarray(lower, dtype=float), (size,)).ravel())
+        self._col_upper.append(np.broadcast_to(np.asarray(upper, dtype=float), (size,)).ravel())
+        self._col_cost.append(np.broadcast_to(np.asarray(cost, dtype=float), (size,)).ravel())
+        self._col_integer.append(np.full(size, integer, dtype=bool))
+        self.num_cols += size
+
+        return offset
+
+    def cols(self, name: str, *positions) -> np.ndarray:
+        """Return the column indices of a variable block for the given positions in its index sets.
+
+        :param name: name of the variable
+        :type name: str
+        :return: array with the column indices
+        :rtype: np.ndarray
+        """
+
+        block = self.var_blocks[name]
+        return block['offset'] + np.ravel_multi_index(positions, block['shape'])
+
+    def add_rows(self, name: str, num_rows: int, sense: str, rhs=0.0) -> int:
+        """Add a block of rows with a common sense.
+
+        :param name: name of the constraint family
+        :type name: str
+        :param num_rows: number of rows in the block
+        :type num_rows: int
+        :param sense: sense of the rows, 'E' (=), 'L' (<=) or 'G' (>=)
+        :type sense: str
+        :param rhs: right hand side(s) of the rows, defaults to 0.0
+        :type rhs: float or np.ndarray, optional
+        :return: offset of the first row of the block
+        :rtype: int
+        """
+
+        offset = self.num_rows
+        self.row_blocks[name] = {'offset': offset, 'size': num_rows}
+        self._row_sense.append(np.full(num_rows, sense))
+        self._row_rhs.append(np.broadcast_to(np.asarray(rhs, dtype=float), (num_rows,)).ravel())
+        self.num_rows += num_rows
+
+        return offset
+
+    def add_coefficients(self, rows: np.ndarray, cols: np.ndarray, vals):
+        """Add coefficients to the matrix. Duplicate entries are summed up.
+
+        :param rows: row indices
+        :type rows: np.ndarray
+        :param cols: column indices
+        :type cols: np.ndarray
+        :param vals: coefficient value(s)
+        :type vals: float or np.ndarray
+        """
+
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        self._coo_rows.append(rows)
+        self._coo_cols.append(np.asarray(cols, dtype=np.int64).ravel())
+        self._coo_vals.append(np.broadcast_to(np.asarray(vals, dtype=float), rows.shape).ravel())
+
+    def finalize(self):
+        """Concatenate the collected blocks and convert the coefficients to a CSR matrix.
+        """
+
+        self.col_lower = np.concatenate(self._col_lower)
+        self.col_upper = np.concatenate(self._col_upper)
+        self.col_cost = np.concatenate(self._col_cost)
+        self.col_integer = np.concatenate(self._col_integer)
+        self.row_sense = np.concatenate(self._row_sense)
+        self.row_rhs = np.concatenate(self._row_rhs)
+
+        self.A = sp.coo_matrix((np.concatenate(self._coo_vals), (np.concatenate(self._coo_rows), np.concatenate(self._coo_cols))),
+                               shape=(self.num_rows, self.num_cols)).tocsr()
+        self.A.sum_duplicates()
+
+        # free the triplets
+        self._col_lower = self._col_upper = self._col_cost = self._col_integer = None
+        self._row_sense = self._row_rhs = self._coo_rows = self._coo_cols = self._coo_vals = None
+
+    def row_bounds(self) -> tuple:
+        """Return the rows as lower and upper bounds.
+
+        :return: arrays with the lower and the upper bounds of the rows
+        :rtype: tuple
+        """
+
+        row_lower = np.where(self.row_sense == 'L', -np.inf, self.row_rhs)
+        row_upper = np.where(self.row_sense == 'G', np.inf, self.row_rhs)
+        return row_lower, row_upper
+
+    def solution_to_dataframes(self, x: np.ndarray) -> dict:
+        """Map a solution vector back to one dataframe per variable, in the same layout as
+        HeatNetworkModel.export_model_variables: a 'value' column followed by one 'index_set_i' column per index.
+
+        :param x: solution vector
+        :type x: np.ndarray
+        :return: dictionary with the variable names as keys and dataframes as values
+        :rtype: dict
+        """
+
+        d_vars = {}
+        for name, block in self.var_blocks.items():
+            size = int(np.prod(block['shape']))
+            df = pd.DataFrame({'value': x[block['offset']:block['offset'] + size]})
+
+            d_vars[name] = expand_index_sets(df, block['index_sets'], block['shape'])
+
+        return d_vars
+
+
+def expand_index_sets(df: pd.DataFrame, index_sets: list, shape: tuple) -> pd.DataFrame:
+    """Add the index columns 'index_set_i' of the product of the index sets to a dataframe of values in row-major order.
+    Tuples (e.g. pipes) are split into several index columns.
+
+    :param df: dataframe with the values in row-major order of the product
+    :type df: pd.DataFrame
+    :param index_sets: index sets of the product
+    :type index_sets: list
+    :param shape: shape of the product (number of elements per index set)
+    :type shape: tuple
+    :return: the dataframe with the index columns
+    :rtype: pd.DataFrame
+    """
+
+    col = 1
+    for pos, index_set in enumerate(index_sets):
+        inner = int(np.prod(shape[pos + 1:]))
+        outer = int(np.prod(shape[:pos]))
+        elements = list(index_set)
+        if len(elements) > 0 and isinstance(elements[0], tuple):
+            columns = list(zip(*elements))
+        elif len(elements) == 0:
+            # an empty set keeps its index columns, e.g. the pipes without pipe candidates
+            columns = [[]] * (getattr(index_set, 'dimen', None) or 1)
+        else:
+            columns = [elements]
+        for values in columns:
+            df['index_set_' + str(col)] = np.tile(np.repeat(np.asarray(values), inner), outer)
+            col += 1
+
+    return df
+
+
+def _param_array(param, index: list) -> np.ndarray:
+    """Read the values of an indexed Pyomo parameter for the given index into an array.
+
+    :param param: indexed Pyomo parameter
+    :type param: Param
+    :param index: list of indices to read
+    :type index: list
+    :return: array with the parameter values
+    :rtype: np.ndarray
+    """
+
+    values = param.extract_values_sparse()
+    missing = [i for i in index if i not in values]
+    assert len(missing) == 0, f"No value for {param.name} at {missing[:5]}"
+    return np.array([value(values[i]) for i in index], dtype=float)
+
+
+def _var_bounds(var, index: list, lower: float = 0.0, upper: float = np.inf) -> tuple:
+    """Return the column bounds of an indexed Pyomo variable, fixed variables get their value as both bounds.
+
+    :param var: indexed Pyomo variable
+    :type var: Var
+    :param index: list of indices in the order of the columns
+    :type index: list
+    :param lower: lower bound of the free columns, defaults to 0.0
+    :type lower: float, optional
+    :param upper: upper bound(s) of the free columns, defaults to np.inf
+    :type upper: float or np.ndarray, optional
+    :return: arrays with the lower and upper bounds
+    :rtype: tuple
+    """
+
+    lower = np.full(len(index), lower, dtype=float)
+    upper = np.full(len(index), upper, dtype=float)
+    for i, idx in enumerate(index):
+        if var[idx].fixed:
+            lower[i] = upper[i] = var[idx].value
+
+    return lower, upper
+
+
+def _grid(size_a: int, size_b: int) -> tuple:
+    """Return the flattened positions of a (size_a x size_b) grid in row-major order.
+
+    :param size_a: size of the outer index
+    :type size_a: int
+    :param size_b: size of the inner index
+    :type size_b: int
+    :return: arrays with the outer and inner positions
+    :rtype: tuple
+    """
+
+    return np.repeat(np.arange(size_a), size_b), np.tile(np.arange(size_b), size_a)
+
+
+def build_matrix_model(dh_model) -> MatrixModel:
+    """Assemble the formulation of a filled HeatNetworkModel as a sparse coefficient matrix.
+
+    The columns and rows follow the variables and constraints of HeatNetworkModel.initialize_variables and
+    HeatNetworkModel.initialize_constraints. The time series are taken from the dense arrays in dh_model.data_dict,
+    so fill_model_data has to be called before, initialize_constraints does not.
+
+    :param dh_model: heat network model with filled data
+    :type dh_model: HeatNetworkModel
+    :return: the assembled matrix model
+    :rtype: MatrixModel
+    """
+
+    assert not dh_model.aggregated, "The matrix backend does not support models on representative periods"
+
+    mm = MatrixModel()
+
+    nodes = list(dh_model.n)
+    hours = list(dh_model.h)
+    pipes = list(dh_model.pc)
+    edges = list(dh_model.pe)
+    units = list(dh_model.hg)
+    tes = list(dh_model.tes)
+    wh = list(dh_model.wh)
+
+    N, H, P, E, U = len(nodes), len(hours), len(pipes), len(edges), len(units)
+    node_pos = {n: i for i, n in enumerate(nodes)}
+    unit_pos = {hg: i for i, hg in enumerate(units)}
+    tes_pos = np.array([unit_pos[u] for u in tes], dtype=np.int64)
+    wh_pos = np.array([unit_pos[u] for u in wh], dtype=np.int64)
+
+    # scalar parameters
+    dT_cw = value(dh_model.pTsupply - dh_model.pTreturn) * value(dh_model.pCWater)
+    cost_hns = value(dh_model.pCostHNS)
+    cost_pumping = value(dh_model.pCostPumping)
+    pipe_cost_ini = value(dh_model.pPipeCostIni)
+    pipe_cost_slope = value(dh_model.pPipeCostSlope)
+    mass_flow_ini = value(dh_model.pMassFlowIni)
+    tes_losses = value(dh_model.pTESlosses)
+
+    # indexed parameters
+    heat_demand = dh_model.data_dict['heat_demand']
+    waste_heat_prof = dh_model.data_dict['waste_heat_prof']
+    assert not np.isnan(waste_heat_prof).any(), "Waste heat profiles contain missing hours"
+    cost_dh_connect = _param_array(dh_model.pCostDHConnect, nodes)
+    max_dh_power = _param_array(dh_model.pMaxDHPower, nodes)
+    # the district heating consumption and the local heat production can not exceed the heat demand of the hour
+    max_dh_supply = np.minimum(max_dh_power[:, None], heat_demand).ravel()
+    # the mass flow bounds are the same for all hours of a pipe candidate, see HeatNetworkModel.tighten_bounds
+    max_pipe_mf = np.array([dh_model.vMF[pc + (hours[0],)].ub for pc in pipes], dtype=float)
+    max_pipe_mf[np.isnan(max_pipe_mf)] = np.inf
+    max_pipe_mf_inv = _param_array(dh_model.pMaxPipeMFInv, edges)
+    cost_local = _param_array(dh_model.pCostLocalHeatProd, nodes)
+    pipe_length = _param_array(dh_model.pPipeLength, pipes)
+    edge_length = _param_array(dh_model.pPipeLength, edges)
+    cost_central = _param_array(dh_model.pCostCentrHeatProd, units)
+    cost_central_inv = _param_array(dh_model.pCostCentralHeatProdInv, units)
+    cost_tes_inv = _param_array(dh_model.pCostTESInv, tes)
+
+    # columns, in the order of HeatNetworkModel.initialize_variables
+    mm.add_variables('vMF', (pipes, hours), upper=np.repeat(max_pipe_mf, H), cost=np.repeat(cost_pumping * pipe_length, H))
+    mm.add_variables('vHNS', (nodes, hours), cost=cost_hns)
+    mm.add_variables('vLocalHeatProd', (nodes, hours), cost=np.repeat(cost_local, H))
+    mm.add_variables('vMFConsumption', (nodes, hours))
+    mm.add_variables('vMFInjection', (nodes, hours))
+    mm.add_variables('vCentralHeatProd', (units, hours), cost=np.repeat(cost_central, H))
+    mm.add_variables('vCentralHeatProdInv', (units,), *_var_bounds(dh_model.vCentralHeatProdInv, units), cost=cost_central_inv)
+    mm.add_variables('vTESLevel', (tes, hours))
+    mm.add_variables('vTESCharge', (tes, hours))
+    mm.add_variables('vTESDischarge', (tes, hours))
+    mm.add_variables('vTESCapacitivInv', (tes,), *_var_bounds(dh_model.vTESCapacitivInv, tes), cost=cost_tes_inv)
+    mm.add_variables('vPipeMassFlowInv', (edges,), *_var_bounds(dh_model.vPipeMassFlowInv, edges, upper=max_pipe_mf_inv), cost=pipe_cost_slope * edge_length)
+    # binaries that are all fixed (e.g. in a dispatch with given investments) are passed as continuous columns
+    lower, upper = _var_bounds(dh_model.vDHconnect, nodes, upper=1.0)
+    mm.add_variables('vDHconnect', (nodes,), lower, upper, cost=cost_dh_connect, integer=bool((lower != upper).any()))
+    lower, upper = _var_bounds(dh_model.vBinBuildPipe, edges, upper=1.0)
+    mm.add_variables('vBinBuildPipe', (edges,), lower, upper, cost=pipe_cost_ini * edge_length, integer=bool((lower != upper).any()))
+
+    n_idx, t_idx = _grid(N, H)
+
+    # energy balance: vMFConsumption + (vLocalHeatProd + vHNS) / dT_cw == demand / dT_cw
+    rows = mm.add_rows('energy_balance', N * H, 'E', heat_demand.ravel() / dT_cw) + np.arange(N * H)
+    mm.add_coefficients(rows, mm.cols('vMFConsumption', n_idx, t_idx), 1.0)
+    mm.add_coefficients(rows, mm.cols('vLocalHeatProd', n_idx, t_idx), 1.0 / dT_cw)
+    mm.add_coefficients(rows, mm.cols('vHNS', n_idx, t_idx), 1.0 / dT_cw)
+
+    # max dh power: vMFConsumption - vDHconnect * min(max_dh_power, demand) / dT_cw <= 0
+    rows = mm.add_rows('max_dh_power', N * H, 'L') + np.arange(N * H)
+    mm.add_coefficients(rows, mm.cols('vMFConsumption', n_idx, t_idx), 1.0)
+    mm.add_coefficients(rows, mm.cols('vDHconnect', n_idx), -max_dh_supply / dT_cw)
+
+    # mass flow balance: consumption + TES charge - injection - inflow + outflow == 0
+    rows = mm.add_rows('mf_balance', N * H, 'E')
+    mm.add_coefficients(rows + np.arange(N * H), mm.cols('vMFConsumption', n_idx, t_idx), 1.0)
+    mm.add_coefficients(rows + np.arange(N * H), mm.cols('vMFInjection', n_idx, t_idx), -1.0)
+    tes_index = {u: i for i, u in enumerate(tes)}
+    pairs = [(node_pos[n], tes_index[u]) for n in nodes for u in dh_model.node_tes[n]]
+    if pairs:
+        pair_n, pair_u = (np.array(a, dtype=np.int64) for a in zip(*pairs))
+        k_idx, t_pair = _grid(len(pairs), H)
+        mm.add_coefficients(rows + pair_n[k_idx] * H + t_pair, mm.cols('vTESCharge', pair_u[k_idx], t_pair), 1.0)
+    if P > 0:
+        pipe_from = np.array([node_pos[n] for n, m in pipes], dtype=np.int64)
+        pipe_to = np.array([node_pos[m] for n, m in pipes], dtype=np.int64)
+        p_idx, t_pipe = _grid(P, H)
+        mf_cols = mm.cols('vMF', p_idx, t_pipe)
+        mm.add_coefficients(rows + pipe_to[p_idx] * H + t_pipe, mf_cols, -1.0)
+        mm.add_coefficients(rows + pipe_from[p_idx] * H + t_pipe, mf_cols, 1.0)
+
+    # mass flow injection: vMFInjection - sum of the central heat production at the node / dT_cw == 0
+    rows = mm.add_rows('mf_injection', N * H, 'E')
+    mm.add_coefficients(rows + np.arange(N * H), mm.cols('vMFInjection', n_idx, t_idx), 1.0)
+    pairs = [(node_pos[n], unit_pos[u]) for n in nodes for u in dh_model.node_wh[n] + dh_model.node_hb[n] + dh_model.node_tes[n]]
+    if pairs:
+        pair_n, pair_u = (np.array(a, dtype=np.int64) for a in zip(*pairs))
+        k_idx, t_pair = _grid(len(pairs), H)
+        mm.add_coefficients(rows + pair_n[k_idx] * H + t_pair, mm.cols('vCentralHeatProd', pair_u[k_idx], t_pair), -1.0 / dT_cw)
+
+    # decentral condition: vLocalHeatProd + vDHconnect * min(max_dh_power, demand) <= min(max_dh_power, demand)
+    if value(dh_model.pAllowDoubleHeating) == 0:
+        rows = mm.add_rows('decentral_condition', N * H, 'L', max_dh_supply) + np.arange(N * H)
+        mm.add_coefficients(rows, mm.cols('vLocalHeatProd', n_idx, t_idx), 1.0)
+        mm.add_coefficients(rows, mm.cols('vDHconnect', n_idx), max_dh_supply)
+
+    # max waste heat power: vCentralHeatProd[wh] <= max mass flow * dT_cw
+    if len(wh) > 0:
+        w_idx, t_wh = _grid(len(wh), H)
+        rows = mm.add_rows('max_wh_power', len(wh) * H, 'L', waste_heat_prof.ravel() * dT_cw) + np.arange(len(wh) * H)
+        mm.add_coefficients(rows, mm.cols('vCentralHeatProd', wh_pos[w_idx], t_wh), 1.0)
+
+    # max power invest: vCentralHeatProd - vCentralHeatProdInv <= 0
+    u_idx, t_unit = _grid(U, H)
+    rows = mm.add_rows('max_power_invest', U * H, 'L') + np.arange(U * H)
+    mm.add_coefficients(rows, mm.cols('vCentralHeatProd', u_idx, t_unit), 1.0)
+    mm.add_coefficients(rows, mm.cols('vCentralHeatProdInv', u_idx), -1.0)
+
+    if len(tes) > 0:
+        s_idx, t_tes = _grid(len(tes), H)
+        s_unit = tes_pos[s_idx]
+
+        # TES production: vCentralHeatProd[tes] - vTESDischarge * dT_cw == 0
+        rows = mm.add_rows('tes_production', len(tes) * H, 'E') + np.arange(len(tes) * H)
+        mm.add_coefficients(rows, mm.cols('vCentralHeatProd', s_unit, t_tes), 1.0)
+        mm.add_coefficients(rows, mm.cols('vTESDischarge', s_idx, t_tes), -dT_cw)
+
+        # TES storage invest: vTESLevel - vTESCapacitivInv <= 0
+        rows = mm.add_rows('tes_storage_invest', len(tes) * H, 'L') + np.arange(len(tes) * H)
+        mm.add_coefficients(rows, mm.cols('vTESLevel', s_idx, t_tes), 1.0)
+        mm.add_coefficients(rows, mm.cols('vTESCapacitivInv', s_idx), -1.0)
+
+        # TES balance: level - level of the previous hour - charge + discharge == 0, the first hour wraps to the last
+        # or starts from the initial level if given
+        tes_initial_level = dh_model.data_dict.get('tes_initial_level')
+        if tes_initial_level is None:
+            t_prev = np.where(t_tes == 0, H - 1, t_tes - 1)
+            rows = mm.add_rows('tes_balance', len(tes) * H, 'E') + np.arange(len(tes) * H)
+            mm.add_coefficients(rows, mm.cols('vTESLevel', s_idx, t_prev), np.where(t_tes == 0, -1.0, -(1 - tes_losses)))
+        else:
+            rhs = np.where(t_tes == 0, tes_initial_level[s_idx] * (1 - tes_losses), 0.0)
+            rows = mm.add_rows('tes_balance', len(tes) * H, 'E', rhs) + np.arange(len(tes) * H)
+            later = t_tes > 0
+            mm.add_coefficients(rows[later], mm.cols('vTESLevel', s_idx[later], t_tes[later] - 1), -(1 - tes_losses))
+        mm.add_coefficients(rows, mm.cols('vTESLevel', s_idx, t_tes), 1.0)
+        mm.add_coefficients(rows, mm.cols('vTESCharge', s_idx, t_tes), -1.0)
+        mm.add_coefficients(rows, mm.cols('vTESDischarge', s_idx, t_tes), 1.0)
+
+    if P > 0:
+        # max mass flow per pipe investment, both directions of an undirected pipe share one row:
+        # sum of vMF of the pipe candidates - vBinBuildPipe * mass_flow_ini - vPipeMassFlowInv <= 0
+        edge_pos = {e: i for i, e in enumerate(edges)}
+        pipe_edge = np.array([edge_pos[dh_model.pipe_edge[pc]] for pc in pipes], dtype=np.int64)
+        e_idx, t_edge = _grid(E, H)
+        rows = mm.add_rows('max_mass_flow', E * H, 'L')
+        mm.add_coefficients(rows + pipe_edge[p_idx] * H + t_pipe, mm.cols('vMF', p_idx, t_pipe), 1.0)
+        mm.add_coefficients(rows + np.arange(E * H), mm.cols('vBinBuildPipe', e_idx), -mass_flow_ini)
+        mm.add_coefficients(rows + np.arange(E * H), mm.cols('vPipeMassFlowInv', e_idx), -1.0)
+
+        # logic mass flow: vPipeMassFlowInv - vBinBuildPipe * max_pipe_mf_inv <= 0
+        rows = mm.add_rows('logic_mass_flow', E, 'L') + np.arange(E)
+        mm.add_coefficients(rows, mm.cols('vPipeMassFlowInv', np.arange(E)), 1.0)
+        mm.add_coefficients(rows, mm.cols('vBinBuildPipe', np.arange(E)), -max_pipe_mf_inv)
+
+    mm.finalize()
+
+    return mm
+
+
+def solve_matrix_model(mm: MatrixModel, config: dict, x0: np.ndarray = None, log_file: str = None) -> dict:
+    """Solve a matrix model with the solver defined in the configuration ('highs' or 'gurobi').
+
+    :param mm: the assembled matrix model
+    :type mm: MatrixModel
+    :param config: configuration dictionary
+    :type config: dict
+    :param x0: start solution passed to the solver as MIP start, defaults to None
+    :type x0: np.ndarray, optional
+    :param log_file: path of the solver log file, defaults to None
+    :type log_file: str, optional
+    :return: dictionary with the solver, status, objective value, relative MIP gap and solution vector, None if the solver is not recognized
+    :rtype: dict
+    """
+
+    solver = config['solver']
+    threads = config.get('threads') or os.cpu_count()
+    if solver is None:
+        print("Warning: No solver defined, using default 'highs'")
+        solver = 'highs'
+
+    if solver == 'highs':
+        return _solve_highs(mm, config['mip_gap'], x0, log_file, threads)
+    elif solver == 'gurobi':
+        return _solve_gurobi(mm, config['mip_gap'], x0, log_file, threads)
+
+    print("Error: Solver not recognized")
+    return None
+
+
+def solve_mps_file(path: str, config: dict, log_file: str = None) -> dict:
+    """Read a model from an MPS file (e.g. a model from the cache, see cache.py) and solve it with the solver defined
+    in the configuration ('highs' or 'gurobi').
+
+    :param path: path of the MPS file
+    :type path: str
+    :param config: configuration dictionary
+    :type config: dict
+    :param log_file: path of the solver log file, defaults to None
+    :type log_file: str, optional
+    :return: dictionary with the solver, status, objective value, relative MIP gap, solution vector and column names,
+        None if the solver is not recognized
+    :rtype: dict
+    """
+
+    solver = config['solver']
+    threads = config.get('threads') or os.cpu_count()
+    if solver is None:
+        print("Warning: No solver defined, using default 'highs'")
+        solver = 'highs'
+
+    if solver == 'highs':
+        import highspy
+
+        h = highspy.Highs()
+        h.setOptionValue('mip_rel_gap', config['mip_gap'])
+        h.setOptionValue('threads', threads)
+        if log_file is not None:
+            h.setOptionValue('log_file', log_file)
+        h.readModel(path)
+        h.run()
+
+        status = h.modelStatusToString(h.getModelStatus())
+        col_names = list(h.getLp().col_names_)
+        x = np.array(h.getSolution().col_value)
+        if len(x) != len(col_names):
+            cprint("Warning: HiGHS found no solution", 'yellow')
+            return {'solver': 'highs', 'status': status, 'objective': None, 'gap': None, 'x': np.full(len(col_names), np.nan), 'col_names': col_names}
+        return {'solver': 'highs', 'status': status, 'objective': h.getInfo().objective_function_value,
+                'gap': h.getInfo().mip_gap, 'x': x, 'col_names': col_names}
+
+    elif solver == 'gurobi':
+        import gurobipy as gp
+
+        m = gp.read(path)
+        m.Params.MIPGap = config['mip_gap']
+        m.Params.Threads = threads
+        if log_file is not None:
+            m.Params.LogFile = log_file
+        m.optimize()
+
+        status = 'optimal' if m.Status == gp.GRB.OPTIMAL else 'status code ' + str(m.Status)
+        variables = m.getVars()
+        col_names = [v.VarName for v in variables]
+        if m.SolCount == 0:
+            cprint("Warning: Gurobi found no solution", 'yellow')
+            return {'solver': 'gurobi', 'status': status, 'objective': None, 'gap': None, 'x': np.full(len(col_names), np.nan), 'col_names': col_names}
+        return {'solver': 'gurobi', 'status': status, 'objective': m.ObjVal, 'gap': m.MIPGap if m.IsMIP else 0.0,
+                'x': np.array(m.getAttr('X', variables)), 'col_names': col_names}
+
+    print("Error: Solver not recognized")
+    return None
+
+
+def _solve_highs(mm: MatrixModel, mip_gap: float, x0: np.ndarray = None, log_file: str = None, threads: int = None) -> dict:
+    """Pass the matrix model to HiGHS through the in-memory API of highspy and solve it.
+    """
+
+    import highspy
+
+    A = mm.A.tocsc()
+    row_lower, row_upper = mm.row_bounds()
+
+    lp = highspy.HighsLp()
+    lp.num_col_ = mm.num_cols
+    lp.num_row_ = mm.num_rows
+    lp.col_cost_ = mm.col_cost
+    lp.col_lower_ = mm.col_lower
+    lp.col_upper_ = mm.col_upper
+    lp.row_lower_ = row_lower
+    lp.row_upper_ = row_upper
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.start_ = A.indptr
+    lp.a_matrix_.index_ = A.indices
+    lp.a_matrix_.value_ = A.data
+    if mm.col_integer.any():
+        integrality = [highspy.HighsVarType.kContinuous] * mm.num_cols
+        for i in np.flatnonzero(mm.col_integer):
+            integrality[i] = highspy.HighsVarType.kInteger
+        lp.integrality_ = integrality
+
+    h = highspy.Highs()
+    h.setOptionValue('mip_rel_gap', mip_gap)
+    h.setOptionValue('threads', threads or os.cpu_count())
+    if log_file is not None:
+        h.setOptionValue('log_file', log_file)
+    h.passModel(lp)
+    if x0 is not None:
+        start = highspy.HighsSolution()
+        start.col_value = x0.tolist()
+        h.setSolution(start)
+    h.run()
+
+    status = h.modelStatusToString(h.getModelStatus())
+    x = np.array(h.getSolution().col_value)
+    objective = h.getInfo().objective_function_value
+    gap = h.getInfo().mip_gap if mm.col_integer.any() else 0.0
+    if len(x) != mm.num_cols:
+        cprint("Warning: HiGHS found no solution", 'yellow')
+        return {'solver': 'highs', 'status': status, 'objective': None, 'gap': None, 'x': np.full(mm.num_cols, np.nan)}
+
+    return {'solver': 'highs', 'status': status, 'objective': objective, 'gap': gap, 'x': x}
+
+
+def _solve_gurobi(mm: MatrixModel, mip_gap: float, x0: np.ndarray = None, log_file: str = None, threads: int = None) -> dict:
+    """Pass the matrix model to Gurobi through the matrix API of gurobipy and solve it.
+    """
+
+    import gurobipy as gp
+
+    sense = np.select([mm.row_sense == 'E', mm.row_sense == 'L'], ['=', '<'], '>')
+
+    m = gp.Model()
+    m.Params.MIPGap = mip_gap
+    m.Params.Threads = threads or os.cpu_count()
+    if log_file is not None:
+        m.Params.LogFile = log_file
+    x = m.addMVar(mm.num_cols, lb=mm.col_lower, ub=mm.col_upper, obj=mm.col_cost, vtype=np.where(mm.col_integer, 'B', 'C'))
+    if x0 is not None:
+        x.Start = x0
+    m.addMConstr(mm.A, x, sense, mm.row_rhs)
+    m.optimize()
+
+    status = 'optimal' if m.Status == gp.GRB.OPTIMAL else 'status code ' + str(m.Status)
+    if m.SolCount == 0:
+        cprint("Warning: Gurobi found no solution", 'yellow')
+        return {'solver': 'gurobi', 'status': status, 'objective': None, 'gap': None, 'x': np.full(mm.num_cols, np.nan)}
+
+    gap = m.MIPGap if m.IsMIP else 0.0
+    return {'solver': 'gurobi', 'status': status, 'objective': m.ObjVal, 'gap': gap, 'x': x.X}
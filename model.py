@@ -1,19 +1,39 @@
 # import libraries to work with Pyomo models
 from data import *
+import argparse
+import json
 import logging
+import multiprocessing as mp
 import os
+import sys
+import traceback
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from itertools import product
 from pyomo.environ import *
 from pyomo.opt import SolverFactory
+from pyomo.contrib import appsi
+import networkx as nx
 import numpy as np
 import pandas as pd
 import geopandas as gpd
 import utils
+import matrix_model
+from warm_start import set_heuristic_solution
+from profiler import BuildProfiler
+import clustering
+import cache
 
 from termcolor import colored, cprint
 
 import time
+import tracemalloc
+
+
+# variables of the investment decisions, all other variables describe the operation
+INVESTMENT_VARIABLES = ['vCentralHeatProdInv', 'vTESCapacitivInv', 'vPipeMassFlowInv', 'vDHconnect', 'vBinBuildPipe']
+# variables defined by equality constraints, which can be substituted by expressions (eliminate_equality_variables)
+ELIMINATED_VARIABLES = ['vMFConsumption', 'vMFInjection', 'vTESDischarge']
 
 
 class HeatNetworkModel(ConcreteModel):
@@ -24,7 +44,8 @@ class HeatNetworkModel(ConcreteModel):
         """Constructor method for the HeatNetworkModel class. It calls the parent class's constructor and
         initializes the model's data structures.
 
-        :param scenario_name: name of the scenario, used for the model name and logging
+        :param scenario_name: name of the model, used for logging and the solver log file (case study and scenario,
+            e.g. "<case_study>_<scenario>")
         :type scenario_name: str
         :param logger: optional logger to log the model's solution process. If not provided, logging is disabled.
         :type logger: _type_, optional
@@ -33,10 +54,18 @@ class HeatNetworkModel(ConcreteModel):
         super().__init__(name=scenario_name)
         self.data_dict = {}
         self.logging = False
+        self.aggregated = False
+        self.lazy_hours = None
+        self.lazy_rules = {}
+        self.eliminated_variables = False
+        self.solve_info = {}
 
         if logger is not None:
             self.logger = logger
             self.logging = True
+
+        # prints and logs the time of the build stages, records their profile if enabled (see profiler.BuildProfiler)
+        self.profiler = BuildProfiler(logger)
     
     
     def fill_model_data(self, input_dict:dict):
@@ -73,16 +102,18 @@ class HeatNetworkModel(ConcreteModel):
         self.n = hn # Thermal nodes
         self.h = hours # Hourly index
 
-        # General parameters
-        self.pCostHNS = Param(initialize=dict_parameter_cost['pCostHNS'])
-        self.pCostPumping = Param(initialize=dict_parameter_cost['pCostPumping']) 
+        # General parameters, the costs are mutable to update them without rebuilding the model (see run_sweep)
+        self.pCostHNS = Param(initialize=dict_parameter_cost['pCostHNS'], mutable=True)
+        self.pCostPumping = Param(initialize=dict_parameter_cost['pCostPumping'], mutable=True)
         self.pTsupply = Param(initialize=dict_parameter_cost['pTsupply'])
         self.pTreturn = Param(initialize=dict_parameter_cost['pTreturn'])
 
-        self.pPipeCostIni = Param(initialize=dict_parameter_cost['pPipeCostIni'])
-        self.pPipeCostSlope = Param(initialize=dict_parameter_cost['pPipeCostsSlope'])
+        self.pPipeCostIni = Param(initialize=dict_parameter_cost['pPipeCostIni'], mutable=True)
+        self.pPipeCostSlope = Param(initialize=dict_parameter_cost['pPipeCostsSlope'], mutable=True)
         self.pMassFlowIni = Param(initialize=dict_parameter_cost['pMassFlowIni'])
         self.pAllowDoubleHeating = Param(initialize=dict_parameter_cost['allow_double_heating'])
+        # with undirected pipes both directions of a pipe candidate share one investment and one binary
+        self.undirected_pipes = bool(dict_parameter_cost.get('undirected_pipes', 0))
 
 
         # will be replaced by a parameter of heat gen units later
@@ -91,511 +122,1405 @@ class HeatNetworkModel(ConcreteModel):
         # Physical parameters, in kWh/(m³*K) water at standard conditions
         self.pCWater = Param(initialize=1.16389)
 
+        # time structure: the full year with unit weights or representative periods (typical days) with the number of
+        # days they represent as weights, see clustering.aggregate_typical_days
+        time_structure = input_dict.get('time_structure')
+        self.aggregated = time_structure is not None
+        dict_hour_weight = {h: 1.0 for h in self.h}
+        if self.aggregated:
+            hours_per_period = time_structure['hours_per_period']
+            period_of_hour = np.arange(len(self.h)) // hours_per_period
+            self.p = np.arange(len(time_structure['period_weights']))  # Representative periods
+            self.d = np.arange(len(time_structure['period_of_day']))  # Days of the full time series
+            self.period_of_day = dict(zip(self.d, time_structure['period_of_day']))
+            self.period_of_hour = dict(zip(self.h, period_of_hour))
+            self.period_first_hour = {p: self.h[p * hours_per_period] for p in self.p}
+            self.period_last_hour = {p: self.h[(p + 1) * hours_per_period - 1] for p in self.p}
+            self.pHoursPerPeriod = Param(initialize=hours_per_period)
+            dict_hour_weight = dict(zip(self.h, np.asarray(time_structure['period_weights'], dtype=float)[period_of_hour]))
+
+        self.pHourWeight = Param(self.h, initialize=dict_hour_weight, within=NonNegativeReals)
+
+
+        with self.profiler.stage("create heat network dictionary", "Created heat network dictionary", self):
+            # dictionary to create the heat network, the first two columns hold the nodes of the pipe candidate
+            dict_heat_network = dict(zip(zip(df_heat_network.iloc[:, 0], df_heat_network.iloc[:, 1]), df_heat_network['distance']))
+
+        with self.profiler.stage("add parameters", "Created sets", self):
+            # use the network dictionary  to create the connections index
+            self.pc = Set(initialize=[(n1, n2) for n1, n2 in dict_heat_network.keys()]) # Pipe candidate connections
+            # pipe investments: one per pipe candidate, or one per undirected edge (in the direction of its first candidate)
+            self.pipe_edge = {}
+            for (n1, n2) in dict_heat_network.keys():
+                reverse = (n2, n1)
+                self.pipe_edge[(n1, n2)] = reverse if self.undirected_pipes and reverse in self.pipe_edge else (n1, n2)
+            self.edge_pc = {}
+            for pc, edge in self.pipe_edge.items():
+                self.edge_pc.setdefault(edge, []).append(pc)
+            self.pe = Set(initialize=list(self.edge_pc.keys()))  # Pipe investments
+            self.hg = Set(initialize=df_heat_gen_units.source.unique())  # Heat generation units
+            self.hgn = Set(initialize=list(zip(df_heat_gen_units.source, df_heat_gen_units.heat_unit_id)))  # Assignment of heat gen units to nodes
+            self.tes = Set(within=self.hg, initialize=df_heat_gen_units[df_heat_gen_units.isTES == 1].source.unique())  # Thermal energy storage
+            self.hb = Set(within=self.hg, initialize=df_heat_gen_units[df_heat_gen_units.isBoiler == 1].source.unique())  # Heat boilers
 
-        start = time.time()
+            if df_waste_heat_prof is not None:
+                self.wh = Set(within=self.hg, initialize=df_waste_heat_prof.columns[1:])  # Waste heat generation units
+            else:
+                self.wh = Set(within=self.hg)  # Waste heat generation units
+
+        with self.profiler.stage("created heat demand dictionary", "Created heat demand dictionary", self):
+            # node attributes through one frame indexed by node (first entry per node, as in the input order)
+            df_nodes = df_heat_nodes.drop_duplicates(subset='node').set_index('node').loc[list(self.n)]
+            dict_cost_dh_connect = df_nodes['CostsDHconnect'].to_dict()
+            dict_max_dh_power = df_nodes['maxDHPower'].to_dict()
+            dict_local_heat_prod_cost = df_nodes['LocalHeatProdCost'].to_dict()
+
+            # convert the wide heat demand table (one column per node) to a (node, hour) -> demand mapping in one step
+            df_heat_demand_long = df_heat_demand.melt(id_vars='hour', value_vars=list(self.n), var_name='node', value_name='demand')
+            dict_heat_demand = dict(zip(zip(df_heat_demand_long['node'], df_heat_demand_long['hour'].astype(int)), df_heat_demand_long['demand']))
+
+        with self.profiler.stage("add heat demand data", "Added heat demand data", self):
+            self.pHeatDemand = Param(self.n, self.h, initialize=dict_heat_demand, within=NonNegativeReals)
+            self.pCostDHConnect = Param(self.n, initialize=dict_cost_dh_connect, within=NonNegativeReals, mutable=True)
+            self.pMaxDHPower = Param(self.n, initialize=dict_max_dh_power, within=NonNegativeReals)
+            self.pCostLocalHeatProd = Param(self.n, initialize=dict_local_heat_prod_cost, within=NonNegativeReals, mutable=True)
+            self.pPipeLength = Param(self.pc, initialize=dict_heat_network, within=NonNegativeReals)
+            # upper bounds of the mass flow and the mass flow investment per pipe investment (big-Ms), see tighten_bounds
+            self.pMaxPipeMF = Param(self.pe, initialize=value(self.pMassFlowIni) + 1e4, within=NonNegativeReals, mutable=True)
+            self.pMaxPipeMFInv = Param(self.pe, initialize=1e4, within=NonNegativeReals, mutable=True)
+
+        with self.profiler.stage("add heat generation dictionaries", "Created heat generation dictionaries", self):
+            # unit attributes through one frame indexed by unit (first entry per unit), missing costs are not initialized
+            df_units = df_heat_gen_units.drop_duplicates(subset='source').set_index('source')
+            dict_cost_central_heat_prod = df_units['OMVarCost'].dropna().to_dict()
+            dict_cost_central_heat_prod_inv = df_units['PowerInvCost'].dropna().to_dict()
+            dict_cost_tes_inv = df_units.loc[df_units.isTES == 1, 'StorageInvCost'].dropna().to_dict()
+
+            # convert the wide waste heat profiles (one column per unit) to a (unit, hour) -> mass flow mapping in one step
+            dict_waste_heat_prof = {}
+            if df_waste_heat_prof is not None:
+                df_waste_heat_prof_long = df_waste_heat_prof.melt(id_vars='hour', value_vars=list(self.wh), var_name='source', value_name='mass_flow')
+                dict_waste_heat_prof = dict(zip(zip(df_waste_heat_prof_long['source'], df_waste_heat_prof_long['hour'].astype(int)), df_waste_heat_prof_long['mass_flow']))
+
+        with self.profiler.stage("add heat generation parameters", "Added heat generation data", self):
+            self.pMaxWHMF = Param(self.wh, self.h, initialize=dict_waste_heat_prof, within=NonNegativeReals)
+            self.pCostCentrHeatProd = Param(self.hg, initialize=dict_cost_central_heat_prod, within=NonNegativeReals, mutable=True)
+            self.pCostCentralHeatProdInv = Param(self.hg, initialize=dict_cost_central_heat_prod_inv, within=NonNegativeReals, mutable=True)
+            self.pCostTESInv = Param(self.tes, initialize=dict_cost_tes_inv, within=NonNegativeReals, mutable=True)
+
+            # keep the time series as dense arrays (rows in the order of the sets, columns in the order of the hours)
+            # for the array based code paths, e.g. the matrix backend
+            self.data_dict['heat_demand'] = df_heat_demand[list(self.n)].to_numpy(dtype=float).T
+            self.data_dict['waste_heat_prof'] = np.empty((0, len(self.h)))
+            if df_waste_heat_prof is not None:
+                self.data_dict['waste_heat_prof'] = df_waste_heat_prof.set_index(df_waste_heat_prof['hour'].astype(int)).reindex(self.h)[list(self.wh)].to_numpy(dtype=float).T
 
-        # dictionary to create the heat network
-        dict_heat_network = {}
-        for idx, row in df_heat_network.iterrows():
-            dict_heat_network[(row.iat[0], row.iat[1])] = row['distance'] 
+            # optional TES level before the first hour (e.g. carried over between the windows of a rolling horizon),
+            # without it the TES balance is cyclic
+            if input_dict.get('tes_initial_level') is not None:
+                self.pTESInitialLevel = Param(self.tes, initialize=input_dict['tes_initial_level'], within=NonNegativeReals)
+                self.data_dict['tes_initial_level'] = np.array([input_dict['tes_initial_level'][tes] for tes in self.tes], dtype=float)
 
+        # node indices used by the node based constraint rules
+        self.build_node_indices()
 
         if self.logging:
-            self.logger.info("Created heat network dictionary - {:.2f}".format(time.time() - start))
+            self.logger.info("######################")
+            self.logger.info("End: fill model data")
+            self.logger.info("######################")
 
-        print("Done: create heat network dictionary")
-        print("Time: ", time.time() - start)
-        start = time.time()
 
-        # use the network dictionary  to create the connections index
-        self.pc = Set(initialize=[(n1, n2) for n1, n2 in dict_heat_network.keys()]) # Pipe candidate connections
-        self.hg = Set(initialize=df_heat_gen_units.source.unique())  # Heat generation units
-        self.hgn = Set(initialize=[(row.source, row.heat_unit_id) for idx, row in df_heat_gen_units.iterrows()])  # Assignment of heat gen units to nodes
-        self.tes = Set(within=self.hg, initialize=df_heat_gen_units[df_heat_gen_units.isTES == 1].source.unique())  # Thermal energy storage
-        self.hb = Set(within=self.hg, initialize=df_heat_gen_units[df_heat_gen_units.isBoiler == 1].source.unique())  # Heat boilers
+    def build_node_indices(self):
+        """Precompute the node based indices of the pipe candidates and heat generation units.
 
-        if df_waste_heat_prof is not None:
-            self.wh = Set(within=self.hg, initialize=df_waste_heat_prof.columns[1:])  # Waste heat generation units
-        else:
-            self.wh = Set(within=self.hg)  # Waste heat generation units
+        The node based rules (mass flow balance, mass flow injection) are evaluated for every node and hour. Instead of
+        scanning all pipe candidates and unit assignments in every evaluation, the incoming/outgoing pipes and the units
+        per node are collected once after the model data is filled.
+        """
+
+        with self.profiler.stage("create node indices", "Created node indices", self):
+            # incoming and outgoing pipe candidates per node
+            self.node_pc_in = {n: [] for n in self.n}
+            self.node_pc_out = {n: [] for n in self.n}
+            for (n, m) in self.pc:
+                if n in self.node_pc_out:
+                    self.node_pc_out[n].append(m)
+                if m in self.node_pc_in:
+                    self.node_pc_in[m].append(n)
+
+            # nodes of every heat generation unit
+            unit_nodes = {}
+            for (hg, n) in self.hgn:
+                unit_nodes.setdefault(hg, []).append(n)
+
+            # heat generation units per node, separated by type (keeps the order of the unit sets)
+            self.node_tes = {n: [] for n in self.n}
+            self.node_wh = {n: [] for n in self.n}
+            self.node_hb = {n: [] for n in self.n}
+            for units, node_units in ((self.tes, self.node_tes), (self.wh, self.node_wh), (self.hb, self.node_hb)):
+                for hg in units:
+                    for n in unit_nodes.get(hg, []):
+                        if n in node_units:
+                            node_units[n].append(hg)
 
 
+    def initialize_variables(self):
+        """Initialize the variables of the model.
+        """
 
         if self.logging:
-            self.logger.info("Created heat network dictionary - {:.2f}".format(time.time() - start))
+            self.logger.info("###########################")
+            self.logger.info("Start: initialize variables")
+            self.logger.info("###########################")
 
-        print("Done: add parameters")
-        print("Time: ", time.time() - start)
-        start = time.time()
+        with self.profiler.stage("add variables", "Added variables", self):
+            # Continuous variables
+            #self.vTotalVCost = Var(domain=NonNegativeReals)
+            self.vMF = Var(self.pc, self.h, domain=NonNegativeReals)
+            self.vHNS = Var(self.n, self.h, domain=NonNegativeReals)
+            self.vLocalHeatProd = Var(self.n, self.h, domain=NonNegativeReals)
+            self.vMFConsumption = Var(self.n, self.h, domain=NonNegativeReals)
+            self.vMFInjection = Var(self.n, self.h, domain=NonNegativeReals)
+            self.vCentralHeatProd = Var(self.hg, self.h, domain=NonNegativeReals)
+            self.vCentralHeatProdInv = Var(self.hg, domain=NonNegativeReals)
+            # the storage variables only exist for the TES units, on representative periods the level is relative to the
+            # start of the period and can become negative
+            self.vTESLevel = Var(self.tes, self.h, domain=Reals if self.aggregated else NonNegativeReals)
+            self.vTESCharge = Var(self.tes, self.h, domain=NonNegativeReals)
+            self.vTESDischarge = Var(self.tes, self.h, domain=NonNegativeReals)
+            self.vTESCapacitivInv = Var(self.tes, domain=NonNegativeReals)
+            self.vPipeMassFlowInv = Var(self.pe, domain=NonNegativeReals)
+
+            if self.aggregated:
+                # TES level at the start of every day and the range of the relative level within every period
+                self.vTESLevelInter = Var(self.tes, self.d, domain=NonNegativeReals)
+                self.vTESLevelIntraMax = Var(self.tes, self.p, domain=NonNegativeReals)
+                self.vTESLevelIntraMin = Var(self.tes, self.p, domain=NonPositiveReals)
+
+            # Binary variables
+            self.vDHconnect = Var(self.n, domain=Binary, initialize=0)
+            self.vBinBuildPipe = Var(self.pe, domain=Binary)
 
-        # add the heat demand data to the model
-        dict_cost_dh_connect = {}
-        dict_heat_demand = {}
-        dict_max_dh_power = {}
-        dict_local_heat_prod_cost = {}
-        for n in self.n:
-            # create connection cost
-            dict_cost_dh_connect[n] = df_heat_nodes[df_heat_nodes.node == n].CostsDHconnect.values[0]
-            # create max dh power
-            dict_max_dh_power[n] = df_heat_nodes[df_heat_nodes.node == n].maxDHPower.values[0]
-            # create local heat production cost
-            dict_local_heat_prod_cost[n] = df_heat_nodes[df_heat_nodes.node == n].LocalHeatProdCost.values[0]
-            aux_df = df_heat_demand.loc[:, ['hour', n]]
-
-            # this could be improved to use itertuples, but it is not a bottleneck right now
-            for idx, row in aux_df.iterrows():
-                dict_heat_demand[(n, int(row['hour']))] = row[n]
+        if self.logging:
+            self.logger.info("###########################")
+            self.logger.info("End: initialize variables")
+            self.logger.info("###########################")
 
+    
+    def tighten_bounds(self):
+        """Tighten the big-Ms of the pipes to the largest mass flow that can physically pass every pipe candidate and
+        set them as upper bounds of vMF and vPipeMassFlowInv. Requires fill_model_data and initialize_variables.
+
+        Removing a bridge of the candidate network (every pipe of the tree of clustering.propose_network) splits it
+        into two sides. The flow in one direction is limited by the consumption that can be supplied on the downstream
+        side (demand up to the maximum district heating power) and by the waste heat that can be injected on the
+        upstream side. Boilers and TES units are not limited by the input data, a side with a boiler or TES unit does
+        not limit the flow. Pipes in meshes are limited by the totals of their connected network.
+        """
+
+        with self.profiler.stage("tighten bounds", "Tightened bounds", self):
+            nodes = list(self.n)
+            node_pos = {n: i for i, n in enumerate(nodes)}
+            dT_cw = value((self.pTsupply - self.pTreturn) * self.pCWater)
+            mass_flow_ini = value(self.pMassFlowIni)
+
+            # hourly upper bounds of the consumption and of the waste heat injection per node as mass flows
+            max_dh_power = np.array([self.pMaxDHPower[n] for n in nodes], dtype=float)
+            consumption = np.minimum(self.data_dict['heat_demand'], max_dh_power[:, None]) / dT_cw
+            injection = np.zeros_like(consumption)
+            wh_pos = {wh: i for i, wh in enumerate(self.wh)}
+            for n in nodes:
+                for wh in self.node_wh[n]:
+                    injection[node_pos[n]] += np.nan_to_num(self.data_dict['waste_heat_prof'][wh_pos[wh]])
+            # nodes that can take (TES) or inject (boiler, TES) mass flows without a limit in the input data
+            unlimited_sink = np.array([len(self.node_tes[n]) for n in nodes])
+            unlimited_source = np.array([len(self.node_hb[n]) + len(self.node_tes[n]) for n in nodes])
+
+            # 2-edge-connected components of the candidate network, connected by the bridges to a forest
+            graph = nx.Graph()
+            graph.add_nodes_from(nodes)
+            graph.add_edges_from(self.pc)
+            bridges = list(nx.bridges(graph))
+            graph.remove_edges_from(bridges)
+            components = list(nx.connected_components(graph))
+            comp_of = {n: c for c, comp in enumerate(components) for n in comp}
+
+            def component_sum(values):
+                summed = np.zeros((len(components),) + values.shape[1:])
+                np.add.at(summed, [comp_of[n] for n in nodes], values)
+                return summed
+
+            sub_consumption = component_sum(consumption)
+            sub_injection = component_sum(injection)
+            sub_sink = component_sum(unlimited_sink)
+            sub_source = component_sum(unlimited_source)
+
+            # sums over the subtrees of the forest of components and over the trees (totals of the connected networks)
+            forest = nx.Graph()
+            forest.add_nodes_from(range(len(components)))
+            forest.add_edges_from((comp_of[n], comp_of[m]) for n, m in bridges)
+            parent = {}
+            root_of = {}
+            for tree in nx.connected_components(forest):
+                root = min(tree)
+                root_of.update(dict.fromkeys(tree, root))
+                parent.update(dict(nx.bfs_predecessors(forest, root)))
+                for c in reversed(list(nx.bfs_tree(forest, root))):
+                    if c in parent:
+                        for sub in (sub_consumption, sub_injection, sub_sink, sub_source):
+                            sub[parent[c]] += sub[c]
+
+            def flow_bound(sink, source, sink_unlimited, source_unlimited):
+                # largest hourly flow into the side with the given consumption from the side with the given injection
+                if sink_unlimited > 0 and source_unlimited > 0:
+                    return np.inf
+                if sink_unlimited > 0:
+                    return source.max()
+                if source_unlimited > 0:
+                    return sink.max()
+                return np.minimum(sink, source).max()
+
+            bounds = {}
+            for (n, m) in self.pc:
+                a, b = comp_of[n], comp_of[m]
+                total = root_of[a]
+                if a == b:
+                    bound = flow_bound(sub_consumption[total], sub_injection[total], sub_sink[total], sub_source[total])
+                elif parent.get(b) == a:
+                    # the pipe flows into the subtree of m
+                    bound = flow_bound(sub_consumption[b], sub_injection[total] - sub_injection[b], sub_sink[b], sub_source[total] - sub_source[b])
+                else:
+                    # the pipe flows out of the subtree of n
+                    bound = flow_bound(sub_consumption[total] - sub_consumption[a], sub_injection[a], sub_sink[total] - sub_sink[a], sub_source[a])
+
+                bounds[n, m] = bound
+                if bound < value(self.pMaxPipeMF[self.pipe_edge[n, m]]):
+                    for h in self.h:
+                        self.vMF[n, m, h].setub(bound)
+
+            # an undirected pipe must carry the larger flow of both directions
+            num_tightened = 0
+            for edge in self.pe:
+                bound = max(bounds[pc] for pc in self.edge_pc[edge])
+                if bound < value(self.pMaxPipeMF[edge]):
+                    num_tightened += 1
+                    self.pMaxPipeMF[edge] = bound
+                    self.pMaxPipeMFInv[edge] = max(bound - mass_flow_ini, 0.0)
+                    self.vPipeMassFlowInv[edge].setub(max(bound - mass_flow_ini, 0.0))
 
         if self.logging:
-            self.logger.info("Created heat demand dictionary - {:.2f}".format(time.time() - start))
+            self.logger.info("Tightened the bounds of {} of {} pipes".format(num_tightened, len(self.pe)))
 
+        print(f"Info: Tightened the bounds of {num_tightened} of {len(self.pe)} pipes")
 
-        print("Done: created heat demand dictionary")
-        print("Time: ", time.time() - start)
-        start = time.time()
 
-        self.pHeatDemand = Param(self.n, self.h, initialize=dict_heat_demand, within=NonNegativeReals)
-        self.pCostDHConnect = Param(self.n, initialize=dict_cost_dh_connect, within=NonNegativeReals)
-        self.pMaxDHPower = Param(self.n, initialize=dict_max_dh_power, within=NonNegativeReals)
-        self.pCostLocalHeatProd = Param(self.n, initialize=dict_local_heat_prod_cost,within=NonNegativeReals)
-        self.pPipeLength = Param(self.pc, initialize=dict_heat_network, within=NonNegativeReals)
+    def eliminate_equality_variables(self):
+        """Replace the variables that are defined by equality constraints by expressions of their definitions:
+        vMFConsumption (energy_balance), vMFInjection (mf_injection) and vTESDischarge (tes_production). The
+        expressions keep the names of the variables, so that the constraints using them are built unchanged, and the
+        defining constraints are not built. This saves a variable and a row per node (TES unit) and hour in the model
+        passed to the solver. Requires initialize_variables, is called by initialize_constraints.
+        """
 
+        with self.profiler.stage("eliminate equality variables", "Eliminated equality variables", self):
+            for name in ELIMINATED_VARIABLES:
+                self.del_component(name)
+                if self.component(name + '_index') is not None:
+                    self.del_component(name + '_index')
 
-        if self.logging:
-            self.logger.info("Added heat demand data - {:.2f}".format(time.time() - start))
+            def consumption_rule(model, n, h):
+                return (model.pHeatDemand[n, h] - model.vLocalHeatProd[n, h] - model.vHNS[n, h]) / ((model.pTsupply - model.pTreturn) * model.pCWater)
+            self.vMFConsumption = Expression(self.n, self.h, rule=consumption_rule)
 
-        print("Done: add heat demand data")
-        print("Time: ", time.time() - start)
-        start = time.time()
+            def injection_rule(model, n, h):
+                return sum(model.vCentralHeatProd[hg, h] for hg in model.node_wh[n] + model.node_hb[n] + model.node_tes[n]) / ((model.pTsupply - model.pTreturn) * model.pCWater)
+            self.vMFInjection = Expression(self.n, self.h, rule=injection_rule)
 
+            def tes_discharge_rule(model, tes, h):
+                return model.vCentralHeatProd[tes, h] / ((model.pTsupply - model.pTreturn) * model.pCWater)
+            self.vTESDischarge = Expression(self.tes, self.h, rule=tes_discharge_rule)
 
-        dict_waste_heat_prof = {}
-        dict_cost_central_heat_prod = {}
-        dict_cost_central_heat_prod_inv = {}
-        dict_cost_tes_inv = {}
-        for hg in self.hg:
-            if not(np.isnan(df_heat_gen_units[df_heat_gen_units.source == hg].OMVarCost.values[0])):
-                dict_cost_central_heat_prod[hg] = df_heat_gen_units[df_heat_gen_units.source == hg].OMVarCost.values[0]
-            if not (np.isnan(df_heat_gen_units[df_heat_gen_units.source == hg].PowerInvCost.values[0])):
-                dict_cost_central_heat_prod_inv[hg] = df_heat_gen_units[df_heat_gen_units.source == hg].PowerInvCost.values[0]
-            if (df_heat_gen_units[df_heat_gen_units.source == hg].isTES.values[0] == 1 and
-                    not (np.isnan(df_heat_gen_units[df_heat_gen_units.source == hg].StorageInvCost.values[0]))):
-                dict_cost_tes_inv[hg] = df_heat_gen_units[df_heat_gen_units.source == hg].StorageInvCost.values[0]
+            self.eliminated_variables = True
 
-            if df_waste_heat_prof is not None:
-                if hg in df_waste_heat_prof.columns:
-                    for idx, row in df_waste_heat_prof.iterrows():
-                        dict_waste_heat_prof[(hg, row['hour'])]  = row[hg]
 
-        if self.logging:
-            self.logger.info("Created heat generation dictionaries - {:.2f}".format(time.time() - start))
+    def initialize_constraints(self, lazy_hours: list = None, eliminate_equalities: bool = False):
+        """Initialize the constraints of the model.
 
-        print("Done: add heat generation dictionaries")
-        print("Time: ", time.time() - start)
-        start = time.time()
+        :param lazy_hours: hours for which the hourly capacity constraints (max_mass_flow, max_power_invest,
+            tes_storage_invest) are built, the rows of the other hours are added when violated (see run_cutting_plane).
+            Defaults to None, which builds all rows.
+        :type lazy_hours: list, optional
+        :param eliminate_equalities: substitute the variables defined by equality constraints, see
+            eliminate_equality_variables, defaults to False
+        :type eliminate_equalities: bool, optional
+        """
 
-        self.pMaxWHMF = Param(self.hg, self.h, initialize=dict_waste_heat_prof, within=NonNegativeReals)
-        self.pCostCentrHeatProd = Param(self.hg, initialize=dict_cost_central_heat_prod, within=NonNegativeReals)
-        self.pCostCentralHeatProdInv = Param(self.hg, initialize=dict_cost_central_heat_prod_inv, within=NonNegativeReals)
-        self.pCostTESInv = Param(self.hg, initialize=dict_cost_tes_inv, within=NonNegativeReals)
+        self.lazy_hours = sorted(lazy_hours) if lazy_hours is not None else None
+        if eliminate_equalities and not self.eliminated_variables:
+            self.eliminate_equality_variables()
 
         if self.logging:
-            self.logger.info("Added heat generation data - {:.2f}".format(time.time() - start))
+            self.logger.info("#############################")
+            self.logger.info("Start: initialize constraints")
+            self.logger.info("#############################")
 
-        print("Done: add heat generation parameters")
-        print("Time: ", time.time() - start)
 
-        if self.logging:
-            self.logger.info("######################")
-            self.logger.info("End: fill model data")
-            self.logger.info("######################")
+        with self.profiler.stage("add objective function", "Added objective function", self):
+            def hourly_cost_function(model, h):
+                return (
+                    sum(model.pCostHNS * model.vHNS[n, h] for n in model.n) +
+                    sum(model.pCostLocalHeatProd[n] * model.vLocalHeatProd[n, h] for n in model.n) +
+                    sum(model.pCostCentrHeatProd[hg] * model.vCentralHeatProd[hg, h] for hg in model.hg) +
+                    sum(model.pCostPumping * model.pPipeLength[n,m] * model.vMF[n, m, h] for (n, m) in model.pc)
+                )
 
+            self.hourly_cost = Expression(self.h, rule=hourly_cost_function)
 
-    
-    def initialize_variables(self):
-        """Initialize the variables of the model.
-        """
+            # Objective function
+            def objective_function(model):
+                return (
+                    sum(model.pCostDHConnect[n] * model.vDHconnect[n] for n in model.n) +
+                    sum(model.pCostCentralHeatProdInv[hg] * model.vCentralHeatProdInv[hg] for hg in model.hg) +
+                    sum(model.pCostTESInv[tes] * model.vTESCapacitivInv[tes] for tes in model.tes) +
+                    sum(model.pPipeCostIni * model.pPipeLength[n, m] * model.vBinBuildPipe[n, m] for (n, m) in model.pe) +
+                    sum(model.pPipeCostSlope * model.pPipeLength[n, m] * model.vPipeMassFlowInv[n, m] for (n, m) in model.pe) +  # tbd add variable slope price
+                    sum(model.pHourWeight[h] * model.hourly_cost[h] for h in model.h)
+                )
+            self.obj = Objective(rule=objective_function, sense=minimize)
+
+        with self.profiler.stage("add energy balance", "Added energy balance", self):
+            if not self.eliminated_variables:
+                # Energy balance in kW for ever heat node and hour
+                def energy_balance_rule(model, n, h):
+                    return (
+                        model.vMFConsumption[n, h] == (model.pHeatDemand[n, h] - model.vLocalHeatProd[n, h] - model.vHNS[n, h]) / ((model.pTsupply - model.pTreturn) * model.pCWater)
+                    )
+                self.energy_balance = Constraint(self.n, self.h, rule=energy_balance_rule)
+            else:
+                # The consumption is substituted by the energy balance, it must stay nonnegative
+                def energy_balance_rule(model, n, h):
+                    return (
+                        model.vLocalHeatProd[n, h] + model.vHNS[n, h] <= model.pHeatDemand[n, h]
+                    )
+                self.energy_balance = Constraint(self.n, self.h, rule=energy_balance_rule)
+
+        with self.profiler.stage("add max dh power", "Added max. district heating consumption", self):
+            # Limits use of distrct heating only to connected nodes and to a maximum power (as a specific bigM), the
+            # consumption can not exceed the heat demand of the hour
+            def max_dh_power_rule(model, n, h):
+                return (
+                    model.vMFConsumption[n, h] <= model.vDHconnect[n] * min(model.pMaxDHPower[n], model.pHeatDemand[n, h]) / ((model.pTsupply - model.pTreturn) * model.pCWater)
+                )
+            self.max_dh_power = Constraint(self.n, self.h, rule=max_dh_power_rule)
 
-        if self.logging:
-            self.logger.info("###########################")
-            self.logger.info("Start: initialize variables")
-            self.logger.info("###########################")
+        with self.profiler.stage("add mf balance", "Added mass flow balance system", self):
+            # Mass flow balacne between all nodes
+            def mf_balance_rule(model, n, h):
+                return (
+                    model.vMFConsumption[n, h] +
+                    sum(model.vTESCharge[tes, h] for tes in model.node_tes[n]) -
+                    model.vMFInjection[n, h] ==
+                    sum(model.vMF[m, n, h] for m in model.node_pc_in[n]) -
+                    sum(model.vMF[n, m, h] for m in model.node_pc_out[n])
+                )
+            self.mf_balance = Constraint(self.n, self.h, rule=mf_balance_rule)
 
-        start = time.time()
+        if not self.eliminated_variables:
+            with self.profiler.stage("add mf injection", "Added mass flow balance node", self):
+                # Mass flow injection into the network
+                def mf_injection_rule(model, n, h):
+                    return (
+                        model.vMFInjection[n,h] ==
+                        sum(model.vCentralHeatProd[wh, h] for wh in model.node_wh[n]) / ((model.pTsupply - model.pTreturn) * model.pCWater) +
+                        sum(model.vCentralHeatProd[hb, h] for hb in model.node_hb[n]) / ((model.pTsupply - model.pTreturn) * model.pCWater) +
+                        sum(model.vCentralHeatProd[tes, h] for tes in model.node_tes[n]) / ((model.pTsupply - model.pTreturn) * model.pCWater)
+                    )
+                self.mf_injection = Constraint(self.n, self.h, rule=mf_injection_rule)
 
-        # Continuous variables
-        #self.vTotalVCost = Var(domain=NonNegativeReals)
-        self.vMF = Var(self.pc, self.h, domain=NonNegativeReals)
-        self.vHNS = Var(self.n, self.h, domain=NonNegativeReals)
-        self.vLocalHeatProd = Var(self.n, self.h, domain=NonNegativeReals)
-        self.vMFConsumption = Var(self.n, self.h, domain=NonNegativeReals)
-        self.vMFInjection = Var(self.n, self.h, domain=NonNegativeReals)
-        self.vCentralHeatProd = Var(self.hg, self.h, domain=NonNegativeReals)
-        self.vCentralHeatProdInv = Var(self.hg, domain=NonNegativeReals)
-        self.vTESLevel = Var(self.hg, self.h, domain=NonNegativeReals)
-        self.vTESCharge = Var(self.hg, self.h, domain=NonNegativeReals)
-        self.vTESDischarge = Var(self.hg, self.h, domain=NonNegativeReals)
-        self.vTESCapacitivInv = Var(self.hg, domain=NonNegativeReals)
-        self.vPipeMassFlowInv = Var(self.pc, domain=NonNegativeReals)
-
-        # Binary variables
-        self.vDHconnect = Var(self.n, domain=Binary, initialize=0)
-        self.vBinBuildPipe = Var(self.pc, domain=Binary)
 
+        if self.pAllowDoubleHeating == 0:
+            with self.profiler.stage("add decentral condition", "Added local heating", self):
+                # Exclude decentral heating for nodes that are connected to the network
+                def decentral_condition_rule(model, n, h):
+                    return (
+                        model.vLocalHeatProd[n, h] <= (1 - model.vDHconnect[n]) * min(model.pMaxDHPower[n], model.pHeatDemand[n, h])
+                    )
+                self.decentral_condition = Constraint(self.n, self.h, rule=decentral_condition_rule)
+
+                print('Info: No decentral heating allowed when building connected to the network')
+        else:
+            print('Info: Decentral heating allowed when building connected to the network!')
 
-        if self.logging:
-            self.logger.info("Added variables - {:.2f}".format(time.time() - start))
 
-        print("Done: add variables")
-        print("Time: ", time.time() - start)
+        with self.profiler.stage("add max wh power", "Added max. waste heat", self):
+            # Limit the maximum power of the waste heat generation units
+            def max_wh_power_rule(model, wh, h):
+                return (
+                    model.vCentralHeatProd[wh, h] <= model.pMaxWHMF[wh, h] * (model.pTsupply - model.pTreturn) * model.pCWater
+                )
+            self.max_wh_power = Constraint(self.wh, self.h, rule=max_wh_power_rule)
+
+        if not self.eliminated_variables:
+            with self.profiler.stage("add tes production", "Added thermal storage production", self):
+                # calculate the heat production of the TES
+                def tes_production_rule(model, tes, h):
+                    return (
+                        model.vCentralHeatProd[tes, h] == model.vTESDischarge[tes, h] * (model.pTsupply - model.pTreturn) * model.pCWater
+                    )
+                self.tes_production = Constraint(self.tes, self.h, rule=tes_production_rule)
+
+        with self.profiler.stage("add max power invest", "Added max. power invest", self):
+            # Limit the maximum power to investments
+            def max_power_invest_rule(model, hg, h):
+                return (
+                    model.vCentralHeatProd[hg, h] <= model.vCentralHeatProdInv[hg]
+                )
+            if self.lazy_hours is None:
+                self.max_power_invest = Constraint(self.hg, self.h, rule=max_power_invest_rule)
+            else:
+                self.max_power_invest = Constraint(self.hg, self.h)
+                self.add_lazy_rows(self.max_power_invest, max_power_invest_rule, [(hg, h) for hg in self.hg for h in self.lazy_hours])
+
+        with self.profiler.stage("add tes storage invest", "Added max. thermal storage invest", self):
+            if not self.aggregated:
+                # Limit the size of the storage to its investments
+                def tes_storage_invest_rule(model, tes, h):
+                    return (
+                        model.vTESLevel[tes,h] <= model.vTESCapacitivInv[tes]
+                    )
+                if self.lazy_hours is None:
+                    self.tes_storage_invest = Constraint(self.tes, self.h, rule=tes_storage_invest_rule)
+                else:
+                    self.tes_storage_invest = Constraint(self.tes, self.h)
+                    self.add_lazy_rows(self.tes_storage_invest, tes_storage_invest_rule, [(tes, h) for tes in self.tes for h in self.lazy_hours])
+            else:
+                # Range of the relative level within the representative periods
+                def tes_intra_max_rule(model, tes, h):
+                    return (
+                        model.vTESLevel[tes, h] <= model.vTESLevelIntraMax[tes, model.period_of_hour[h]]
+                    )
+                self.tes_intra_max = Constraint(self.tes, self.h, rule=tes_intra_max_rule)
+
+                def tes_intra_min_rule(model, tes, h):
+                    return (
+                        model.vTESLevel[tes, h] >= model.vTESLevelIntraMin[tes, model.period_of_hour[h]]
+                    )
+                self.tes_intra_min = Constraint(self.tes, self.h, rule=tes_intra_min_rule)
+
+                # Limit the size of the storage to its investments for every day of the full time series
+                def tes_storage_invest_rule(model, tes, d):
+                    return (
+                        model.vTESLevelInter[tes, d] + model.vTESLevelIntraMax[tes, model.period_of_day[d]] <= model.vTESCapacitivInv[tes]
+                    )
+                self.tes_storage_invest = Constraint(self.tes, self.d, rule=tes_storage_invest_rule)
+
+                def tes_storage_min_rule(model, tes, d):
+                    return (
+                        model.vTESLevelInter[tes, d] + model.vTESLevelIntraMin[tes, model.period_of_day[d]] >= 0
+                    )
+                self.tes_storage_min = Constraint(self.tes, self.d, rule=tes_storage_min_rule)
+
+        with self.profiler.stage("add tes balance", "Added thermal storage balance", self):
+            # Balance equation for the TES
+            def tes_balance_rule(model, tes, h):
+                # on representative periods the relative level starts at zero in every period
+                if model.aggregated and h == model.period_first_hour[model.period_of_hour[h]]:
+                    return model.vTESLevel[tes, h] == model.vTESCharge[tes, h] - model.vTESDischarge[tes, h]
+                # the first hour starts from the initial level if given, otherwise it wraps to the last hour of the time
+                # series (e.g. of a time block of the Benders subproblems)
+                if h == model.h[0] and model.component('pTESInitialLevel') is not None:
+                    return model.vTESLevel[tes, h] == model.pTESInitialLevel[tes] * (1 - model.pTESlosses) + model.vTESCharge[tes, h] - model.vTESDischarge[tes, h]
+                if h == model.h[0]: return model.vTESLevel[tes, h] == model.vTESLevel[tes, model.h[-1]] + model.vTESCharge[tes, h] - model.vTESDischarge[tes, h]
+                return (
+                    model.vTESLevel[tes, h] == model.vTESLevel[tes, h-1] * (1 - model.pTESlosses) + model.vTESCharge[tes, h] - model.vTESDischarge[tes, h]
+                )
+            self.tes_balance = Constraint(self.tes, self.h, rule=tes_balance_rule)
+
+            if self.aggregated:
+                # Link the days of the full time series through the level at the start of the day and the level change
+                # of the representative period of the day, the last day wraps to the first
+                def tes_inter_balance_rule(model, tes, d):
+                    return (
+                        model.vTESLevelInter[tes, (d + 1) % len(model.d)] ==
+                        model.vTESLevelInter[tes, d] * (1 - model.pTESlosses) ** model.pHoursPerPeriod +
+                        model.vTESLevel[tes, model.period_last_hour[model.period_of_day[d]]]
+                    )
+                self.tes_inter_balance = Constraint(self.tes, self.d, rule=tes_inter_balance_rule)
+
+        with self.profiler.stage("build max mass flow", "Added mass flow pipe", self):
+            # Limit mass flow through the pipes, both directions of an undirected pipe share its investment
+            def max_mass_flow_rule(model, n, m, h):
+                return (
+                    sum(model.vMF[pc + (h,)] for pc in model.edge_pc[n, m]) <= model.vBinBuildPipe[n, m] * model.pMassFlowIni + model.vPipeMassFlowInv[n, m]
+                )
+            if self.lazy_hours is None:
+                self.max_mass_flow = Constraint(self.pe, self.h, rule=max_mass_flow_rule)
+            else:
+                self.max_mass_flow = Constraint(self.pe, self.h)
+                self.add_lazy_rows(self.max_mass_flow, max_mass_flow_rule, [pe + (h,) for pe in self.pe for h in self.lazy_hours])
+
+            def logic_mass_flow_rule(model, n, m):
+                return (
+                    model.vPipeMassFlowInv[n, m] <= model.vBinBuildPipe[n, m] * model.pMaxPipeMFInv[n, m]
+                )
+            self.logic_mass_flow = Constraint(self.pe, rule=logic_mass_flow_rule)
 
         if self.logging:
-            self.logger.info("###########################")
-            self.logger.info("End: initialize variables")
-            self.logger.info("###########################")
+            self.logger.info("#############################")
+            self.logger.info("End: initialize constraints")
+            self.logger.info("#############################")
 
-    
-    def initialize_constraints(self):
-        """Initialize the constraints of the model.
+        
+    def model_run(self, config: dict):
+        """Run the model to solve the optimization problem. The solver can be defined here. If the hourly capacity
+        constraints were built lazily (see initialize_constraints), the model is solved with run_cutting_plane.
         """
 
+        if self.lazy_hours is not None:
+            return self.run_cutting_plane(config)
+
         if self.logging:
             self.logger.info("#############################")
-            self.logger.info("Start: initialize constraints")
+            self.logger.info("Start: model solve")
             self.logger.info("#############################")
 
 
-        start = time.time()
-
-        def hourly_cost_function(model, h):
-            return (
-                sum(model.pCostHNS * model.vHNS[n, h] for n in model.n) +
-                sum(model.pCostLocalHeatProd[n] * model.vLocalHeatProd[n, h] for n in model.n) +
-                sum(model.pCostCentrHeatProd[hg] * model.vCentralHeatProd[hg, h] for hg in model.hg) +
-                sum(model.pCostPumping * model.pPipeLength[n,m] * model.vMF[n, m, h] for (n, m) in model.pc)
-            )
+        solver = config['solver']
+        mip_gap = config['mip_gap']
+        if solver is None:
+            print("Warning: No solver defined, using default 'appsi_highs'")
+            solver = 'appsi_highs'
 
-        self.hourly_cost = Expression(self.h, rule=hourly_cost_function)
 
-        # Objective function
-        def objective_function(model):
-            return (
-                sum(model.pCostDHConnect[n] * model.vDHconnect[n] for n in model.n) +
-                sum(model.pCostCentralHeatProdInv[hg] * model.vCentralHeatProdInv[hg] for hg in model.hg) +
-                sum(model.pCostTESInv[tes] * model.vTESCapacitivInv[tes] for tes in model.tes) +
-                sum(model.pPipeCostIni * model.pPipeLength[n, m] * model.vBinBuildPipe[n, m] for (n, m) in model.pPipeLength) +
-                sum(model.pPipeCostSlope * model.pPipeLength[n, m] * model.vPipeMassFlowInv[n, m] for (n, m) in model.pPipeLength) +  # tbd add variable slope price
-                sum(model.hourly_cost[h] for h in model.h)
-            )
-        self.obj = Objective(rule=objective_function, sense=minimize)
+        warm_start = config.get('warm_start', False)
+        if warm_start:
+            set_heuristic_solution(self)
+        log_file = utils.solver_log_path(self.name, config['log_dir'])
+        threads = config.get('threads') or os.cpu_count()
 
-        if self.logging:
-            self.logger.info("Added objective function - {:.2f}".format(time.time() - start))
+        start = time.time()
+        print("Start: solve model")
+        if solver == 'gurobi':
+            solver_name = solver
+            solver = SolverFactory('gurobi')
+            results = solver.solve(self, tee=True, warmstart=warm_start, options={'MIPGap': mip_gap, 'Threads': threads, 'LogFile': log_file})
+        elif solver == 'highs':
+            solver_name = solver
+            if warm_start:
+                print("Info: The warm start is not passed to HiGHS through Pyomo, use the matrix backend")
+            solver = SolverFactory('appsi_highs')
+            results = solver.solve(self, tee=True, options={'mip_rel_gap': mip_gap, 'threads': threads, 'log_file': log_file})
+        else:
+            print("Error: Solver not recognized")
+            return None
 
-        print("Done: add objective function")
+        print("Done: solve model")
         print("Time: ", time.time() - start)
 
-        start = time.time()
-        # Energy balance in kW for ever heat node and hour
-        def energy_balance_rule(model, n, h):
-            return (
-                model.vMFConsumption[n, h] == (model.pHeatDemand[n, h] - model.vLocalHeatProd[n, h]) / ((model.pTsupply - model.pTreturn) * model.pCWater)
-            )
-        self.energy_balance = Constraint(self.n, self.h, rule=energy_balance_rule)
+        self.solve_info.update({'solver': solver_name, 'log_file': log_file, 'solve_time': time.time() - start, 'warm_start': warm_start})
+        self.log_time_to_first_incumbent(log_file, solver_name, warm_start)
 
         if self.logging:
-            self.logger.info("Added energy balance - {:.2f}".format(time.time() - start))
+            self.logger.info("#############################")
+            self.logger.info("End: model solve")
+            self.logger.info("#############################")
 
-        print("Done: add energy balance")
-        print("Time: ", time.time() - start)
+        return results
 
-        start = time.time()
-        # Limits use of distrct heating only to connected nodes and to a maximum power (as a specific bigM)
-        def max_dh_power_rule(model, n, h):
-            return (
-                model.vMFConsumption[n, h] <= model.vDHconnect[n] * model.pMaxDHPower[n] / ((model.pTsupply - model.pTreturn) * model.pCWater)
-            )
-        self.max_dh_power = Constraint(self.n, self.h, rule=max_dh_power_rule)
 
-        if self.logging:
-            self.logger.info("Added max. district heating consumption - {:.2f}".format(time.time() - start))
+    def add_lazy_rows(self, con, rule, index: list):
+        """Add rows to a lazily built constraint and keep its rule to add further rows later.
 
+        :param con: indexed constraint declared without a rule
+        :type con: Constraint
+        :param rule: constraint rule as used for the full constraint
+        :type rule: function
+        :param index: indices of the rows to add
+        :type index: list
+        """
 
-        print("Done: add max dh power")
-        print("Time: ", time.time() - start)
+        self.lazy_rules[con.name] = rule
+        for idx in index:
+            con.add(idx, rule(self, *idx))
 
-        start = time.time()
-        # Mass flow balacne between all nodes
-        def mf_balance_rule(model, n, h):
-            aux_pc_out = set((i, j) for i, j in model.pc if i == n)
-            aux_pc_inf = set((j, i) for j, i in model.pc if i == n)
-            return (
-                model.vMFConsumption[n, h] +
-                sum(model.vTESCharge[tes, h] for tes in model.tes if (tes, n) in model.hgn) -
-                model.vMFInjection[n, h] ==
-                # sum(model.vMF[m, n, h] for m in model.n if (m, n) in aux_pc) -
-                sum(model.vMF[m, n, h] for m, _ in aux_pc_inf) -
-                # sum(model.vMF[n, m, h] for m in model.n if (n, m) in aux_pc)
-                sum(model.vMF[n, m, h] for _, m in aux_pc_out)
-            )
-        self.mf_balance = Constraint(self.n, self.h, rule=mf_balance_rule)
 
-        if self.logging:
-            self.logger.info("Added mass flow balance system - {:.2f}".format(time.time() - start))
+    def get_peak_hours(self, num_hours: int) -> list:
+        """Return the hours with the highest total heat demand of all nodes.
 
-        print("Done: add mf balance")
-        print("Time: ", time.time() - start)
+        :param num_hours: number of hours
+        :type num_hours: int
+        :return: list of hours
+        :rtype: list
+        """
 
-        start = time.time()
-        # Mass flow injection into the network
-        def mf_injection_rule(model, n, h):
-            return (
-                model.vMFInjection[n,h] ==
-                sum(model.vCentralHeatProd[wh, h] for wh in model.wh if (wh, n) in model.hgn) / ((model.pTsupply - model.pTreturn) * model.pCWater) +
-                sum(model.vCentralHeatProd[hb, h] for hb in model.hb if (hb, n) in model.hgn) / ((model.pTsupply - model.pTreturn) * model.pCWater) +
-                sum(model.vCentralHeatProd[tes, h] for tes in model.tes if (tes, n) in model.hgn) / ((model.pTsupply - model.pTreturn) * model.pCWater)
-            )
-        self.mf_injection = Constraint(self.n, self.h, rule=mf_injection_rule)
+        total_demand = self.data_dict['heat_demand'].sum(axis=0)
+        peak_pos = np.argsort(-total_demand, kind='stable')[:num_hours]
+        return [self.h[i] for i in np.sort(peak_pos)]
 
-        if self.logging:
-            self.logger.info("Added mass flow balance node - {:.2f}".format(time.time() - start))
 
-        print("Done: add mf injection")
-        print("Time: ", time.time() - start)
+    def add_violated_capacity_rows(self, tol: float = 1e-6) -> int:
+        """Check the hourly capacity constraints of all hours against the current solution and add the violated rows
+        to the lazily built constraints. The check is vectorized over the hours.
 
+        :param tol: absolute tolerance of the violation, defaults to 1e-6
+        :type tol: float, optional
+        :return: number of added rows
+        :rtype: int
+        """
 
-        if self.pAllowDoubleHeating == 0:
+        hours = np.asarray(self.h)
+        H = len(hours)
+        violated = {}
+
+        # max mass flow: flows of the pipe candidates of a pipe investment against its capacity
+        if len(self.pe) > 0:
+            edge_pos = {pe: i for i, pe in enumerate(self.pe)}
+            pipe_edge = np.array([edge_pos[self.pipe_edge[pc]] for pc in self.pc], dtype=np.int64)
+            edge_flow = np.zeros((len(self.pe), H))
+            np.add.at(edge_flow, pipe_edge, _values_array(self.vMF, [self.pc, self.h]))
+            capacity = _values_array(self.vBinBuildPipe, [self.pe]) * value(self.pMassFlowIni) + _values_array(self.vPipeMassFlowInv, [self.pe])
+            e_idx, t_idx = np.nonzero(edge_flow > capacity[:, None] + tol)
+            pipes = list(self.pe)
+            violated['max_mass_flow'] = [pipes[e] + (hours[t],) for e, t in zip(e_idx, t_idx)]
+
+        # max power invest: production of the heat generation units against their capacity
+        units = list(self.hg)
+        production = _values_array(self.vCentralHeatProd, [units, self.h])
+        u_idx, t_idx = np.nonzero(production > _values_array(self.vCentralHeatProdInv, [units])[:, None] + tol)
+        violated['max_power_invest'] = [(units[u], hours[t]) for u, t in zip(u_idx, t_idx)]
+
+        # tes storage invest: level of the TES units against their storage capacity
+        if not self.aggregated and len(self.tes) > 0:
+            tes = list(self.tes)
+            level = _values_array(self.vTESLevel, [tes, self.h])
+            s_idx, t_idx = np.nonzero(level > _values_array(self.vTESCapacitivInv, [tes])[:, None] + tol)
+            violated['tes_storage_invest'] = [(tes[i], hours[t]) for i, t in zip(s_idx, t_idx)]
+
+        num_added = 0
+        for name, index in violated.items():
+            con = self.component(name)
+            index = [idx for idx in index if idx not in con]
+            self.add_lazy_rows(con, self.lazy_rules[name], index)
+            num_added += len(index)
+
+        return num_added
+
+
+    def run_cutting_plane(self, config: dict):
+        """Solve the model with lazily built hourly capacity constraints in a cutting plane loop: solve, add the rows
+        of the capacity constraints that are violated by the solution and solve again until no row is violated.
+        A persistent solver keeps the model between the iterations, only the added rows are passed to the solver.
+        Requires initialize_constraints with lazy hours.
+
+        :param config: configuration dictionary, uses the 'lazy_constraints' settings
+        :type config: dict
+        :return: results of the last solve, None if the solver is not recognized
+        """
+
+        if self.logging:
+            self.logger.info("#############################")
+            self.logger.info("Start: cutting plane solve")
+            self.logger.info("#############################")
+
+        opt = create_persistent_solver(config)
+        if opt is None:
+            return None
+        opt.config.stream_solver = True
+
+        max_iterations = config['lazy_constraints']['max_iterations']
+        start_total = time.time()
+        results = None
+        for i in range(max_iterations):
             start = time.time()
-            # Exclude decentral heating for nodes that are connected to the network
-            def decentral_condition_rule(model, n, h):
-                return (
-                    model.vLocalHeatProd[n, h] <= (1 - model.vDHconnect[n]) * model.pMaxDHPower[n]
-                )
-            self.decentral_condition = Constraint(self.n, self.h, rule=decentral_condition_rule)
+            num_rows = len(self.max_mass_flow) + len(self.max_power_invest) + (len(self.tes_storage_invest) if not self.aggregated else 0)
+
+            print("Start: cutting plane iteration " + str(i + 1) + " with " + str(num_rows) + " capacity rows")
+            results = opt.solve(self)
+            if results.best_feasible_objective is None:
+                cprint("Warning: No solution found in cutting plane iteration " + str(i + 1), 'yellow')
+                break
+            results.solution_loader.load_vars()
+
+            num_added = self.add_violated_capacity_rows()
 
             if self.logging:
-                self.logger.info("Added local heating - {:.2f}".format(time.time() - start))
+                self.logger.info("Cutting plane iteration {} with {} capacity rows, {} violated rows added - {:.2f}".format(i, num_rows, num_added, time.time() - start))
 
-            print('Info: No decentral heating allowed when building connected to the network')
-            print("Done: add decentral condition")
+            print("Done: cutting plane iteration " + str(i + 1) + ", added " + str(num_added) + " violated rows")
             print("Time: ", time.time() - start)
-        else:
-            print('Info: Decentral heating allowed when building connected to the network!')
 
+            if num_added == 0:
+                break
+        else:
+            cprint("Warning: Maximum number of cutting plane iterations reached, the solution may violate capacity constraints", 'yellow')
 
-        start = time.time()
-        # Limit the maximum power of the waste heat generation units
-        def max_wh_power_rule(model, wh, h):
-            return (
-                model.vCentralHeatProd[wh, h] <= model.pMaxWHMF[wh, h] * (model.pTsupply - model.pTreturn) * model.pCWater
-            )
-        self.max_wh_power = Constraint(self.wh, self.h, rule=max_wh_power_rule)
+        num_full = len(self.pe) * len(self.h) + len(self.hg) * len(self.h) + (len(self.tes) * len(self.h) if not self.aggregated else 0)
+        num_rows = len(self.max_mass_flow) + len(self.max_power_invest) + (len(self.tes_storage_invest) if not self.aggregated else 0)
+        print(f"Done: cutting plane solve with {num_rows} of {num_full} capacity rows")
+        print("Time: ", time.time() - start_total)
 
         if self.logging:
-            self.logger.info("Added max. waste heat - {:.2f}".format(time.time() - start))
+            self.logger.info("Built {} of {} capacity rows".format(num_rows, num_full))
+            self.logger.info("#############################")
+            self.logger.info("End: cutting plane solve")
+            self.logger.info("#############################")
 
-        print("Done: add max wh power")
-        print("Time: ", time.time() - start)
+        return results
 
-        start = time.time()
-        # calculate the heat production of the TES
-        def tes_production_rule(model, tes, h):
-            return (
-                model.vCentralHeatProd[tes, h] == model.vTESDischarge[tes, h] * (model.pTsupply - model.pTreturn) * model.pCWater
-            )
-        self.tes_production = Constraint(self.tes, self.h, rule=tes_production_rule)
 
-        if self.logging:
-            self.logger.info("Added thermal storage production - {:.2f}".format(time.time() - start))
+    def update_parameters(self, parameter_values: dict):
+        """Update the values of mutable parameters, e.g. the costs.
 
-        print("Done: add tes production")
-        print("Time: ", time.time() - start)
+        :param parameter_values: parameter name as key and the new value as value. For indexed parameters the value
+            is either a dictionary index -> value or a single value that is set for all indices.
+        :type parameter_values: dict
+        """
 
-        start = time.time()
-        # Limit the maximum power to investments
-        def max_power_invest_rule(model, hg, h):
-            return (
-                model.vCentralHeatProd[hg, h] <= model.vCentralHeatProdInv[hg]
-            )
-        self.max_power_invest = Constraint(self.hg, self.h, rule=max_power_invest_rule)
+        for name, new_value in parameter_values.items():
+            param = self.component(name)
+            if param is None or not isinstance(param, Param) or not param.mutable:
+                if self.logging:
+                    self.logger.error(f"Parameter {name} does not exist or is not mutable")
+                assert False, f"Parameter {name} does not exist or is not mutable"
+
+            if isinstance(new_value, dict):
+                for idx, v in new_value.items():
+                    param[idx] = v
+            elif param.is_indexed():
+                for idx in param:
+                    param[idx] = new_value
+            else:
+                param.set_value(new_value)
 
-        if self.logging:
-            self.logger.info("Added max. power invest - {:.2f}".format(time.time() - start))
 
-        print("Done: add max power invest")
-        print("Time: ", time.time() - start)
+    def run_sweep(self, config: dict, sweep_points: list) -> pd.DataFrame:
+        """Solve the built model for a list of parameter updates with a persistent solver. The model is passed to the
+        solver once, every sweep point only pushes the changed parameters to the solver and starts from the solution
+        of the previous sweep point (for Gurobi as MIP start, HiGHS keeps its model and basis).
+        Requires fill_model_data, initialize_variables and initialize_constraints.
 
-        start = time.time()
-        # Limit the size of the storage to its investments
-        def tes_storage_invest_rule(model, tes, h):
-            return (
-                model.vTESLevel[tes,h] <= model.vTESCapacitivInv[tes]
-            )
-        self.tes_storage_invest = Constraint(self.tes, self.h, rule=tes_storage_invest_rule)
+        :param config: configuration dictionary
+        :type config: dict
+        :param sweep_points: list of parameter updates, see update_parameters
+        :type sweep_points: list
+        :return: tidy dataframe with the cost components per sweep point, None if the solver is not recognized
+        :rtype: pd.DataFrame
+        """
 
         if self.logging:
-            self.logger.info("Added max. thermal storage invest - {:.2f}".format(time.time() - start))
+            self.logger.info("#############################")
+            self.logger.info("Start: parameter sweep")
+            self.logger.info("#############################")
 
-        print("Done: add tes storage invest")
-        print("Time: ", time.time() - start)
+        opt = create_persistent_solver(config)
+        if opt is None:
+            return None
 
-        start = time.time()
-        # Balance equation for the TES
-        def tes_balance_rule(model, tes, h):
-            if h == 1: return model.vTESLevel[tes, h] == model.vTESLevel[tes, len(model.h)] + model.vTESCharge[tes, h] - model.vTESDischarge[tes, h]
-            return (
-                model.vTESLevel[tes, h] == model.vTESLevel[tes, h-1] * (1 - model.pTESlosses) + model.vTESCharge[tes, h] - model.vTESDischarge[tes, h]
-            )
-        self.tes_balance = Constraint(self.tes, self.h, rule=tes_balance_rule)
+        opt.config.stream_solver = True
 
-        if self.logging:
-            self.logger.info("Added thermal storage balance - {:.2f}".format(time.time() - start))
+        data = []
+        for i, parameter_values in enumerate(sweep_points):
+            start = time.time()
+            self.update_parameters(parameter_values)
 
-        print("Done: add tes balance")
-        print("Time: ", time.time() - start)
+            if isinstance(opt, appsi.solvers.Gurobi):
+                # start from the solution of the previous sweep point
+                opt.config.use_mipstart = i > 0
 
-        start = time.time()
-        # Limit mass flow through the pipes
-        def max_mass_flow_rule(model, n, m, h):
-            return (
-                model.vMF[n, m, h] <= model.vBinBuildPipe[n, m] * model.pMassFlowIni + model.vPipeMassFlowInv[n, m]
-            )
-        self.max_mass_flow = Constraint(self.pc, self.h, rule=max_mass_flow_rule)
+            print("Start: solve sweep point " + str(i + 1) + " of " + str(len(sweep_points)))
+            results = opt.solve(self)
+            if results.best_feasible_objective is not None:
+                results.solution_loader.load_vars()
+                economic_results = self.calc_economic_results()
+            else:
+                economic_results = {'Total Costs': np.nan}
 
-        def logic_mass_flow_rule(model, n, m):
-            return (
-                model.vPipeMassFlowInv[n, m] <= model.vBinBuildPipe[n, m] * 1e4
-            )
-        self.logic_mass_flow = Constraint(self.pc, rule=logic_mass_flow_rule)
+            # one row per sweep point and cost component, with the parameter values of the sweep point as columns
+            sweep_columns = {}
+            for name, new_value in parameter_values.items():
+                if isinstance(new_value, dict):
+                    for idx, v in new_value.items():
+                        sweep_columns[f"{name}[{idx}]"] = v
+                else:
+                    sweep_columns[name] = new_value
 
-        if self.logging:
-            self.logger.info("Added mass flow pipe - {:.2f}".format(time.time() - start))
+            for component, costs in economic_results.items():
+                data.append({'Sweep Point': i, **sweep_columns, 'Termination Condition': str(results.termination_condition),
+                             'Costs in k€': component, 'Value': costs / 1e3})
 
-        print("Done: build max mass flow")
-        print("Time: ", time.time() - start)
+            if self.logging:
+                self.logger.info("Solved sweep point {} ({}) - {:.2f}".format(i, results.termination_condition, time.time() - start))
+
+            print("Done: solve sweep point " + str(i + 1))
+            print("Time: ", time.time() - start)
 
         if self.logging:
             self.logger.info("#############################")
-            self.logger.info("End: initialize constraints")
+            self.logger.info("End: parameter sweep")
             self.logger.info("#############################")
 
-        
-    def model_run(self, config: dict):
-        """Run the model to solve the optimization problem. The solver can be defined here.
+        return pd.DataFrame(data)
+
+
+    def model_run_matrix(self, config: dict) -> dict:
+        """Build the model as sparse coefficient matrices and solve it in memory, bypassing the generation of Pyomo
+        expressions. Requires fill_model_data and initialize_variables, initialize_constraints is not needed.
+        The solution is loaded back into the model variables.
+
+        :param config: configuration dictionary
+        :type config: dict
+        :return: dictionary with the solver, the status and the objective value, None if the solver is not recognized
+        :rtype: dict
         """
 
         if self.logging:
             self.logger.info("#############################")
-            self.logger.info("Start: model solve")
+            self.logger.info("Start: matrix model build and solve")
             self.logger.info("#############################")
 
+        start = time.time()
+        mm = matrix_model.build_matrix_model(self)
 
-        solver = config['solver']
-        mip_gap = config['mip_gap']
-        if solver is None:
-            print("Warning: No solver defined, using default 'appsi_highs'")
-            solver = 'appsi_highs'
+        if self.logging:
+            self.logger.info("Built matrix model with {} rows, {} columns and {} nonzeros - {:.2f}".format(mm.num_rows, mm.num_cols, mm.A.nnz, time.time() - start))
+
+        print(f"Done: build matrix model with {mm.num_rows} rows, {mm.num_cols} columns and {mm.A.nnz} nonzeros")
+        print("Time: ", time.time() - start)
+        self.solve_info['build_time'] = time.time() - start
 
+        x0 = None
+        warm_start = config.get('warm_start', False)
+        if warm_start:
+            set_heuristic_solution(self)
+            x0 = self.get_matrix_start(mm)
+        log_file = utils.solver_log_path(self.name, config['log_dir'])
 
         start = time.time()
         print("Start: solve model")
-        if solver == 'gurobi':
-            solver = SolverFactory('gurobi')
-            results = solver.solve(self, tee=True, options={'MIPGap': mip_gap, 'Threads':os.cpu_count()})
-        elif solver == 'highs':
-            solver = SolverFactory('appsi_highs')
-            results = solver.solve(self, tee=True, options={'mip_rel_gap': mip_gap, 'threads':os.cpu_count()})
-        else:
-            print("Error: Solver not recognized")
+        results = matrix_model.solve_matrix_model(mm, config, x0=x0, log_file=log_file)
+        if results is None:
             return None
 
         print("Done: solve model")
         print("Time: ", time.time() - start)
 
+        self.solve_info.update({'solver': results['solver'], 'log_file': log_file, 'solve_time': time.time() - start, 'warm_start': warm_start})
+        self.log_time_to_first_incumbent(log_file, results['solver'], warm_start)
+
+        self.load_matrix_solution(mm, results['x'])
+        self.data_dict['matrix_model'] = mm
+        self.data_dict['matrix_solution'] = results.pop('x')
+        self.data_dict['objective_value'] = results['objective']
+
         if self.logging:
             self.logger.info("#############################")
-            self.logger.info("End: model solve")
+            self.logger.info("End: matrix model build and solve")
             self.logger.info("#############################")
 
         return results
 
 
-    def export_results(self, case_study_name: str, model_name: str, config: dict):
-        """Perform some ex-post calculations and export the results to csv files.
+    def load_matrix_solution(self, mm, x: np.ndarray):
+        """Load the solution vector of the matrix backend into the model variables.
 
-        :param case_study_name: name of the case study
-        :type case_study_name: str
-        :param model_name: name of the scenario / model
-        :type model_name: str
-        :param config: configuration dictionary 
-        :type config: dict
+        :param mm: the matrix model that was solved
+        :type mm: matrix_model.MatrixModel
+        :param x: solution vector
+        :type x: np.ndarray
         """
 
-        print("Start: export results")
-        # convert the DH connection to a dataframe
-        df_dh_connection = pd.DataFrame()
-        df_dh_connection['Node'] = self.n
-        df_dh_connection['DH Connection'] = [self.vDHconnect[n].value for n in self.n]
+        for name, block in mm.var_blocks.items():
+            size = int(np.prod(block['shape']))
+            # e.g. the TES variables of a case without TES units
+            if size == 0:
+                continue
+            var = self.component(name)
+            values = x[block['offset']:block['offset'] + size]
+            if mm.col_integer[block['offset']]:
+                values = np.round(values)
+            # the columns of a block follow the order of its index sets, not the iteration order of the variable
+            var.set_values(dict(zip(_index_keys(block['index_sets']), values.tolist())), skip_validation=True)
+
+
+    def get_matrix_start(self, mm) -> np.ndarray:
+        """Collect the current values of the model variables as start vector for the matrix backend, e.g. after
+        setting a heuristic solution. Variables without a value start at 0.
+
+        :param mm: the matrix model to be solved
+        :type mm: matrix_model.MatrixModel
+        :return: start vector in the column order of the matrix model
+        :rtype: np.ndarray
+        """
 
-        # convert the pipe connections to a dataframe
-        df_pipe_connections = pd.DataFrame()
+        x0 = np.zeros(mm.num_cols)
+        for name, block in mm.var_blocks.items():
+            # the values are read by key in the column order of the block (see load_matrix_solution)
+            values = _values_array(self.component(name), block['index_sets']).ravel()
+            x0[block['offset']:block['offset'] + len(values)] = values
+
+        return x0
+
+
+    def log_time_to_first_incumbent(self, log_file: str, solver: str, warm_start: bool):
+        """Parse the solver log and log the time to the first feasible solution, to compare runs with and without
+        the heuristic warm start.
+
+        :param log_file: path of the solver log file
+        :type log_file: str
+        :param solver: solver that wrote the log, 'gurobi' or 'highs'
+        :type solver: str
+        :param warm_start: true if the solver was started from the heuristic solution
+        :type warm_start: bool
+        """
+
+        time_first_incumbent = utils.parse_time_to_first_incumbent(log_file, solver)
+        if time_first_incumbent is None:
+            print("Info: No incumbent found in the solver log")
+            return
+
+        print("Time to first incumbent (warm start: " + str(warm_start) + "): ", time_first_incumbent)
+        if self.logging:
+            self.logger.info("Time to first incumbent (warm start: {}) - {:.2f}".format(warm_start, time_first_incumbent))
+
+
+    def export_solve_report(self, case_study_name: str, model_name: str, config: dict):
+        """Export the progress of the solve (incumbent, bound, gap and explored nodes over time, parsed from the solver
+        log) to Solver_Progress.csv and a report with the model size, the presolve reductions, the build and solve time
+        to Solve_Report.json, both in the report folder of the scenario.
+
+        :param case_study_name: the name of the case study
+        :type case_study_name: str
+        :param model_name: the name of the model
+        :type model_name: str
+        :param config: configuration dictionary
+        :type config: dict
+        """
+
+        report_folder = os.path.join(case_study_name, config['scenario_dir'], model_name, config['report_dir'])
+        if not os.path.exists(report_folder):
+            os.makedirs(report_folder)
+
+        solver = self.solve_info.get('solver')
+        log_file = self.solve_info.get('log_file')
+        progress = pd.DataFrame(utils.parse_solver_progress(log_file, solver), columns=['time', 'incumbent', 'bound', 'gap', 'nodes'])
+        progress.rename(columns={'time': 'Time in s', 'incumbent': 'Incumbent', 'bound': 'Bound', 'gap': 'Gap', 'nodes': 'Nodes'}, inplace=True)
+        progress.to_csv(os.path.join(report_folder, 'Solver_Progress.csv'), sep=';', index=False)
+
+        report = {'case_study': case_study_name, 'scenario': model_name, 'solver': solver,
+                  'backend': config.get('backend', 'pyomo'), 'aggregated': self.aggregated,
+                  'build_time': self.solve_info.get('build_time'), 'solve_time': self.solve_info.get('solve_time'),
+                  'warm_start': self.solve_info.get('warm_start'), 'objective': self.get_objective_value(),
+                  'time_to_first_incumbent': utils.parse_time_to_first_incumbent(log_file, solver)}
+        report.update(utils.parse_solver_summary(log_file, solver))
+        if len(progress) > 0:
+            report.update({'final_bound': progress['Bound'].iloc[-1], 'final_gap': progress['Gap'].iloc[-1], 'nodes': int(progress['Nodes'].iloc[-1])})
+
+        with open(os.path.join(report_folder, 'Solve_Report.json'), 'w') as file:
+            json.dump(report, file, indent=2, default=float)
+
+        self.profiler.export(report_folder)
+
+        print("Exported: solve report")
+
+
+    def get_objective_value(self) -> float:
+        """Return the objective value of the solved model, for both the Pyomo and the matrix backend.
+
+        :return: objective value, None if the model has no objective (e.g. the results of a rolling horizon dispatch)
+        :rtype: float
+        """
+
+        if self.component('obj') is not None:
+            return value(self.obj)
+        return self.data_dict.get('objective_value')
+
+
+    def build_and_solve(self, config: dict, cache_key: str = None):
+        """Build the constraints and solve the model with the backend selected in the configuration. Models on
+        representative periods are always built with Pyomo, the matrix backend has no storage linking between periods.
+
+        With a cache key, a model built with Pyomo is written to the model cache, and a cached model is solved from
+        its MPS file instead of building the constraints (see cache.py and model_run_cached). Models on representative
+        periods and lazily built models are not cached.
+
+        :param config: configuration dictionary
+        :type config: dict
+        :param cache_key: key of the model in the model cache (see cache.get_cache_key), defaults to None (no cache)
+        :type cache_key: str, optional
+        :return: results of the solver
+        """
+
+        lazy = config.get('lazy_constraints', {}).get('enabled', False)
+
+        if config.get('backend', 'pyomo') == 'matrix':
+            if not self.aggregated:
+                if lazy:
+                    print("Info: The matrix backend builds all hourly capacity constraints")
+                return self.model_run_matrix(config)
+            print("Info: Model on typical days is built with Pyomo")
+
+        cache_model = cache_key is not None and not lazy and not self.aggregated
+        if cache_model:
+            entry = cache.lookup_model(cache_key, config)
+            if entry is not None:
+                return self.model_run_cached(entry, config)
+
+        lazy_hours = self.get_peak_hours(config['lazy_constraints']['seed_hours']) if lazy else None
+        start = time.time()
+        self.initialize_constraints(lazy_hours, config.get('eliminate_equalities', False))
+        self.solve_info['build_time'] = time.time() - start
+        if cache_model:
+            cache.store_model(self, cache_key, config)
+        return self.model_run(config)
+
+
+    def model_run_cached(self, entry: str, config: dict) -> dict:
+        """Solve the model from the MPS file of the model cache instead of building the constraints. The solution is
+        loaded back into the model variables through the symbol map of the cached model. Requires fill_model_data and
+        initialize_variables.
+
+        :param entry: folder of the cached model (see cache.lookup_model)
+        :type entry: str
+        :param config: configuration dictionary
+        :type config: dict
+        :return: dictionary with the solver, the status, the objective value and the gap, None if the solver is not recognized
+        :rtype: dict
+        """
+
+        if self.logging:
+            self.logger.info("#############################")
+            self.logger.info("Start: solve cached model")
+            self.logger.info("#############################")
+
+        # the eliminated variables are not in the cached model, their expressions are needed for the export
+        if config.get('eliminate_equalities', False) and not self.eliminated_variables:
+            self.eliminate_equality_variables()
+        if config.get('warm_start', False):
+            print("Info: The warm start is not passed to a cached model, use --no-cache")
+        log_file = utils.solver_log_path(self.name, config['log_dir'])
+
+        start = time.time()
+        print("Start: solve cached model")
+        results = matrix_model.solve_mps_file(os.path.join(entry, cache.MODEL_FILE), config, log_file=log_file)
+        if results is None:
+            return None
+
+        print("Done: solve cached model")
+        print("Time: ", time.time() - start)
+
+        self.solve_info.update({'solver': results['solver'], 'log_file': log_file, 'solve_time': time.time() - start, 'warm_start': False, 'build_time': 0.0})
+        self.log_time_to_first_incumbent(log_file, results['solver'], False)
+
+        # map the columns to the variables through the symbol map
+        symbol_map = cache.read_symbol_map(entry)
+        values = {}
+        for label, val in zip(results.pop('col_names'), results.pop('x').tolist()):
+            if label in symbol_map:
+                name, idx = symbol_map[label]
+                values.setdefault(name, {})[idx] = val
+        for name, var_values in values.items():
+            var = self.component(name)
+            if var is None or var.ctype is not Var:
+                continue
+            if var[next(iter(var_values))].is_binary():
+                var_values = {idx: round(val) for idx, val in var_values.items()}
+            var.set_values(var_values, skip_validation=True)
+
+        self.data_dict['objective_value'] = results['objective']
+
+        if self.logging:
+            self.logger.info("Solved cached model {} - {:.2f}".format(entry, time.time() - start))
+            self.logger.info("#############################")
+            self.logger.info("End: solve cached model")
+            self.logger.info("#############################")
+
+        return results
+
+
+    def get_investment_decisions(self) -> dict:
+        """Return the investment decisions (connections, pipes, capacities) of the solved model.
+
+        :return: dictionary with the name of the investment variables as keys and a dictionary index -> value as values
+        :rtype: dict
+        """
+
+        return {name: self.component(name).get_values() for name in INVESTMENT_VARIABLES}
+
+
+    def fix_investment_decisions(self, investment_decisions: dict):
+        """Fix the investment variables to given decisions, e.g. to run the operation of a given design.
+        Requires initialize_variables. Indices without a value are not fixed.
+
+        :param investment_decisions: investment decisions as returned by get_investment_decisions
+        :type investment_decisions: dict
+        """
+
+        for name, values in investment_decisions.items():
+            var = self.component(name)
+            for idx, val in values.items():
+                if val is None:
+                    continue
+                var[idx].fix(round(val) if var[idx].is_binary() else val)
+
+        if self.logging:
+            self.logger.info("Fixed investment decisions")
+
+
+    def read_investment_decisions(self, model_output: dict) -> dict:
+        """Read the investment decisions from the exported variables of a solved model (see data.read_output_from_disk).
+
+        :param model_output: dictionary with the dataframes of the exported variables
+        :type model_output: dict
+        :return: investment decisions in the format of get_investment_decisions
+        :rtype: dict
+        """
+
+        investment_decisions = {}
+        for name in INVESTMENT_VARIABLES:
+            if name not in model_output:
+                if self.logging:
+                    self.logger.error(f"Investment decisions {name} are missing in the model output")
+                assert False, f"Investment decisions {name} are missing in the model output"
+
+            df_var = model_output[name]
+            index_columns = [c for c in df_var.columns if c.startswith('index_set_')]
+
+            # match the indices as strings, the csv files do not keep the types of the index elements
+            var = self.component(name)
+            keys = {tuple(str(e) for e in (idx if isinstance(idx, tuple) else (idx,))): idx for idx in var.keys()}
+            if name in ('vBinBuildPipe', 'vPipeMassFlowInv'):
+                # the pipes are exported per pipe candidate, both directions of an undirected pipe share its investment
+                keys = {tuple(str(e) for e in pc): self.pipe_edge[pc] for pc in self.pc}
+
+            investment_decisions[name] = {}
+            for idx, val in zip(df_var[index_columns].astype(str).itertuples(index=False, name=None), df_var['value']):
+                if idx in keys and not pd.isna(val):
+                    previous = investment_decisions[name].get(keys[idx], 0.0)
+                    investment_decisions[name][keys[idx]] = max(previous, float(val)) if name == 'vBinBuildPipe' else previous + float(val)
+
+        return investment_decisions
+
+
+    def run_rolling_horizon(self, input_dict: dict, investment_decisions: dict, config: dict) -> list:
+        """Solve the operation of the full time series for fixed investments in overlapping rolling windows.
+
+        Every window covers the committed hours plus a look-ahead (overlap), only the committed hours are kept. The TES
+        level at the end of the committed hours is the initial level of the next window. With all investments fixed,
+        the windows are linear problems. The results of all windows are collected in this model, which can be
+        exported as usual. Requires fill_model_data and initialize_variables.
+
+        :param input_dict: input data for fill_model_data (full time series)
+        :type input_dict: dict
+        :param investment_decisions: investment decisions, see get_investment_decisions
+        :type investment_decisions: dict
+        :param config: configuration dictionary, uses the 'rolling_horizon' settings
+        :type config: dict
+        :return: list with the results of the solver per window
+        :rtype: list
+        """
+
+        if self.logging:
+            self.logger.info("#############################")
+            self.logger.info("Start: rolling horizon dispatch")
+            self.logger.info("#############################")
+
+        window_hours = config['rolling_horizon']['window_hours']
+        overlap_hours = config['rolling_horizon']['overlap_hours']
+
+        self.fix_investment_decisions(investment_decisions)
+
+        hours = np.sort(self.h)
+        tes_level = {tes: 0.0 for tes in self.tes}
+        operation_vars = [v for v in self.component_objects(Var) if v.name not in INVESTMENT_VARIABLES]
+        results = []
+
+        for i, first in enumerate(range(0, len(hours), window_hours)):
+            start = time.time()
+            committed_hours = set(hours[first:first + window_hours])
+
+            input_dict_window = select_input_hours(input_dict, hours[first:first + window_hours + overlap_hours])
+            input_dict_window['tes_initial_level'] = tes_level
+
+            window_model = HeatNetworkModel(self.name + '_window_' + str(i))
+            window_model.fill_model_data(input_dict_window)
+            window_model.initialize_variables()
+            window_model.fix_investment_decisions(investment_decisions)
+            results.append(window_model.build_and_solve(config))
+
+            # keep the operation of the committed hours, the hour is the last index of all operational variables
+            for var in operation_vars:
+                window_var = window_model.component(var.name)
+                var.set_values({idx: value(v, exception=False) for idx, v in window_var.items() if idx[-1] in committed_hours}, skip_validation=True)
+
+            last_hour = hours[min(first + window_hours, len(hours)) - 1]
+            tes_level = {tes: max(window_model.vTESLevel[tes, last_hour].value or 0.0, 0.0) for tes in self.tes}
+
+            if self.logging:
+                self.logger.info("Solved rolling horizon window {} - {:.2f}".format(i, time.time() - start))
+
+            print("Done: rolling horizon window " + str(i + 1))
+            print("Time: ", time.time() - start)
+
+        if self.logging:
+            self.logger.info("#############################")
+            self.logger.info("End: rolling horizon dispatch")
+            self.logger.info("#############################")
+
+        return results
+
+
+    def get_investment_index(self) -> list:
+        """Return the indices of all investment decisions of the model as (variable name, index) in a fixed order.
+        Storage investments are only indexed over the TES units.
+
+        :return: list of (variable name, index)
+        :rtype: list
+        """
+
+        return ([('vCentralHeatProdInv', hg) for hg in self.hg] +
+                [('vTESCapacitivInv', tes) for tes in self.tes] +
+                [('vPipeMassFlowInv', pe) for pe in self.pe] +
+                [('vDHconnect', n) for n in self.n] +
+                [('vBinBuildPipe', pe) for pe in self.pe])
+
+
+    def make_benders_subproblem(self, investment_index: list):
+        """Turn the model into an operational subproblem of the Benders decomposition (see run_benders). The binary
+        investment variables are relaxed, all investment variables are fixed through copy constraints to the mutable
+        parameter pInvestment. The duals of the copy constraints are the coefficients of the optimality cuts.
+        The objective only holds the operational costs. Requires fill_model_data and initialize_variables.
+
+        :param investment_index: indices of the investment decisions, see get_investment_index
+        :type investment_index: list
+        """
+
+        for var in (self.vDHconnect, self.vBinBuildPipe):
+            for var_data in var.values():
+                var_data.domain = UnitInterval
+
+        self.initialize_constraints()
+
+        # only the operational costs, the investment costs are part of the master problem
+        self.obj.deactivate()
+        self.obj_operation = Objective(expr=sum(self.pHourWeight[h] * self.hourly_cost[h] for h in self.h), sense=minimize)
+
+        self.benders_k = range(len(investment_index))
+        self.pInvestment = Param(self.benders_k, initialize=0.0, mutable=True)
+
+        def copy_investment_rule(model, k):
+            name, idx = investment_index[k]
+            return model.component(name)[idx] == model.pInvestment[k]
+        self.copy_investment = Constraint(self.benders_k, rule=copy_investment_rule)
+
+
+    def calc_economic_results(self) -> dict:
+        """Calculate the total costs and the cost components of the objective function from the solved model.
+        Operational costs are weighted with the hour weights, i.e. they refer to the full time series.
+
+        :return: dictionary with the name of the cost component as key and the costs in € as value
+        :rtype: dict
+        """
+
+        # the values of the variables as arrays (rows in the order of the sets, columns in the order of the hours),
+        # the hourly costs are weighted and summed by matrix-vector products
+        weight = _param_values(self.pHourWeight, self.h)
+        pipe_length = _param_values(self.pPipeLength, self.pc)
+        edge_length = _param_values(self.pPipeLength, self.pe)
+
+        economic_results = {
+            'Total Costs': self.get_objective_value(),
+            'DH Connection Cost': float(_param_values(self.pCostDHConnect, self.n) @ _values_array(self.vDHconnect, [self.n])),
+            'HNS Cost': float(value(self.pCostHNS) * (_values_array(self.vHNS, [self.n, self.h]) @ weight).sum()),
+            'Local Heat Production Cost': float(_param_values(self.pCostLocalHeatProd, self.n) @ (_values_array(self.vLocalHeatProd, [self.n, self.h]) @ weight)),
+            'Central Heat Production Cost': float(_param_values(self.pCostCentrHeatProd, self.hg) @ (_values_array(self.vCentralHeatProd, [self.hg, self.h]) @ weight)),
+            'Central Heat Production Investment Cost': float(_param_values(self.pCostCentralHeatProdInv, self.hg) @ _values_array(self.vCentralHeatProdInv, [self.hg])),
+            'TES Investment Cost': float(_param_values(self.pCostTESInv, self.tes) @ _values_array(self.vTESCapacitivInv, [self.tes])),
+            'Pumping Cost': float(value(self.pCostPumping) * pipe_length @ (_values_array(self.vMF, [self.pc, self.h]) @ weight)),
+            'Pipe Base Investment Cost': float(value(self.pPipeCostIni) * edge_length @ _values_array(self.vBinBuildPipe, [self.pe])),
+            'Pipe Slope Investment Cost': float(value(self.pPipeCostSlope) * edge_length @ _values_array(self.vPipeMassFlowInv, [self.pe]))
+        }
+
+        # without an objective the total costs are the sum of the components
+        if economic_results['Total Costs'] is None:
+            economic_results['Total Costs'] = sum(v for k, v in economic_results.items() if k != 'Total Costs')
+
+        return economic_results
+
+
+    def get_directed_pipe_investments(self) -> dict:
+        """Return the pipe investments of the solved model per pipe candidate (directed layout of the exports). With
+        undirected pipes, the investment of a pipe is assigned to the direction with the higher peak mass flow, the
+        other direction gets no investment.
+
+        :return: dictionary with 'vBinBuildPipe' and 'vPipeMassFlowInv' as keys and a dictionary pipe candidate -> value as values
+        :rtype: dict
+        """
+
+        pipe_investments = {'vBinBuildPipe': {}, 'vPipeMassFlowInv': {}}
+        peak_flow = dict(zip(self.pc, _values_array(self.vMF, [self.pc, self.h]).max(axis=1, initial=0.0).tolist()))
+        for edge in self.pe:
+            main_pc = max(self.edge_pc[edge], key=lambda pc: peak_flow[pc])
+            for pc in self.edge_pc[edge]:
+                pipe_investments['vBinBuildPipe'][pc] = self.vBinBuildPipe[edge].value if pc == main_pc else 0.0
+                pipe_investments['vPipeMassFlowInv'][pc] = self.vPipeMassFlowInv[edge].value if pc == main_pc else 0.0
+
+        return pipe_investments
+
+
+    def export_results(self, case_study_name: str, model_name: str, config: dict):
+        """Perform some ex-post calculations and export the results to csv files.
+
+        :param case_study_name: name of the case study
+        :type case_study_name: str
+        :param model_name: name of the scenario / model
+        :type model_name: str
+        :param config: configuration dictionary 
+        :type config: dict
+        """
+
+        start = time.time()
+        print("Start: export results")
+
+        # convert the DH connection to a dataframe
+        df_dh_connection = pd.DataFrame()
+        df_dh_connection['Node'] = list(self.n)
+        df_dh_connection['DH Connection'] = _values_array(self.vDHconnect, [self.n], missing=np.nan)
+
+        # convert the pipe connections to a dataframe
+        pipe_investments = self.get_directed_pipe_investments()
+        build_pipe = np.array([pipe_investments['vBinBuildPipe'][pc] for pc in self.pc], dtype=float)
+        mass_flow_inv = np.array([pipe_investments['vPipeMassFlowInv'][pc] for pc in self.pc], dtype=float)
+        df_pipe_connections = pd.DataFrame()
         df_pipe_connections['from'] = [n for (n, m) in self.pc]
         df_pipe_connections['to'] = [m for (n, m) in self.pc]
-        df_pipe_connections['Build Pipe'] = [self.vBinBuildPipe[n, m].value for (n, m) in self.pc]
-        df_pipe_connections['Max Mass Flow'] = [max(self.vMF[n, m, h].value for h in self.h) for (n, m) in self.pc]
-        df_pipe_connections['Mass Flow Investment'] = [self.vBinBuildPipe[n, m].value * self.pMassFlowIni + self.vPipeMassFlowInv[n, m].value for (n, m) in self.pc]
-
-        # convert the heat generation time series to a dataframe
-        data = []
-        for hg in self.hg:
-            for h in self.h:
-                data.append([hg, h, self.vCentralHeatProd[hg, h].value])
+        df_pipe_connections['Build Pipe'] = build_pipe
+        df_pipe_connections['Max Mass Flow'] = _values_array(self.vMF, [self.pc, self.h], missing=np.nan).max(axis=1, initial=-np.inf)
+        df_pipe_connections['Mass Flow Investment'] = build_pipe * value(self.pMassFlowIni) + mass_flow_inv
 
-        df_heat_gen = pd.DataFrame(data, columns=['Generation Unit', 'Hour', 'Heat Production'])
-        df_heat_gen = df_heat_gen.pivot(index='Generation Unit', columns='Hour', values='Heat Production').reset_index()
+        # convert the heat generation time series to a dataframe (one row per unit in sorted order, one column per hour)
+        df_heat_gen = pd.DataFrame(_values_array(self.vCentralHeatProd, [self.hg, self.h], missing=np.nan), columns=list(self.h))
+        df_heat_gen.insert(0, 'Generation Unit', list(self.hg))
+        df_heat_gen = df_heat_gen.sort_values('Generation Unit').reset_index(drop=True)
 
-        df_heat_gen.loc['Local Heat Production', 'Generation Unit'] = 'Dezentral Heat Production'
-        for h in self.h:
-            df_heat_gen.loc['Local Heat Production', h] = sum(self.vLocalHeatProd[n, h].value for n in self.n)
+        df_heat_gen.loc['Local Heat Production'] = ['Dezentral Heat Production'] + _values_array(self.vLocalHeatProd, [self.n, self.h]).sum(axis=0).tolist()
 
      
         # write economic results to a dataframe
+        economic_results = self.calc_economic_results()
         df_economic_results = pd.DataFrame({
-            'Costs in k€': [
-                'Total Costs',
-                'DH Connection Cost',
-                'HNS Cost',
-                'Local Heat Production Cost',
-                'Central Heat Production Cost',
-                'Central Heat Production Investment Cost',
-                'TES Investment Cost',
-                'Pumping Cost',
-                'Pipe Base Investment Cost',
-                'Pipe Slope Investment Cost'
-            ],
-            'Value': [
-                round(value(self.obj)/1e3,1),
-                round(sum(self.pCostDHConnect[n] * self.vDHconnect[n].value for n in self.n if self.vDHconnect[n].value is not None)/1e3,1),
-                round(sum(self.pCostHNS * self.vHNS[n, h].value for n in self.n for h in self.h if self.vHNS[n, h].value is not None)/1e3,1),
-                round(sum(self.pCostLocalHeatProd[n] * self.vLocalHeatProd[n, h].value for n in self.n for h in self.h if self.vLocalHeatProd[n, h].value is not None)/1e3,1),
-                round(sum(self.pCostCentrHeatProd[hg] * self.vCentralHeatProd[hg, h].value for hg in self.hg for h in self.h if   self.vCentralHeatProd[hg, h].value is not None)/1e3,1),
-                round(sum(self.pCostCentralHeatProdInv[hg] * self.vCentralHeatProdInv[hg].value for hg in self.hg if self.vCentralHeatProdInv[hg].value is not None)/1e3,1),
-                round(sum(self.pCostTESInv[tes] * self.vTESCapacitivInv[tes].value for tes in self.tes if self.vTESCapacitivInv[tes].value is not None)/1e3,1),
-                round(sum(self.pCostPumping * self.pPipeLength[n,m] * self.vMF[n, m, h].value for (n, m) in self.pc for h in self.h if self.vMF[n, m, h].value is not None)/1e3,1),
-                round(sum(self.pPipeCostIni * self.pPipeLength[n, m] * self.vBinBuildPipe[n, m].value for (n, m) in self.pc if self.vBinBuildPipe[n, m].value is not None)/1e3,1),
-                round(sum(self.pPipeCostSlope * self.pPipeLength[n, m] * self.vPipeMassFlowInv[n, m].value for (n, m) in self.pc if self.vPipeMassFlowInv[n, m].value is not None)/1e3,1)
-            ]
+            'Costs in k€': list(economic_results.keys()),
+            'Value': [round(v/1e3,1) for v in economic_results.values()]
         })
 
         # write the investment decisions per technology to a dataframe
-        df_investment_decisions = pd.DataFrame(columns=['Generation Unit', 'Type', 'Capacity Investments / kW', 'Storage Investments / m3'])
-        # add if the generation unit is a boiler, waste heat or TES
-        for hg in (self.hg):
-            df_investment_decisions.loc[hg,'Generation Unit'] = hg
-            df_investment_decisions.loc[hg,'Type'] = 'Boiler' if hg in self.hb else 'Waste Heat' if hg in self.wh else 'TES' if hg in self.tes else 'Central Heat'
-            df_investment_decisions.loc[hg,'Capacity Investments / kW'] = self.vCentralHeatProdInv[hg].value
-            df_investment_decisions.loc[hg,'Storage Investments / m3'] = self.vTESCapacitivInv[hg].value if hg in self.tes else 0
+        tes_inv = dict(zip(self.tes, _values_array(self.vTESCapacitivInv, [self.tes], missing=np.nan).tolist()))
+        df_investment_decisions = pd.DataFrame({
+            'Generation Unit': list(self.hg),
+            # add if the generation unit is a boiler, waste heat or TES
+            'Type': ['Boiler' if hg in self.hb else 'Waste Heat' if hg in self.wh else 'TES' if hg in self.tes else 'Central Heat' for hg in self.hg],
+            'Capacity Investments / kW': _values_array(self.vCentralHeatProdInv, [self.hg], missing=np.nan),
+            'Storage Investments / m3': [tes_inv.get(hg, 0) for hg in self.hg]
+        })
 
         output_folder = os.path.join(case_study_name, config['scenario_dir'], model_name, config['expost_dir'])
         if not os.path.exists(output_folder):
@@ -611,6 +1536,43 @@ class HeatNetworkModel(ConcreteModel):
         df_heat_gen.to_csv(os.path.join(output_folder,'Heat_Generation_TS.csv'), sep=';', index=False)
 
         print("Done: export results")
+        print("Time: ", time.time() - start)
+
+
+    def get_variable_arrays(self) -> dict:
+        """Extract the values of all variables of the model into arrays shaped by their index sets, e.g. (pipe candidates,
+        hours) for vMF, in one pass per variable. Variables without value are NaN.
+
+        :return: dictionary with the variable names as keys and tuples (array, list of index sets) as values
+        :rtype: dict
+        """
+
+        arrays = {}
+        for var in self.component_objects(Var):
+            index_sets = self.get_ordered_index_sets(var)
+            arrays[var.name] = (_values_array(var, index_sets, missing=np.nan), index_sets)
+
+        return arrays
+
+
+    def get_ordered_index_sets(self, component) -> list:
+        """Return the index sets of an indexed component as lists in the order of the model. The implicit sets that
+        Pyomo creates for the arrays n, h (and p, d on representative periods) are unordered, their elements are taken
+        in the order of the arrays.
+
+        :param component: indexed Pyomo component
+        :return: list of lists with the elements of the index sets, empty for a scalar component
+        :rtype: list
+        """
+
+        arrays = [self.n, self.h] + ([self.p, self.d] if self.aggregated else [])
+        index_sets = []
+        for index_set in _index_sets(component):
+            if not index_set.isordered():
+                index_set = next((a for a in arrays if len(a) == len(index_set) and all(e in index_set for e in a)), sorted(index_set))
+            index_sets.append(list(index_set))
+
+        return index_sets
 
 
     def export_model_variables(self):
@@ -619,39 +1581,93 @@ class HeatNetworkModel(ConcreteModel):
         on the model's structure, all the data is extracted from the model's components
         """
 
-        # a dictionary of dataframes to store all the variables data, includingg their indices and values.
-        # The keys are the variables' names
+        # the matrix backend maps its solution vector directly to the dataframes
+        if 'matrix_model' in self.data_dict:
+            d_vars = self.data_dict['matrix_model'].solution_to_dataframes(self.data_dict['matrix_solution'])
+            return self.export_unit_layout(self.export_directed_pipe_investments(d_vars))
+
+        # a dictionary of dataframes to store all the variables data, including their indices and values.
+        # The keys are the variables' names. The values of every variable are extracted in one pass into an array
+        # shaped by its index sets, the index columns are expanded from the sets (see get_variable_arrays)
         d_vars = {}
-        # get all the variables from the model
-        variables = self.component_objects(Var)
-        for v in variables:
-            # get the variable's representation inside the model
-            var_object = getattr(self, str(v))
-            # create a dictionary to store the variable's data: its index set and its value
-            aux_d = {}
-            aux_d['value'] = []
+        for name, (values, index_sets) in self.get_variable_arrays().items():
+            d_vars[name] = matrix_model.expand_index_sets(pd.DataFrame({'value': values.ravel()}), index_sets, values.shape)
+
+        # the eliminated variables are back-computed from the arrays of the variables they are defined by, read by key
+        # in the order of the sets of the back-computed arrays
+        if self.eliminated_variables:
+            dT_cw = value((self.pTsupply - self.pTreturn) * self.pCWater)
+            N, G = len(self.n), len(self.hg)
+            central = _values_array(self.vCentralHeatProd, [self.hg, self.h], missing=np.nan)
+            heat_demand = _param_values(self.pHeatDemand, product(self.n, self.h)).reshape(N, len(self.h))
+            consumption = (heat_demand - _values_array(self.vLocalHeatProd, [self.n, self.h], missing=np.nan) - _values_array(self.vHNS, [self.n, self.h], missing=np.nan)) / dT_cw
+
+            # incidence of the heat generation units at the nodes
+            hg_pos = {hg: i for i, hg in enumerate(self.hg)}
+            node_units = np.zeros((N, G))
+            for i, n in enumerate(self.n):
+                for hg in self.node_wh[n] + self.node_hb[n] + self.node_tes[n]:
+                    node_units[i, hg_pos[hg]] += 1.0
+            injection = node_units @ np.nan_to_num(central) / dT_cw
+            tes_discharge = central[[hg_pos[tes] for tes in self.tes]] / dT_cw
+
+            for name, values, index_sets in (('vMFConsumption', consumption, [self.n, self.h]), ('vMFInjection', injection, [self.n, self.h]),
+                                             ('vTESDischarge', tes_discharge, [self.tes, self.h])):
+                d_vars[name] = matrix_model.expand_index_sets(pd.DataFrame({'value': values.ravel()}), index_sets, values.shape)
+
+        return self.export_unit_layout(self.export_directed_pipe_investments(d_vars))
+
+
+    def export_unit_layout(self, d_vars: dict) -> dict:
+        """Pad the dataframes of the storage variables, which are only indexed over the TES units, to all heat
+        generation units with missing values, so that the exports keep one row per heat generation unit.
+
+        :param d_vars: dictionary of dataframes with the exported variables
+        :type d_vars: dict
+        :return: dictionary of dataframes with the storage variables for all heat generation units
+        :rtype: dict
+        """
 
-            # get the indices of the variable
-            idx_elements = list(var_object.index_set())
-            aux_data = v.get_values()
-            aux_data_df = pd.DataFrame({'indices': list(aux_data.keys()), 'value': list(aux_data.values())})
-            # if it is a tuple, the variable has more than one index set
-            if isinstance(idx_elements[0], tuple):
-                # count the number of index sets
-                len_test_elem = len(idx_elements[0])
-                aux_cols_idx = ['index_set_' + str(i+1) for i in range(0, len_test_elem)]
-                aux_data_df[aux_cols_idx] = pd.DataFrame(aux_data_df['indices'].tolist(), index=aux_data_df.index)
-                aux_data_df.drop(columns=['indices'], inplace=True)
+        # second index set of the storage variables
+        layout = {'vTESLevel': self.h, 'vTESCharge': self.h, 'vTESDischarge': self.h, 'vTESCapacitivInv': None}
+        if self.aggregated:
+            layout.update({'vTESLevelInter': self.d, 'vTESLevelIntraMax': self.p, 'vTESLevelIntraMin': self.p})
 
-            # if it is not a tuple, the variable one index set and we can the values directly
+        for name, second_index in layout.items():
+            if name not in d_vars:
+                continue
+            if second_index is None:
+                df_full = pd.DataFrame({'index_set_1': list(self.hg)})
             else:
-                aux_d['index_set_1'] = []
-                aux_cols_idx = ['index_set_1']
-                aux_data_df[aux_cols_idx] = pd.DataFrame(aux_data_df['indices'].tolist(), index=aux_data_df.index)
-                aux_data_df.drop(columns=['indices'], inplace=True)
+                df_full = pd.DataFrame(list(product(self.hg, second_index)), columns=['index_set_1', 'index_set_2'])
+            df_var = d_vars[name]
+            if len(df_var) == 0:
+                # no TES units in the model
+                d_vars[name] = df_full.assign(value=np.nan)[['value'] + list(df_full.columns)]
+            else:
+                d_vars[name] = df_full.merge(df_var, on=list(df_full.columns), how='left')[['value'] + list(df_full.columns)]
+
+        return d_vars
 
-            # store the dataframe in the dictionary with all the other variables
-            d_vars[str(v)] = aux_data_df
+
+    def export_directed_pipe_investments(self, d_vars: dict) -> dict:
+        """Replace the dataframes of the pipe investments of undirected pipes by the directed layout of the pipe
+        candidates, so that the exports (and e.g. visualisation.plot_investment_decisions) do not depend on the
+        pipe formulation. See get_directed_pipe_investments.
+
+        :param d_vars: dictionary of dataframes with the exported variables
+        :type d_vars: dict
+        :return: dictionary of dataframes with the pipe investments per pipe candidate
+        :rtype: dict
+        """
+
+        if not self.undirected_pipes:
+            return d_vars
+
+        for name, values in self.get_directed_pipe_investments().items():
+            d_vars[name] = pd.DataFrame({'value': list(values.values()),
+                                         'index_set_1': [n for (n, m) in values.keys()],
+                                         'index_set_2': [m for (n, m) in values.keys()]})
 
         return d_vars
 
@@ -671,10 +1687,12 @@ class HeatNetworkModel(ConcreteModel):
             aux_d = {}
             aux_d['value'] = []
 
-            # get the indices of the variable
-            idx_elements = list(param_object.index_set())
-            aux_data = p.values()
-            aux_data_df = pd.DataFrame({'indices': idx_elements, 'value': list(aux_data)})
+            # get the indices of the parameter, mutable parameters hold their values as parameter data objects
+            aux_data = p.extract_values()
+            idx_elements = list(aux_data.keys())
+            if len(idx_elements) == 0:
+                continue
+            aux_data_df = pd.DataFrame({'indices': idx_elements, 'value': [value(v) for v in aux_data.values()]})
             # if it is a tuple, the variable has more than one index set
             if isinstance(idx_elements[0], tuple):
                 # count the number of index sets
@@ -691,24 +1709,155 @@ class HeatNetworkModel(ConcreteModel):
                 aux_data_df.drop(columns=['indices'], inplace=True)
 
             # store the dataframe in the dictionary with all the other variables
-            d_params[str(v)] = aux_data_df
+            d_params[str(p)] = aux_data_df
 
         return d_params
     
 
-def run_model(case_study_name: str, model_name: str):
-    """Run the complete workflow to load data, fill the model, run the optimization and export the results.
-    This function is the main entry point for running the model.
-    
+def _index_keys(index_sets: list) -> list:
+    """Return the keys of the product of index sets in row-major order, the elements of sets of tuples (e.g. the pipe
+    candidates) are flattened into the key as in Pyomo.
+
+    :param index_sets: index sets, e.g. [pc, h]
+    :type index_sets: list
+    :return: list of keys
+    :rtype: list
+    """
+
+    if len(index_sets) == 1:
+        return list(index_sets[0])
+    return [sum((e if isinstance(e, tuple) else (e,) for e in combination), ()) for combination in product(*index_sets)]
+
+
+def _values_array(var, index_sets: list, missing: float = 0.0) -> np.ndarray:
+    """Return the values of an indexed variable as array with one axis per index set. The values are read by key in
+    the order of the given index sets, not in the iteration order of the variable: the implicit sets of the arrays n
+    and h are unordered.
+
+    :param var: indexed Pyomo variable
+    :type var: Var
+    :param index_sets: index sets in the order of the axes, e.g. [hg, h]
+    :type index_sets: list
+    :param missing: value of the variables without value, defaults to 0.0
+    :type missing: float, optional
+    :return: array with the values
+    :rtype: np.ndarray
+    """
+
+    shape = tuple(len(index_set) for index_set in index_sets)
+    values = var.extract_values()
+    array = np.fromiter((missing if values.get(k) is None else values[k] for k in _index_keys(index_sets)), dtype=float, count=int(np.prod(shape)))
+    return array.reshape(shape)
+
+
+def _param_values(param, index) -> np.ndarray:
+    """Return the values of an indexed parameter for the given index as array, indices without value are 0.
+
+    :param param: indexed Pyomo parameter
+    :type param: Param
+    :param index: indices in the order of the array
+    :type index: iterable
+    :return: array with the values
+    :rtype: np.ndarray
+    """
+
+    values = param.extract_values()
+    return np.array([values.get(i) or 0.0 for i in index], dtype=float)
+
+
+def _index_sets(component) -> list:
+    """Return the index sets of an indexed component, e.g. [pc, h] for vMF, the sets of a product are not expanded
+    into their dimensions (pc has two).
+
+    :param component: indexed Pyomo component
+    :return: list of sets, empty for a scalar component
+    :rtype: list
+    """
+
+    if not component.is_indexed():
+        return []
+    return list(component.index_set().subsets())
+
+
+def create_persistent_solver(config: dict, threads: int = None):
+    """Create a persistent (appsi) solver interface for the solver defined in the configuration. The model is kept in
+    the solver between solves, changes of mutable parameters and added constraints are pushed incrementally.
+
+    :param config: configuration dictionary
+    :type config: dict
+    :param threads: number of threads of the solver, defaults to 'threads' of the configuration or all cores
+    :type threads: int, optional
+    :return: the solver interface, None if the solver is not recognized
+    :rtype: appsi.base.PersistentSolver
+    """
+
+    solver = config['solver']
+    mip_gap = config['mip_gap']
+    if threads is None:
+        threads = config.get('threads') or os.cpu_count()
+    if solver is None:
+        print("Warning: No solver defined, using default 'appsi_highs'")
+        solver = 'highs'
+
+    if solver == 'gurobi':
+        opt = appsi.solvers.Gurobi()
+        opt.gurobi_options = {'MIPGap': mip_gap, 'Threads': threads}
+    elif solver == 'highs':
+        opt = appsi.solvers.Highs()
+        opt.highs_options = {'mip_rel_gap': mip_gap, 'threads': threads}
+    else:
+        print("Error: Solver not recognized")
+        return None
+
+    opt.config.load_solution = False
+
+    return opt
+
+
+def get_solver_summary(slvr_res) -> tuple:
+    """Return the status and the relative MIP gap of the results of a solve, for the results of SolverFactory, of the
+    persistent (appsi) solvers and of the matrix backend.
+
+    :param slvr_res: results of the solve
+    :return: status as string and relative gap, the gap is None if the solver does not report bounds
+    :rtype: tuple
+    """
+
+    if slvr_res is None:
+        return 'not solved', None
+
+    if isinstance(slvr_res, dict):
+        return str(slvr_res['status']), slvr_res.get('gap')
+
+    if hasattr(slvr_res, 'best_feasible_objective'):
+        upper, lower = slvr_res.best_feasible_objective, slvr_res.best_objective_bound
+        status = slvr_res.termination_condition
+    else:
+        upper, lower = slvr_res.problem.upper_bound, slvr_res.problem.lower_bound
+        status = slvr_res.solver.termination_condition
+
+    gap = None
+    if upper is not None and lower is not None and np.isfinite(upper) and np.isfinite(lower):
+        gap = abs(upper - lower) / max(abs(upper), 1e-10)
+
+    return str(status).split('.')[-1], gap
+
+
+def load_model_input(case_study_name: str, model_name: str, config: dict, logger) -> dict:
+    """Load the input data of the model from disk, check that it is complete and prepare it for fill_model_data.
+
     :param case_study_name: the name of the case study
     :type case_study_name: str
     :param model_name: the name of the model
     :type model_name: str
+    :param config: configuration dictionary
+    :type config: dict
+    :param logger: logger of the model run
+    :type logger: logging.Logger
+    :return: input data for fill_model_data
+    :rtype: dict
     """
 
-    config = load_config()
-    logger = utils.create_logger(case_study_name + "_" + model_name, config['log_dir'])
-    dh_model = HeatNetworkModel(case_study_name, logger)
     input_dict = load_data_from_disk(case_study_name,model_name, config)
 
 
@@ -746,14 +1895,295 @@ def run_model(case_study_name: str, model_name: str):
     for hg in heat_gen_units:
         input_dict['heat_demand']['heat_unit_'+str(hg)] = 0
 
+    return input_dict
+
+
+def create_synthetic_input(num_clusters: int = 10, num_hours: int = 48, seed: int = 0) -> dict:
+    """Create the input data of a small random case study in the format of load_model_input, e.g. to check and
+    benchmark the model build without the data of a case study. The clusters are connected by a random tree with a few
+    additional pipes (meshes), a waste heat unit, a boiler and a TES unit are connected to random clusters.
+
+    :param num_clusters: number of building clusters, defaults to 10
+    :type num_clusters: int, optional
+    :param num_hours: number of hours, defaults to 48
+    :type num_hours: int, optional
+    :param seed: seed of the random data, defaults to 0
+    :type seed: int, optional
+    :return: input data for fill_model_data
+    :rtype: dict
+    """
+
+    rng = np.random.default_rng(seed)
+    clusters = ['cluster_' + str(i) for i in range(num_clusters)]
+    units = ['wh', 'boiler', 'tes']
+    unit_nodes = ['heat_unit_' + u for u in units]
+    # investment costs are scaled to the share of the year
+    year_share = num_hours / 8760
+
+    df_heat_nodes = pd.DataFrame({'node': clusters + unit_nodes,
+                                  'CostsDHconnect': np.append(rng.uniform(2e3, 2e4, num_clusters), np.zeros(len(units))) * year_share,
+                                  'maxDHPower': np.append(rng.uniform(100.0, 400.0, num_clusters), np.zeros(len(units))),
+                                  'LocalHeatProdCost': np.append(rng.uniform(0.08, 0.15, num_clusters), np.zeros(len(units)))})
+
+    # daily profile with noise, zero demand at the nodes of the units
+    hours = np.arange(1, num_hours + 1)
+    daily = 1.0 + 0.5 * np.cos(2 * np.pi * (hours - 7) / 24)
+    df_heat_demand = pd.DataFrame({'hour': hours})
+    for n in clusters:
+        df_heat_demand[n] = rng.uniform(20.0, 150.0) * daily * rng.uniform(0.8, 1.2, num_hours)
+    for n in unit_nodes:
+        df_heat_demand[n] = 0.0
+
+    # random tree between the clusters, some additional pipes and a pipe from every unit to a cluster, both directions
+    edges = [(clusters[i], clusters[rng.integers(i)]) for i in range(1, num_clusters)]
+    for _ in range(num_clusters // 5):
+        n, m = rng.choice(num_clusters, 2, replace=False)
+        if (clusters[n], clusters[m]) not in edges and (clusters[m], clusters[n]) not in edges:
+            edges.append((clusters[n], clusters[m]))
+    edges += [(n, clusters[rng.integers(num_clusters)]) for n in unit_nodes]
+    distance = rng.uniform(20.0, 200.0, len(edges))
+    df_heat_network = pd.DataFrame({'node_from': [n for n, m in edges] + [m for n, m in edges],
+                                    'node_to': [m for n, m in edges] + [n for n, m in edges],
+                                    'distance': np.append(distance, distance)})
+
+    df_heat_gen_units = pd.DataFrame({'source': units, 'heat_unit_id': unit_nodes, 'isTES': [0, 0, 1], 'isBoiler': [0, 1, 0],
+                                      'OMVarCost': [0.01, 0.07, 0.0], 'PowerInvCost': np.array([50.0, 100.0, 20.0]) * year_share,
+                                      'StorageInvCost': [np.nan, np.nan, 5.0 * year_share]})
+
+    # waste heat mass flow in m³/h
+    df_waste_heat_prof = pd.DataFrame({'hour': hours, 'wh': rng.uniform(2.0, 8.0, num_hours)})
+
+    dict_parameter_cost = {'pCostHNS': 100.0, 'pCostPumping': 1e-06, 'pTsupply': 55.0, 'pTreturn': 35.0, 'pPipeCostIni': 32.0 * year_share,
+                           'pMassFlowIni': 0.6, 'pPipeCostsSlope': 0.018 * year_share, 'allow_double_heating': 0.0,
+                           'num_typical_days': 0, 'undirected_pipes': 0}
+
+    return {'heat_demand': df_heat_demand, 'heat_gen_units': df_heat_gen_units, 'heat_network': df_heat_network,
+            'heat_nodes': df_heat_nodes, 'waste_heat_prof': df_waste_heat_prof, 'parameter_cost': dict_parameter_cost}
+
+
+def check_node_indices(input_dict: dict = None, eliminate_equalities: bool = False):
+    """Check that the mass flow rules based on the node indices (see build_node_indices) build the same constraints
+    as the formulation that scans all pipe candidates and unit assignments per node. The constraints of both
+    formulations are built on one model and their standard representations (coefficients of the variables, constant
+    and bounds) are compared row by row. Raises an AssertionError at the first mismatch.
+
+    :param input_dict: input data for fill_model_data, defaults to a synthetic case (see create_synthetic_input)
+    :type input_dict: dict, optional
+    :param eliminate_equalities: check the formulation with substituted equality variables, defaults to False
+    :type eliminate_equalities: bool, optional
+    """
+
+    from pyomo.repn import generate_standard_repn
+
+    start = time.time()
+    if input_dict is None:
+        input_dict = create_synthetic_input()
+
+    dh_model = HeatNetworkModel('check_node_indices')
     dh_model.fill_model_data(input_dict)
     dh_model.initialize_variables()
-    dh_model.initialize_constraints()
-    slvr_res = dh_model.model_run(config)
+    dh_model.initialize_constraints(eliminate_equalities=eliminate_equalities)
+
+    # formulation before the node indices
+    def mf_balance_scan_rule(model, n, h):
+        aux_pc_out = set((i, j) for i, j in model.pc if i == n)
+        aux_pc_inf = set((j, i) for j, i in model.pc if i == n)
+        return (
+            model.vMFConsumption[n, h] +
+            sum(model.vTESCharge[tes, h] for tes in model.tes if (tes, n) in model.hgn) -
+            model.vMFInjection[n, h] ==
+            sum(model.vMF[m, n, h] for m, _ in aux_pc_inf) -
+            sum(model.vMF[n, m, h] for _, m in aux_pc_out)
+        )
+    dh_model.mf_balance_scan = Constraint(dh_model.n, dh_model.h, rule=mf_balance_scan_rule)
+    pairs = [(dh_model.mf_balance, dh_model.mf_balance_scan)]
+
+    if not dh_model.eliminated_variables:
+        def mf_injection_scan_rule(model, n, h):
+            return (
+                model.vMFInjection[n,h] ==
+                sum(model.vCentralHeatProd[wh, h] for wh in model.wh if (wh, n) in model.hgn) / ((model.pTsupply - model.pTreturn) * model.pCWater) +
+                sum(model.vCentralHeatProd[hb, h] for hb in model.hb if (hb, n) in model.hgn) / ((model.pTsupply - model.pTreturn) * model.pCWater) +
+                sum(model.vCentralHeatProd[tes, h] for tes in model.tes if (tes, n) in model.hgn) / ((model.pTsupply - model.pTreturn) * model.pCWater)
+            )
+        dh_model.mf_injection_scan = Constraint(dh_model.n, dh_model.h, rule=mf_injection_scan_rule)
+        pairs.append((dh_model.mf_injection, dh_model.mf_injection_scan))
+
+    def canonical(con):
+        repn = generate_standard_repn(con.body, compute_values=True)
+        coefs = {}
+        for var, coef in zip(repn.linear_vars, repn.linear_coefs):
+            coefs[var.name] = coefs.get(var.name, 0.0) + coef
+        return {k: v for k, v in coefs.items() if v != 0.0}, repn.constant, repn.is_linear(), value(con.lower), value(con.upper)
+
+    num_rows = 0
+    for con, con_scan in pairs:
+        assert len(con) == len(con_scan), f"{con.name}: {len(con)} rows instead of {len(con_scan)}"
+        for idx in con_scan:
+            assert canonical(con[idx]) == canonical(con_scan[idx]), f"{con.name}[{idx}] differs from the formulation without node indices"
+            num_rows += 1
+
+    print(f"Done: check node indices, {num_rows} rows of {', '.join(con.name for con, _ in pairs)} are identical")
+    print("Time: ", time.time() - start)
+
+
+def _solve_benchmark_case(name: str, input_dict: dict, config: dict) -> HeatNetworkModel:
+    # build and solve a case as run_model does, without cache and exports
+    dh_model = HeatNetworkModel(name)
+    dh_model.fill_model_data(input_dict)
+    dh_model.initialize_variables()
+    if config.get('tighten_bounds', True):
+        dh_model.tighten_bounds()
+    start = time.time()
+    dh_model.build_and_solve(config)
+    dh_model.solve_info['run_time'] = time.time() - start
+    return dh_model
+
+
+def _build_peak_memory(name: str, input_dict: dict, config: dict) -> float:
+    # peak memory of the Python allocations (incl. numpy and scipy arrays) during the build of the constraints of a
+    # backend in MB, measured on a separate build as tracemalloc slows down the build
+    dh_model = HeatNetworkModel(name)
+    dh_model.fill_model_data(input_dict)
+    dh_model.initialize_variables()
+    if config.get('tighten_bounds', True):
+        dh_model.tighten_bounds()
+    tracemalloc.start()
+    try:
+        if config['backend'] == 'matrix':
+            matrix_model.build_matrix_model(dh_model)
+        else:
+            dh_model.initialize_constraints(None, config.get('eliminate_equalities', False))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 ** 2
+
+
+def benchmark_backends(input_dict: dict = None, config: dict = None) -> pd.DataFrame:
+    """Measures the build and solve time and the peak memory of the build of the Pyomo and the matrix backend on the
+    same case, e.g. to check the speedup of the matrix backend. The solve time of the Pyomo backend includes passing
+    the model to the solver. The peak memory is traced with tracemalloc on a separate build, it covers the Python
+    allocations but not the memory of the solver.
+
+    :param input_dict: input data for fill_model_data, defaults to a synthetic case with 20 clusters and 168 hours
+        (see create_synthetic_input)
+    :type input_dict: dict, optional
+    :param config: configuration dictionary, defaults to the configuration file
+    :type config: dict, optional
+    :return: a pandas dataframe with the build time, the solve time, the peak memory of the build and the objective
+        value per backend
+    :rtype: pd.DataFrame
+    """
 
-    logger.info("MODEL SOLUTION")
-    logger.info("==============")
-    logger.info(str(slvr_res))
+    if config is None:
+        config = load_config()
+    if input_dict is None:
+        input_dict = create_synthetic_input(20, 168)
+
+    results = []
+    for backend in ['pyomo', 'matrix']:
+        run_config = {**config, 'backend': backend, 'warm_start': False, 'lazy_constraints': {**config.get('lazy_constraints', {}), 'enabled': False}}
+        dh_model = _solve_benchmark_case('benchmark_' + backend, input_dict, run_config)
+        peak_memory = _build_peak_memory('benchmark_memory_' + backend, input_dict, run_config)
+        results.append({'Backend': backend, 'Build time in s': dh_model.solve_info['build_time'],
+                        'Solve time in s': dh_model.solve_info['solve_time'], 'Build peak memory in MB': peak_memory,
+                        'Objective': dh_model.get_objective_value()})
+        print(f"Backend: {backend}, Build time: {results[-1]['Build time in s']:.2f} s, Solve time: {results[-1]['Solve time in s']:.2f} s, Build peak memory: {peak_memory:.1f} MB")
+
+    df_results = pd.DataFrame(results)
+    df_results['Total time in s'] = df_results['Build time in s'] + df_results['Solve time in s']
+
+    return df_results
+
+
+def benchmark_tighten_bounds(input_dict: dict = None, config: dict = None) -> pd.DataFrame:
+    """Measures the root bound and the solve time of a case with and without tighten_bounds, e.g. to check the effect
+    of the tightened big-Ms on the relaxation. The root bound is the bound of the last row of the root node in the
+    solver log (see utils.parse_solver_progress), None if the solver did not branch.
+
+    :param input_dict: input data for fill_model_data, defaults to a synthetic case with 20 clusters and 168 hours
+        (see create_synthetic_input)
+    :type input_dict: dict, optional
+    :param config: configuration dictionary, defaults to the configuration file
+    :type config: dict, optional
+    :return: a pandas dataframe with the root bound, the objective value, the solve time and the explored nodes with
+        and without tightened bounds
+    :rtype: pd.DataFrame
+    """
+
+    if config is None:
+        config = load_config()
+    if input_dict is None:
+        input_dict = create_synthetic_input(20, 168)
+
+    results = []
+    for tighten in [False, True]:
+        run_config = {**config, 'tighten_bounds': tighten, 'warm_start': False, 'lazy_constraints': {**config.get('lazy_constraints', {}), 'enabled': False}}
+        dh_model = _solve_benchmark_case('benchmark_tighten_' + str(tighten).lower(), input_dict, run_config)
+        progress = utils.parse_solver_progress(dh_model.solve_info['log_file'], dh_model.solve_info['solver'])
+        # Gurobi counts the explored nodes (0 at the root), HiGHS the processed nodes (1 after the root)
+        root_nodes = 0 if dh_model.solve_info['solver'] == 'gurobi' else 1
+        root = [p for p in progress if p['nodes'] <= root_nodes]
+        results.append({'Tighten bounds': tighten, 'Root bound': root[-1]['bound'] if root else None,
+                        'Objective': dh_model.get_objective_value(), 'Solve time in s': dh_model.solve_info['solve_time'],
+                        'Nodes': progress[-1]['nodes'] if progress else None})
+        print(f"Tighten bounds: {tighten}, Root bound: {results[-1]['Root bound']}, Solve time: {results[-1]['Solve time in s']:.2f} s")
+
+    df_results = pd.DataFrame(results)
+    df_results['Root gap'] = (df_results['Objective'] - df_results['Root bound']) / df_results['Objective'].abs()
+
+    return df_results
+
+
+def benchmark_lazy_constraints(input_dict: dict = None, config: dict = None) -> pd.DataFrame:
+    """Measures the build and solve time of a case with all hourly capacity constraints and with the lazily built
+    constraints of the cutting plane solve (see run_cutting_plane), both with the Pyomo backend. The solve time of the
+    lazy run includes all iterations and the rows added between them.
+
+    :param input_dict: input data for fill_model_data, defaults to a synthetic case with 20 clusters and 168 hours
+        (see create_synthetic_input)
+    :type input_dict: dict, optional
+    :param config: configuration dictionary, uses the 'lazy_constraints' settings, defaults to the configuration file
+    :type config: dict, optional
+    :return: a pandas dataframe with the build time, the solve time, the built capacity rows and the objective value
+        for the full and the lazy model
+    :rtype: pd.DataFrame
+    """
+
+    if config is None:
+        config = load_config()
+    if input_dict is None:
+        input_dict = create_synthetic_input(20, 168)
+
+    results = []
+    for lazy in [False, True]:
+        run_config = {**config, 'backend': 'pyomo', 'warm_start': False, 'lazy_constraints': {**config['lazy_constraints'], 'enabled': lazy}}
+        dh_model = _solve_benchmark_case('benchmark_lazy_' + str(lazy).lower(), input_dict, run_config)
+        num_rows = len(dh_model.max_mass_flow) + len(dh_model.max_power_invest) + (len(dh_model.tes_storage_invest) if not dh_model.aggregated else 0)
+        results.append({'Lazy constraints': lazy, 'Build time in s': dh_model.solve_info['build_time'],
+                        'Solve time in s': dh_model.solve_info['run_time'] - dh_model.solve_info['build_time'],
+                        'Capacity rows': num_rows, 'Objective': dh_model.get_objective_value()})
+        print(f"Lazy constraints: {lazy}, Build time: {results[-1]['Build time in s']:.2f} s, Solve time: {results[-1]['Solve time in s']:.2f} s, Capacity rows: {num_rows}")
+
+    df_results = pd.DataFrame(results)
+    df_results['Total time in s'] = df_results['Build time in s'] + df_results['Solve time in s']
+
+    return df_results
+
+
+def save_results(dh_model: HeatNetworkModel, case_study_name: str, model_name: str, config: dict):
+    """Export the variables of the solved model to the output folder and the ex-post results to the expost folder.
+
+    :param dh_model: the solved model
+    :type dh_model: HeatNetworkModel
+    :param case_study_name: the name of the case study
+    :type case_study_name: str
+    :param model_name: the name of the model
+    :type model_name: str
+    :param config: configuration dictionary
+    :type config: dict
+    """
 
     res_dict = dh_model.export_model_variables()
     output_folder = os.path.join(case_study_name, config['scenario_dir'], model_name, config['output_dir'])
@@ -766,75 +2196,600 @@ def run_model(case_study_name: str, model_name: str):
 
     dh_model.export_results(case_study_name, model_name, config)
 
-    logging.shutdown()
+
+def run_model(case_study_name: str, model_name: str, config: dict = None, isolated_logger: bool = False, use_cache: bool = True) -> dict:
+    """Run the complete workflow to load data, fill the model, run the optimization and export the results.
+    This function is the main entry point for running the model.
     
+    :param case_study_name: the name of the case study
+    :type case_study_name: str
+    :param model_name: the name of the model
+    :type model_name: str
+    :param config: configuration dictionary, defaults to the configuration file
+    :type config: dict, optional
+    :param isolated_logger: write the log with an own handler instead of the root logger (see utils.create_logger), defaults to False
+    :type isolated_logger: bool, optional
+    :param use_cache: use the cache of models and solutions if it is enabled in the configuration (model_cache), defaults to True
+    :type use_cache: bool, optional
+    :return: dictionary with the solver status, the objective value and the relative MIP gap
+    :rtype: dict
+    """
 
+    if config is None:
+        config = load_config()
+    logger = utils.create_logger(case_study_name + "_" + model_name, config['log_dir'], isolated=isolated_logger)
+    scenario_folder = os.path.join(case_study_name, config['scenario_dir'], model_name)
+
+    # an unchanged scenario solved with the same solver settings is restored from the solution cache
+    input_files = get_model_input_files(case_study_name, model_name, config) if use_cache else None
+    solution_key = None
+    if use_cache and config.get('model_cache', {}).get('cache_solutions', False):
+        # the solution depends on all modules of the run, e.g. the typical days (clustering) and the warm start
+        code_files = cache.get_code_files(sys.modules[__name__])
+        solution_key = cache.get_cache_key(input_files, config, code_files=code_files, config_keys=cache.SOLUTION_CONFIG_KEYS)
+        entry = cache.lookup_solution(solution_key, config)
+        if entry is not None:
+            logger.info("Solution cache hit - {}".format(solution_key))
+            print("Info: Solution found in the cache, the results are restored without solving")
+            summary = cache.restore_solution(entry, scenario_folder, config)
+            if isolated_logger:
+                utils.close_logger(logger)
+            else:
+                logging.shutdown()
+            return summary
+        logger.info("Solution cache miss - {}".format(solution_key))
+
+    # the model name identifies the solver log of the scenario (see utils.solver_log_path), so that scenarios solved
+    # in parallel (run_batch, work_queue) do not write to the same log
+    dh_model = HeatNetworkModel(case_study_name + "_" + model_name, logger)
+    dh_model.profiler.enabled = config.get('profiling', {}).get('enabled', False)
+    dh_model.profiler.cprofile = config.get('profiling', {}).get('cprofile', False)
+    input_dict = load_model_input(case_study_name, model_name, config, logger)
+
+    # optional aggregation of the time series to typical days, 0 optimizes the full time series
+    num_typical_days = int(input_dict['parameter_cost'].get('num_typical_days', 0))
+    aggregation_results = None
+    benders_results = None
+    if config.get('benders', {}).get('enabled', False):
+        dh_model, slvr_res, benders_results = run_benders(dh_model, input_dict, config)
+    elif num_typical_days > 0:
+        dh_model, slvr_res, aggregation_results = run_typical_days(dh_model, input_dict, num_typical_days, config)
+    else:
+        dh_model.fill_model_data(input_dict)
+        dh_model.initialize_variables()
+        if config.get('tighten_bounds', True):
+            dh_model.tighten_bounds()
+        cache_key = None
+        if use_cache and config.get('model_cache', {}).get('enabled', False):
+            cache_key = cache.get_cache_key(input_files, config, code_files=[os.path.abspath(__file__)])
+        slvr_res = dh_model.build_and_solve(config, cache_key)
 
+    logger.info("MODEL SOLUTION")
+    logger.info("==============")
+    logger.info(str(slvr_res))
 
-if __name__ == "__main__":
-    case_study_name = 'Puertollano'
-    model_name = 'realistic_costs'
+    save_results(dh_model, case_study_name, model_name, config)
+    dh_model.export_solve_report(case_study_name, model_name, config)
+
+    if aggregation_results is not None:
+        expost_folder = os.path.join(case_study_name, config['scenario_dir'], model_name, config['expost_dir'])
+        pd.DataFrame([aggregation_results]).to_csv(os.path.join(expost_folder, 'Aggregation_Results.csv'), sep=';', index=False)
+
+    if benders_results is not None:
+        expost_folder = os.path.join(case_study_name, config['scenario_dir'], model_name, config['expost_dir'])
+        benders_results.to_csv(os.path.join(expost_folder, 'Benders_Iterations.csv'), sep=';', index=False)
+
+    status, gap = get_solver_summary(slvr_res)
+    summary = {'Status': status, 'Objective': dh_model.get_objective_value(), 'Gap': gap}
+
+    # only runs with a solution are cached
+    if solution_key is not None and summary['Objective'] is not None:
+        cache.store_solution(solution_key, scenario_folder, summary, config)
+
+    if isolated_logger:
+        utils.close_logger(logger)
+    else:
+        logging.shutdown()
+
+    return summary
+
+
+def _batch_worker(case_study_name: str, model_name: str, config: dict) -> dict:
+    """Run one scenario of run_batch in a worker process. Errors are caught and returned, so that a failed scenario
+    does not abort the batch.
+
+    :param case_study_name: the name of the case study
+    :type case_study_name: str
+    :param model_name: the name of the model
+    :type model_name: str
+    :param config: configuration dictionary with the solver threads of the worker
+    :type config: dict
+    :return: row of the summary table
+    :rtype: dict
+    """
+
+    start = time.time()
+    row = {'Case Study': case_study_name, 'Scenario': model_name, 'Status': None, 'Objective': None, 'Gap': None, 'Error': None}
+    try:
+        row.update(run_model(case_study_name, model_name, config, isolated_logger=True))
+    except Exception:
+        row['Status'] = 'failed'
+        row['Error'] = traceback.format_exc()
+    row['Time in s'] = time.time() - start
+
+    return row
+
+
+def run_batch(scenarios: list, processes: int = None, summary_file: str = None) -> pd.DataFrame:
+    """Run the complete workflow of run_model for several scenarios in parallel worker processes. The solver threads
+    of the thread budget in the configuration ('batch') are split evenly across the workers, every scenario writes its
+    own log file. Failed scenarios are reported in the summary table and do not abort the batch.
+
+    :param scenarios: list of tuples (case study name, model name)
+    :type scenarios: list
+    :param processes: number of worker processes, defaults to 'processes' of the configuration or all cores
+    :type processes: int, optional
+    :param summary_file: path of the summary table, defaults to Batch_Summary.csv in the scenario folder of the first case study
+    :type summary_file: str, optional
+    :return: summary table with status, time, objective value and gap per scenario
+    :rtype: pd.DataFrame
+    """
+
+    scenarios = [tuple(scenario) for scenario in scenarios]
     config = load_config()
-    logger = utils.create_logger(case_study_name + "_" + model_name, config['log_dir'])
-    dh_model = HeatNetworkModel(case_study_name, logger)
-    input_dict = load_data_from_disk(case_study_name,model_name, config)
+    batch_config = config.get('batch', {})
+    thread_budget = batch_config.get('thread_budget') or os.cpu_count()
+    if processes is None:
+        processes = batch_config.get('processes') or os.cpu_count()
+    processes = max(1, min(processes, len(scenarios), thread_budget))
+    config['threads'] = max(1, thread_budget // processes)
+
+    start = time.time()
+    cprint("Start: batch of " + str(len(scenarios)) + " scenarios with " + str(processes) + " processes and "
+           + str(config['threads']) + " solver threads each", 'green')
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(_batch_worker, case_study_name, model_name, config): (case_study_name, model_name)
+                   for case_study_name, model_name in scenarios}
+        for future in as_completed(futures):
+            case_study_name, model_name = futures[future]
+            try:
+                row = future.result()
+            except Exception:
+                # e.g. a worker process that was killed, the other scenarios continue
+                row = {'Case Study': case_study_name, 'Scenario': model_name, 'Status': 'failed', 'Objective': None,
+                       'Gap': None, 'Error': traceback.format_exc(), 'Time in s': None}
+            if row['Status'] == 'failed':
+                cprint("Warning: scenario " + case_study_name + "/" + model_name + " failed", 'yellow')
+            else:
+                print("Done: scenario " + case_study_name + "/" + model_name + " - " + str(row['Status']))
+            rows.append(row)
 
+    order = {scenario: i for i, scenario in enumerate(scenarios)}
+    rows.sort(key=lambda row: order[(row['Case Study'], row['Scenario'])])
+    summary = pd.DataFrame(rows, columns=['Case Study', 'Scenario', 'Status', 'Time in s', 'Objective', 'Gap', 'Error'])
 
-    error = False
-    if input_dict['heat_nodes'] is None:
-        logger.error("Heat nodes data is missing")
-        error = True
-    if input_dict['heat_gen_units'] is None:
-        logger.error("Heat generation units data is missing")
-        error = True
-        assert False, "Heat generation units data is missing"
-    if input_dict['heat_demand'] is None:
-        logger.error("Heat demand data is missing")
-        error = True
-        assert False, "Heat demand data is missing"
-    if input_dict['waste_heat_prof'] is None:
-        logger.warning("Waste heat profile data is missing")
+    if summary_file is None:
+        summary_file = os.path.join(scenarios[0][0], config['scenario_dir'], 'Batch_Summary.csv')
+    summary.to_csv(summary_file, sep=';', index=False)
 
-    if error:
-        assert False, "Missing input data (e.g., heat nodes, heat generation units, heat demand)"
+    print(summary.drop(columns='Error').to_string(index=False))
+    print("Done: batch")
+    print("Time: ", time.time() - start)
 
-    input_dict['heat_nodes'].rename(columns={'cluster_id': 'node'}, inplace=True)
-    input_dict['heat_nodes'].fillna(0, inplace=True)
-    input_dict['heat_gen_units'].rename(columns={'unit': 'source'}, inplace=True)
-    input_dict['heat_gen_units'].rename(columns={'O&M and Fuel Costs': 'OMVarCost'}, inplace=True)
-    input_dict['heat_gen_units'].rename(columns={'Power Investment Costs': 'PowerInvCost'}, inplace=True)
-    input_dict['heat_gen_units'].rename(columns={'Storage Investment Costs': 'StorageInvCost'}, inplace=True)
+    return summary
 
-    if input_dict['waste_heat_prof'] is not None:
-        input_dict['waste_heat_prof'].rename(columns={'unit': 'source'}, inplace=True)
 
-    # Even zero demand is needed to create the balance at each node
-    heat_gen_units = input_dict['heat_gen_units'].source.values
+def run_rolling_dispatch(case_study_name: str, model_name: str, investment_model_name: str = None, heat_demand: pd.DataFrame = None):
+    """Run the operation of a scenario with the investment decisions of a solved model in rolling windows, e.g. for
+    other weather years or demand realizations. The results are exported like in run_model.
 
-    for hg in heat_gen_units:
-        input_dict['heat_demand']['heat_unit_'+str(hg)] = 0
+    :param case_study_name: the name of the case study
+    :type case_study_name: str
+    :param model_name: the name of the model, the results are written to its output and expost folders
+    :type model_name: str
+    :param investment_model_name: the name of the model with the investment decisions in its output folder, defaults to model_name
+    :type investment_model_name: str, optional
+    :param heat_demand: heat demand time series of the nodes (columns hour and one per node) that replaces the heat demand of the scenario
+    :type heat_demand: pd.DataFrame, optional
+    """
 
-    dh_model.fill_model_data(input_dict)
-    dh_model.initialize_variables()
-    dh_model.initialize_constraints()
+    config = load_config()
+    logger = utils.create_logger(case_study_name + "_" + model_name + "_dispatch", config['log_dir'])
+    dh_model = HeatNetworkModel(case_study_name + "_" + model_name + "_dispatch", logger)
+    input_dict = load_model_input(case_study_name, model_name, config, logger)
+
+    if heat_demand is not None:
+        # Even zero demand is needed to create the balance at each node
+        input_dict['heat_demand'] = heat_demand.copy()
+        for hg in input_dict['heat_gen_units'].source.values:
+            if 'heat_unit_'+str(hg) not in input_dict['heat_demand'].columns:
+                input_dict['heat_demand']['heat_unit_'+str(hg)] = 0
 
+    model_output = read_output_from_disk(case_study_name, investment_model_name or model_name, config)
 
-    slvr_res = dh_model.model_run(config)
+    dh_model.fill_model_data(input_dict)
+    dh_model.initialize_variables()
+    investment_decisions = dh_model.read_investment_decisions(model_output)
+    slvr_res = dh_model.run_rolling_horizon(input_dict, investment_decisions, config)
 
     logger.info("MODEL SOLUTION")
     logger.info("==============")
     logger.info(str(slvr_res))
 
-    res_dict = dh_model.export_model_variables()
-    output_folder = os.path.join(case_study_name, config['scenario_dir'], model_name, config['output_dir'])
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    save_results(dh_model, case_study_name, model_name, config)
 
-    for k, v in res_dict.items():
-        v.to_csv(os.path.join(output_folder, k + '.csv'), sep=',', index=False)
-        print("Exported: ", k)
+    logging.shutdown()
 
 
-    dh_model.export_results(case_study_name, model_name, config)
+def run_typical_days(dh_model: HeatNetworkModel, input_dict: dict, num_typical_days: int, config: dict) -> tuple:
+    """Optimize the investments on representative days and rerun the operation of the full time series with the
+    investments fixed. The relative error of the objective on typical days to the objective of the full time
+    series is reported.
+
+    :param dh_model: empty model for the optimization on typical days
+    :type dh_model: HeatNetworkModel
+    :param input_dict: input data from disk (with renamed columns)
+    :type input_dict: dict
+    :param num_typical_days: number of representative days
+    :type num_typical_days: int
+    :param config: configuration dictionary
+    :type config: dict
+    :return: the model of the full time series, the results of its solver and a dictionary with the aggregation results
+    :rtype: tuple
+    """
+
+    logger = dh_model.logger if dh_model.logging else None
+
+    # investment optimization on the representative days
+    input_dict_agg = clustering.aggregate_typical_days(input_dict, num_typical_days)
+    dh_model.fill_model_data(input_dict_agg)
+    dh_model.initialize_variables()
+    if config.get('tighten_bounds', True):
+        dh_model.tighten_bounds()
+    slvr_res = dh_model.build_and_solve(config)
+    if not dh_model.aggregated:
+        # the time series could not be aggregated, the model is already solved on the full time series
+        return dh_model, slvr_res, None
+
+    objective_typical_days = dh_model.get_objective_value()
+    investment_decisions = dh_model.get_investment_decisions()
+
+    if logger is not None:
+        logger.info("Objective on {} typical days - {:.2f}".format(num_typical_days, objective_typical_days))
+
+    # operation of the full time series with fixed investments
+    dispatch_model = HeatNetworkModel(dh_model.name, logger)
+    dispatch_model.fill_model_data(input_dict)
+    dispatch_model.initialize_variables()
+    dispatch_model.fix_investment_decisions(investment_decisions)
+    slvr_res = dispatch_model.build_and_solve(config)
+
+    objective_full = dispatch_model.get_objective_value()
+    relative_error = (objective_typical_days - objective_full) / objective_full
+
+    if logger is not None:
+        logger.info("Objective of the full time series with fixed investments - {:.2f}".format(objective_full))
+        logger.info("Relative error of the typical days objective - {:.4f}".format(relative_error))
+
+    cprint("Info: Relative error of the objective on " + str(num_typical_days) + " typical days: " + str(round(relative_error * 100, 2)) + " %", 'yellow')
+
+    aggregation_results = {
+        'Typical Days': num_typical_days,
+        'Objective Typical Days in k€': round(objective_typical_days/1e3,1),
+        'Objective Full Time Series in k€': round(objective_full/1e3,1),
+        'Relative Error': relative_error
+    }
+
+    return dispatch_model, slvr_res, aggregation_results
+
+
+def run_parameter_sweep(case_study_name: str, model_name: str, sweep_points: list) -> pd.DataFrame:
+    """Build the model of a scenario once and solve it for a list of parameter updates, e.g. a price sweep of
+    pCostHNS, pPipeCostIni, pCostPumping or the costs of a waste heat unit in pCostCentrHeatProd. The cost components
+    per sweep point are written to the expost folder (Parameter_Sweep.csv).
+
+    Example: run_parameter_sweep('Fehring', 'base', [{'pCostHNS': c} for c in range(50, 250, 10)])
+
+    :param case_study_name: the name of the case study
+    :type case_study_name: str
+    :param model_name: the name of the model
+    :type model_name: str
+    :param sweep_points: list of parameter updates, see HeatNetworkModel.update_parameters
+    :type sweep_points: list
+    :return: tidy dataframe with the cost components per sweep point
+    :rtype: pd.DataFrame
+    """
+
+    config = load_config()
+    logger = utils.create_logger(case_study_name + "_" + model_name + "_sweep", config['log_dir'])
+    dh_model = HeatNetworkModel(case_study_name + "_" + model_name + "_sweep", logger)
+    input_dict = load_model_input(case_study_name, model_name, config, logger)
+
+    # the sweep runs on the typical days if the scenario is aggregated
+    num_typical_days = int(input_dict['parameter_cost'].get('num_typical_days', 0))
+    if num_typical_days > 0:
+        input_dict = clustering.aggregate_typical_days(input_dict, num_typical_days)
+
+    dh_model.fill_model_data(input_dict)
+    dh_model.initialize_variables()
+    if config.get('tighten_bounds', True):
+        dh_model.tighten_bounds()
+    dh_model.initialize_constraints()
+
+    df_sweep = dh_model.run_sweep(config, sweep_points)
+
+    if df_sweep is not None:
+        output_folder = os.path.join(case_study_name, config['scenario_dir'], model_name, config['expost_dir'])
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+        df_sweep.to_csv(os.path.join(output_folder, 'Parameter_Sweep.csv'), sep=';', index=False)
 
     logging.shutdown()
+
+    return df_sweep
+
+
+def select_input_hours(input_dict: dict, hours) -> dict:
+    """Select the given hours of the time series of the input data.
+
+    :param input_dict: input data for fill_model_data
+    :type input_dict: dict
+    :param hours: hours to select
+    :type hours: array-like
+    :return: input data with the selected hours
+    :rtype: dict
+    """
+
+    input_dict_hours = dict(input_dict)
+    input_dict_hours['heat_demand'] = input_dict['heat_demand'][input_dict['heat_demand'].hour.astype(int).isin(hours)]
+    if input_dict['waste_heat_prof'] is not None:
+        input_dict_hours['waste_heat_prof'] = input_dict['waste_heat_prof'][input_dict['waste_heat_prof'].hour.astype(int).isin(hours)]
+
+    return input_dict_hours
+
+
+def split_input_into_blocks(input_dict: dict, block_hours: int) -> list:
+    """Split the time series of the input data into consecutive time blocks, e.g. weeks.
+
+    :param input_dict: input data for fill_model_data
+    :type input_dict: dict
+    :param block_hours: number of hours per block, the last block holds the remaining hours
+    :type block_hours: int
+    :return: list with the input data of every block
+    :rtype: list
+    """
+
+    hours = np.sort(input_dict['heat_demand'].hour.values.astype(int))
+
+    return [select_input_hours(input_dict, hours[i:i + block_hours]) for i in range(0, len(hours), block_hours)]
+
+
+def _benders_worker(conn, blocks: list, investment_index: list, config: dict, threads: int, model_name: str = 'benders'):
+    """Worker process of the Benders decomposition. Builds the subproblems of its time blocks once and solves them for
+    every investment decision received through the pipe. Sends back the operational costs and the duals of the copy
+    constraints per block. A None message stops the worker.
+
+    :param conn: end of the pipe to the master process
+    :type conn: multiprocessing.connection.Connection
+    :param blocks: list of (block number, input data of the block)
+    :type blocks: list
+    :param investment_index: indices of the investment decisions, see HeatNetworkModel.get_investment_index
+    :type investment_index: list
+    :param config: configuration dictionary
+    :type config: dict
+    :param threads: number of solver threads of the worker
+    :type threads: int
+    :param model_name: name of the decomposed model, prefix of the names of the subproblems, defaults to 'benders'
+    :type model_name: str, optional
+    """
+
+    try:
+        subproblems = []
+        for b, input_dict_block in blocks:
+            sub = HeatNetworkModel(model_name + '_block_' + str(b))
+            sub.fill_model_data(input_dict_block)
+            sub.initialize_variables()
+            sub.make_benders_subproblem(investment_index)
+            subproblems.append((b, sub, create_persistent_solver(config, threads)))
+        conn.send('ready')
+
+        while True:
+            investments = conn.recv()
+            if investments is None:
+                break
+
+            results = []
+            for b, sub, opt in subproblems:
+                for k in sub.benders_k:
+                    sub.pInvestment[k] = investments[k]
+                res = opt.solve(sub)
+                duals = opt.get_duals([sub.copy_investment[k] for k in sub.benders_k])
+                results.append((b, res.best_feasible_objective, np.array([duals[sub.copy_investment[k]] for k in sub.benders_k])))
+            conn.send(results)
+
+    except Exception:
+        conn.send(traceback.format_exc())
+
+    conn.close()
+
+
+def build_benders_master(dh_model: HeatNetworkModel, num_blocks: int) -> ConcreteModel:
+    """Build the master problem of the Benders decomposition with the investment variables of the filled model, one
+    variable for the operational costs of every time block and an (initially empty) list of optimality cuts.
+
+    :param dh_model: model with filled data (and tightened bounds, see tighten_bounds)
+    :type dh_model: HeatNetworkModel
+    :param num_blocks: number of time blocks
+    :type num_blocks: int
+    :return: the master problem
+    :rtype: ConcreteModel
+    """
+
+    nodes = list(dh_model.n)
+    pipes = list(dh_model.pe)
+    units = list(dh_model.hg)
+    tes = list(dh_model.tes)
+
+    # capacities above the peak demand (or the storage of the annual demand) are never useful, the bounds keep the
+    # master problem bounded in the first iterations
+    heat_demand = dh_model.data_dict['heat_demand']
+    max_power = heat_demand.sum(axis=0).max()
+    max_storage = heat_demand.sum() / value((dh_model.pTsupply - dh_model.pTreturn) * dh_model.pCWater)
+
+    master = ConcreteModel(name=dh_model.name + '_master')
+    master.vCentralHeatProdInv = Var(units, domain=NonNegativeReals, bounds=(0, max_power))
+    master.vTESCapacitivInv = Var(tes, domain=NonNegativeReals, bounds=(0, max_storage))
+    master.vPipeMassFlowInv = Var(pipes, domain=NonNegativeReals, bounds=lambda model, n, m: (0, value(dh_model.pMaxPipeMFInv[n, m])))
+    master.vDHconnect = Var(nodes, domain=Binary)
+    master.vBinBuildPipe = Var(pipes, domain=Binary)
+    master.theta = Var(range(num_blocks), domain=NonNegativeReals)  # operational costs per time block
+
+    master.investment_costs = Expression(expr=
+        sum(value(dh_model.pCostDHConnect[n]) * master.vDHconnect[n] for n in nodes) +
+        sum(value(dh_model.pCostCentralHeatProdInv[hg]) * master.vCentralHeatProdInv[hg] for hg in units) +
+        sum(value(dh_model.pCostTESInv[s]) * master.vTESCapacitivInv[s] for s in tes) +
+        sum(value(dh_model.pPipeCostIni * dh_model.pPipeLength[pc]) * master.vBinBuildPipe[pc] for pc in pipes) +
+        sum(value(dh_model.pPipeCostSlope * dh_model.pPipeLength[pc]) * master.vPipeMassFlowInv[pc] for pc in pipes)
+    )
+    master.obj = Objective(expr=master.investment_costs + sum(master.theta[b] for b in range(num_blocks)), sense=minimize)
+
+    # the big-M of the pipes of the filled model, tightened by tighten_bounds
+    def logic_mass_flow_rule(model, n, m):
+        return model.vPipeMassFlowInv[n, m] <= model.vBinBuildPipe[n, m] * value(dh_model.pMaxPipeMFInv[n, m])
+    master.logic_mass_flow = Constraint(pipes, rule=logic_mass_flow_rule)
+
+    master.cuts = ConstraintList()
+
+    return master
+
+
+def run_benders(dh_model: HeatNetworkModel, input_dict: dict, config: dict) -> tuple:
+    """Solve the model with a Benders decomposition into an investment master problem and operational subproblems
+    per time block, which are solved in parallel worker processes.
+
+    The master problem holds the investment decisions and one variable for the operational costs of every block.
+    In every iteration the subproblems are solved for the investment decisions of the master problem, and one
+    optimality cut per block is added to the master problem. The TES balance is cyclic within every block.
+    After convergence the operation of the full time series is solved with the best investment decisions fixed.
+
+    :param dh_model: empty model for the full time series
+    :type dh_model: HeatNetworkModel
+    :param input_dict: input data from disk (with renamed columns)
+    :type input_dict: dict
+    :param config: configuration dictionary, uses the 'benders' settings
+    :type config: dict
+    :return: the model of the full time series, the results of its solver and a dataframe with the bounds per iteration
+    :rtype: tuple
+    """
+
+    benders_config = config['benders']
+    logger = dh_model.logger if dh_model.logging else None
+
+    dh_model.fill_model_data(input_dict)
+    dh_model.initialize_variables()
+    # the bounds of the full time series are used in the master problem and the final solve, the subproblems of the
+    # blocks keep the default big-Ms (their investment decisions are fixed by the master problem)
+    if config.get('tighten_bounds', True):
+        dh_model.tighten_bounds()
+    investment_index = dh_model.get_investment_index()
+    binary = np.array([name in ('vDHconnect', 'vBinBuildPipe') for name, idx in investment_index])
+
+    blocks = split_input_into_blocks(input_dict, benders_config['block_hours'])
+    num_blocks = len(blocks)
+    processes = min(benders_config['processes'] or os.cpu_count(), num_blocks)
+    threads = max(1, (config.get('threads') or os.cpu_count()) // processes)
+
+    master = build_benders_master(dh_model, num_blocks)
+    master_vars = [master.component(name)[idx] for name, idx in investment_index]
+    opt_master = create_persistent_solver(config)
+    if opt_master is None:
+        return dh_model, None, None
+    opt_master.config.stream_solver = True
+
+    # worker processes with a fixed assignment of the blocks, the subproblems are built once per worker
+    start = time.time()
+    workers = []
+    for w in range(processes):
+        parent_conn, child_conn = mp.Pipe()
+        worker_blocks = [(b, blocks[b]) for b in range(w, num_blocks, processes)]
+        process = mp.Process(target=_benders_worker, args=(child_conn, worker_blocks, investment_index, config, threads, dh_model.name), daemon=True)
+        process.start()
+        workers.append((process, parent_conn))
+
+    for process, conn in workers:
+        msg = conn.recv()
+        assert msg == 'ready', "Benders worker failed to build the subproblems:\n" + str(msg)
+
+    if logger is not None:
+        logger.info("Built {} Benders subproblems in {} processes - {:.2f}".format(num_blocks, processes, time.time() - start))
+
+    print("Done: build Benders subproblems")
+    print("Time: ", time.time() - start)
+
+    iterations = []
+    best_upper_bound = np.inf
+    best_investments = None
+    for it in range(benders_config['max_iterations']):
+        start = time.time()
+
+        res = opt_master.solve(master)
+        res.solution_loader.load_vars()
+        lower_bound = res.best_objective_bound if res.best_objective_bound is not None else res.best_feasible_objective
+        investments = np.array([v.value if v.value is not None else 0.0 for v in master_vars])
+        investments[binary] = np.round(investments[binary])
+
+        for process, conn in workers:
+            conn.send(investments)
+        sub_results = []
+        for process, conn in workers:
+            msg = conn.recv()
+            assert not isinstance(msg, str), "Benders worker failed:\n" + msg
+            sub_results += msg
+
+        upper_bound = value(master.investment_costs) + sum(q for b, q, duals in sub_results)
+        if upper_bound < best_upper_bound:
+            best_upper_bound = upper_bound
+            best_investments = investments
+        gap = (best_upper_bound - lower_bound) / abs(best_upper_bound)
+
+        iterations.append({'Iteration': it + 1, 'Lower Bound': lower_bound, 'Upper Bound': best_upper_bound, 'Gap': gap, 'Time': time.time() - start})
+
+        if logger is not None:
+            logger.info("Benders iteration {}: lower bound {:.2f}, upper bound {:.2f}, gap {:.4f} - {:.2f}".format(it + 1, lower_bound, best_upper_bound, gap, time.time() - start))
+
+        print(f"Done: Benders iteration {it + 1}, lower bound {lower_bound:.2f}, upper bound {best_upper_bound:.2f}, gap {gap:.4f}")
+        print("Time: ", time.time() - start)
+
+        if gap <= benders_config['gap']:
+            break
+
+        # one optimality cut per block: theta_b >= Q_b(x_hat) + duals_b * (x - x_hat)
+        for b, q, duals in sub_results:
+            master.cuts.add(master.theta[b] >= q + sum(duals[k] * (master_vars[k] - investments[k]) for k in np.flatnonzero(duals)))
+
+    for process, conn in workers:
+        conn.send(None)
+        process.join()
+
+    # operation of the full time series with the best investment decisions
+    investment_decisions = {}
+    for (name, idx), val in zip(investment_index, best_investments):
+        investment_decisions.setdefault(name, {})[idx] = val
+    dh_model.fix_investment_decisions(investment_decisions)
+    slvr_res = dh_model.build_and_solve(config)
+
+    return dh_model, slvr_res, pd.DataFrame(iterations)
+    
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the optimisation model of a scenario")
+    parser.add_argument('case_study_name', nargs='?', default='Puertollano', help="name of the case study")
+    parser.add_argument('model_name', nargs='?', default='realistic_costs', help="name of the scenario")
+    parser.add_argument('--no-cache', action='store_true', help="build the model even if it is in the model cache")
+    args = parser.parse_args()
+
+    run_model(args.case_study_name, args.model_name, use_cache=not args.no_cache)
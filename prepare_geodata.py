@@ -620,7 +620,7 @@ def estimate_thermal_properties(gdf_in: gpd.GeoDataFrame, heatinghours=50000.0,
     gdf_in['GeneralisedThermCap'] = gdf_in['projected_ground_area'] * gdf_in['number_of_floors'] * surface_to_area * speHeatStorCap
     gdf_in['MaxDemand'] = gdf_in['GeneralisedThermCond'] * 25 + gdf_in['GeneralisedThermCap'] * 2 #assuming the max heating power to heat at 25 °C temp. diff, and be able to rise temp by 2 °C per hour
 
-def define_setpontTemp(gdf_in: gpd.GeoDataFrame, temp_setpoint = 22.0, std_setpoint = 2.0, temp_setback = 17.0, std_setback = 2.0):
+def define_setpontTemp(gdf_in: gpd.GeoDataFrame, temp_setpoint = 22.0, std_setpoint = 2.0, temp_setback = 17.0, std_setback = 2.0, seed = None):
     """Define the setpoint temperature and the setback temperature for the buildings. 
     
     The values are randomly generated based on a normal distribution around the mean values. If real data is available, this function can be replaced by the real data.
@@ -635,10 +635,13 @@ def define_setpontTemp(gdf_in: gpd.GeoDataFrame, temp_setpoint = 22.0, std_setpo
     :type temp_setback: float, optional
     :param std_setback: standard deviation for the setback temperature, defaults to 2.0
     :type std_setback: float, optional
+    :param seed: seed of the random numbers, the same seed gives the same temperatures, defaults to None (global numpy random state)
+    :type seed: int, optional
     """
 
-    gdf_in['temp_setpoint'] =  random.normal(temp_setpoint, std_setpoint, len(gdf_in))
-    gdf_in['temp_setback'] =  random.normal(temp_setback, std_setback, len(gdf_in))
+    rng = random.default_rng(seed) if seed is not None else random
+    gdf_in['temp_setpoint'] =  rng.normal(temp_setpoint, std_setpoint, len(gdf_in))
+    gdf_in['temp_setback'] =  rng.normal(temp_setback, std_setback, len(gdf_in))
 
 
 def estimate_local_heat_prod_costs(gdf_in: gpd.GeoDataFrame, cost_per_kWh = 0.15):
@@ -705,7 +708,7 @@ def write_buildingdata_to_disk(gdf_in: gpd.GeoDataFrame, casestudy: str, config:
     
    
 
-def generate_complete_geodataset(casstudy_name: str, location) -> gpd.GeoDataFrame: 
+def generate_complete_geodataset(casstudy_name: str, location, seed: int = None) -> gpd.GeoDataFrame: 
     """Run a complete case study for a given location. 
     
     The function generates a new case study folder if the folder does not exist yet. 
@@ -717,6 +720,8 @@ def generate_complete_geodataset(casstudy_name: str, location) -> gpd.GeoDataFra
     :type casstudy_name: str
     :param location: Geographical location of the case study. Can be a polygon (must be polygon) or a place name (string).
     :type location: str or shapely.geometry.polygon.Polygon
+    :param seed: seed of the random setpoint temperatures, defaults to None, which uses random_seed of the config
+    :type seed: int, optional
     :return: A GeoDataFrame containing the building data for the case study with all properites.
     :rtype: gpd.GeoDataFrame
     """
@@ -756,7 +761,7 @@ def generate_complete_geodataset(casstudy_name: str, location) -> gpd.GeoDataFra
     # Estimate the thermal properties
     estimate_thermal_properties(gdf_complete, heatinghours)
     # Define the setpoint temperature
-    define_setpontTemp(gdf_complete)
+    define_setpontTemp(gdf_complete, seed=seed if seed is not None else config.get('random_seed'))
     # Estimate the local heating production costs   
     estimate_local_heat_prod_costs(gdf_complete)
     # Estimate the internal gain factor
@@ -0,0 +1,143 @@
+# this script contains the profiler of the model build: every build stage of the HeatNetworkModel (fill_model_data,
+# initialize_variables, initialize_constraints) runs in a stage of the profiler, which prints and logs its time and,
+# if enabled, records the time, the peak memory and the created Pyomo components per stage
+
+import cProfile
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, the peak memory is not recorded there
+    resource = None
+
+
+def _peak_rss_mb() -> float:
+    # peak resident set size of the process, ru_maxrss is in kB on Linux and in bytes on macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak = peak / 1024
+    return peak / 1024
+
+
+def _component_sizes(model) -> dict:
+    # number of indices per component of the model, scalar components count as one
+    return {c.name: len(c) if c.is_indexed() else 1 for c in model.component_objects(descend_into=True)}
+
+
+class BuildProfiler:
+    """Profiler of the build stages of a model. Disabled, a stage only prints and logs its time as before. Enabled,
+    every stage records its wall time, the increase of the peak memory (peak RSS) and the number of created Pyomo
+    components and indices. With cprofile, every stage runs under cProfile and the statistics of the slowest stage
+    are kept.
+    """
+
+    def __init__(self, logger=None, enabled: bool = False, cprofile: bool = False):
+        """Constructor method for the BuildProfiler class.
+
+        :param logger: logger of the model run, defaults to None (no logging)
+        :type logger: logging.Logger, optional
+        :param enabled: record the profile of the stages, defaults to False
+        :type enabled: bool, optional
+        :param cprofile: run every stage under cProfile and keep the statistics of the slowest stage, defaults to False
+        :type cprofile: bool, optional
+        """
+
+        self.logger = logger
+        self.enabled = enabled
+        self.cprofile = cprofile
+        self.records = []
+        self.slowest_profile = None
+        self.slowest_time = -1.0
+
+    @contextmanager
+    def stage(self, name: str, log_message: str = None, model=None):
+        """Context of a build stage. Prints "Done: <name>" and the time, logs the time with the log message.
+
+        :param name: name of the stage
+        :type name: str
+        :param log_message: message of the log entry, defaults to the name
+        :type log_message: str, optional
+        :param model: Pyomo model to count the created components in, defaults to None
+        :type model: ConcreteModel, optional
+        """
+
+        if not self.enabled:
+            start = time.time()
+            yield
+            self._report(name, log_message, time.time() - start)
+            return
+
+        sizes_before = _component_sizes(model) if model is not None else {}
+        rss_before = _peak_rss_mb()
+        profile = cProfile.Profile() if self.cprofile else None
+
+        start = time.time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+        wall_time = time.time() - start
+
+        rss_after = _peak_rss_mb()
+        sizes_after = _component_sizes(model) if model is not None else {}
+        new_components = [c for c in sizes_after if c not in sizes_before]
+        new_indices = sum(size - sizes_before.get(c, 0) for c, size in sizes_after.items())
+
+        self.records.append({'Stage': name, 'Time in s': wall_time,
+                             'Peak RSS Increase in MB': rss_after - rss_before if rss_before is not None else None,
+                             'Components': len(new_components), 'Indices': new_indices,
+                             'Component Names': ' '.join(new_components)})
+        if profile is not None and wall_time > self.slowest_time:
+            self.slowest_time = wall_time
+            self.slowest_profile = (name, profile)
+
+        self._report(name, log_message, wall_time)
+
+    def _report(self, name: str, log_message: str, wall_time: float):
+        if self.logger is not None:
+            self.logger.info((log_message or name) + " - {:.2f}".format(wall_time))
+
+        print("Done: " + name)
+        print("Time: ", wall_time)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return the profile of the stages as table.
+
+        :return: one row per stage with time, peak memory increase, created components and indices
+        :rtype: pd.DataFrame
+        """
+
+        return pd.DataFrame(self.records, columns=['Stage', 'Time in s', 'Peak RSS Increase in MB', 'Components', 'Indices', 'Component Names'])
+
+    def export(self, folder: str):
+        """Export the profile to Build_Profile.csv and the cProfile statistics of the slowest stage to
+        Build_Profile_Slowest.prof (e.g. for snakeviz or pstats) in the given folder.
+
+        :param folder: output folder
+        :type folder: str
+        """
+
+        if not self.enabled:
+            return
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self.to_dataframe().to_csv(os.path.join(folder, 'Build_Profile.csv'), sep=';', index=False)
+        if self.slowest_profile is not None:
+            name, profile = self.slowest_profile
+            profile.dump_stats(os.path.join(folder, 'Build_Profile_Slowest.prof'))
+            print("Exported: cProfile statistics of the slowest stage (" + name + ")")
+
+        print("Exported: build profile")
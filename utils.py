@@ -5,6 +5,7 @@ from datetime import datetime
 import logging
 import os
 import pathlib
+import re
 import shutil
 import sys
 import time
@@ -27,7 +28,7 @@ def clear_logs(config: dict):
 
 
 
-def create_logger(name:str, logs_folder: str) -> logging.Logger:
+def create_logger(name:str, logs_folder: str, isolated: bool = False) -> logging.Logger:
     """Creates a logger that writes to a file in the specified logs folder. Uses the name parameter and a timestamp
      to create the current the logger and returns it.
 
@@ -35,6 +36,9 @@ def create_logger(name:str, logs_folder: str) -> logging.Logger:
     :type name: str
     :param logs_folder: location of the logs folder where the log file will be created.
     :type logs_folder: str
+    :param isolated: attach an own file handler to the logger instead of configuring the root logger, e.g. for several
+     runs in the same worker process of run_batch, defaults to False
+    :type isolated: bool, optional
     :return: logger object that writes to a file in the specified logs folder.
     :rtype: logging.Logger
     """
@@ -46,6 +50,17 @@ def create_logger(name:str, logs_folder: str) -> logging.Logger:
     log_file = f"{name}_{timestamp}.log"
     log_path = os.path.join(logs_folder, log_file)
 
+    if isolated:
+        # the root logger is configured only once per process, every run gets its own handler instead
+        logger = logging.getLogger(name)
+        close_logger(logger)
+        handler = logging.FileHandler(log_path)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        return logger
+
     # create logger
     logging.basicConfig(filename=log_path, format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO,
                         datefmt='%Y-%m-%d %H:%M:%S')
@@ -54,7 +69,181 @@ def create_logger(name:str, logs_folder: str) -> logging.Logger:
     return logger
 
 
+def close_logger(logger: logging.Logger):
+    """Close and remove the handlers of a logger created with isolated=True.
+
+    :param logger: logger object
+    :type logger: logging.Logger
+    """
+
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+
+
+
+def solver_log_path(name: str, logs_folder: str) -> str:
+    """Returns the path of the solver log file for a model run in the specified logs folder. An existing log file
+    of a previous run is removed, since the solvers append to their log files.
+
+    :param name: name of the model run.
+    :type name: str
+    :param logs_folder: location of the logs folder where the solver log will be written.
+    :type logs_folder: str
+    :return: path of the solver log file.
+    :rtype: str
+    """
+
+    if not os.path.exists(logs_folder):
+        os.makedirs(logs_folder)
+
+    log_path = os.path.join(logs_folder, f"{name}_solver.log")
+    if os.path.exists(log_path):
+        os.remove(log_path)
 
+    return log_path
 
 
 
+def parse_time_to_first_incumbent(log_file: str, solver: str) -> float:
+    """Parses a solver log file and returns the solve time until the first feasible solution (incumbent) was found.
+    A MIP start that is accepted by the solver counts as incumbent at the time it was loaded.
+
+    :param log_file: path of the solver log file.
+    :type log_file: str
+    :param solver: solver that wrote the log, 'gurobi' or 'highs'.
+    :type solver: str
+    :return: time to the first incumbent in seconds, None if the log contains no incumbent.
+    :rtype: float
+    """
+
+    if log_file is None or not os.path.exists(log_file):
+        return None
+
+    if solver == 'gurobi':
+        # user MIP start, heuristic solutions before the branch and bound and rows of the node log marked with H or *
+        incumbent = re.compile(r"^(Loaded user MIP start|Found heuristic solution|[H*]\s*\d+)")
+        line_time = re.compile(r"(\d+(?:\.\d+)?)s\s*$")
+    elif solver == 'highs':
+        # user supplied solutions (accepted MIP start) and rows of the branch and bound log starting with the source of
+        # the new solution
+        incumbent = re.compile(r"^\s*([A-Z]\s+\d+\s+\d+|(?i:.*user-supplied solution)|MIP start solution is feasible)")
+        line_time = re.compile(r"(\d+(?:\.\d+)?)s\s*$")
+    else:
+        return None
+
+    last_time = 0.0
+    with open(log_file) as f:
+        for line in f:
+            match_time = line_time.search(line)
+            if match_time:
+                last_time = float(match_time.group(1))
+            if incumbent.search(line):
+                return last_time
+
+    return None
+
+
+def _log_number(token: str) -> float:
+    # numbers of the solver logs, '-' and 'Large' mark missing values, gaps are given in percent
+    token = token.rstrip('s')
+    if token.endswith('%'):
+        token = token[:-1]
+        scale = 0.01
+    else:
+        scale = 1.0
+    try:
+        number = float(token) * scale
+    except ValueError:
+        return None
+    return number if abs(number) != float('inf') else None
+
+
+def parse_solver_progress(log_file: str, solver: str) -> list:
+    """Parses the branch and bound log of a solver log file and returns the progress of the solve over time.
+
+    :param log_file: path of the solver log file.
+    :type log_file: str
+    :param solver: solver that wrote the log, 'gurobi' or 'highs'.
+    :type solver: str
+    :return: list with one dictionary (time, incumbent, bound, relative gap, explored nodes) per row of the node log.
+    :rtype: list
+    """
+
+    if log_file is None or not os.path.exists(log_file):
+        return []
+
+    if solver == 'gurobi':
+        # [H|*] Expl Unexpl | Obj Depth IntInf | Incumbent BestBd Gap | It/Node Time
+        node_line = re.compile(r"^\s*[H*]?\s*\d+\s+\d+\s.*\s\d+s\s*$")
+        pos = {'incumbent': -5, 'bound': -4, 'gap': -3}
+        min_tokens = 7
+    elif solver == 'highs':
+        # [Src] Proc. InQueue | Leaves Expl. | BestBound BestSol Gap | Cuts InLp Confl. | LpIters Time
+        node_line = re.compile(r"^\s*[A-Za-z]?\s+\d+\s+\d+\s+\d+\s+\d+(?:\.\d+)?%\s.*\s\d+(?:\.\d+)?s\s*$")
+        pos = {'incumbent': -7, 'bound': -8, 'gap': -6}
+        min_tokens = 12
+    else:
+        return []
+
+    progress = []
+    with open(log_file) as f:
+        for line in f:
+            if not node_line.match(line):
+                continue
+            tokens = line.split()
+            if tokens[0] in ('H', '*') or not tokens[0].isdigit():
+                tokens = tokens[1:]
+            if len(tokens) < min_tokens:
+                continue
+            progress.append({'time': _log_number(tokens[-1]),
+                             'incumbent': _log_number(tokens[pos['incumbent']]),
+                             'bound': _log_number(tokens[pos['bound']]),
+                             'gap': _log_number(tokens[pos['gap']]),
+                             'nodes': int(tokens[0])})
+
+    return progress
+
+
+def parse_solver_summary(log_file: str, solver: str) -> dict:
+    """Parses a solver log file and returns the solver version, the size of the model passed to the solver and the
+    reductions of the presolve.
+
+    :param log_file: path of the solver log file.
+    :type log_file: str
+    :param solver: solver that wrote the log, 'gurobi' or 'highs'.
+    :type solver: str
+    :return: dictionary with the version, rows, columns, nonzeros, binaries and the removed rows, columns and nonzeros
+     of the presolve, values that are not in the log are None.
+    :rtype: dict
+    """
+
+    summary = dict.fromkeys(['version', 'rows', 'columns', 'nonzeros', 'binaries', 'presolve_removed_rows',
+                             'presolve_removed_columns', 'presolve_removed_nonzeros'])
+    if log_file is None or not os.path.exists(log_file):
+        return summary
+
+    if solver == 'gurobi':
+        patterns = {('version',): r"Gurobi Optimizer version (\S+)",
+                    ('rows', 'columns', 'nonzeros'): r"Optimize a model with (\d+) rows, (\d+) columns and (\d+) nonzeros",
+                    ('binaries',): r"Variable types: .*\((\d+) binary\)",
+                    ('presolve_removed_rows', 'presolve_removed_columns'): r"Presolve removed (\d+) rows and (\d+) columns"}
+    elif solver == 'highs':
+        patterns = {('version',): r"Running HiGHS (\d[\w.]*)",
+                    ('rows', 'columns', 'nonzeros'): r"(?:MIP|LP)\s+\S*\s*has (\d+) rows; (\d+) cols; (\d+) nonzeros",
+                    ('binaries',): r"has \d+ rows; \d+ cols; \d+ nonzeros; \d+ integer variables \((\d+) binary\)",
+                    ('presolve_removed_rows', 'presolve_removed_columns', 'presolve_removed_nonzeros'):
+                        r"Reductions: rows \d+\(-(\d+)\); columns \d+\(-(\d+)\); elements \d+\(-(\d+)\)"}
+    else:
+        return summary
+
+    with open(log_file) as f:
+        for line in f:
+            for keys, pattern in patterns.items():
+                match = re.search(pattern, line)
+                # the first match is the original model, later matches belong to the presolved model
+                if match and summary[keys[0]] is None:
+                    values = match.groups()
+                    summary.update({k: v if k == 'version' else int(v) for k, v in zip(keys, values)})
+
+    return summary
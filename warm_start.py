@@ -0,0 +1,180 @@
+# this script contains the heuristic warm start of the optimisation model: a feasible initial solution for the network
+# binaries, the capacities and the hourly operation is derived from the candidate tree and a ranking of the heat nodes
+
+import time
+
+import networkx as nx
+import numpy as np
+from pyomo.environ import Var, value
+from termcolor import cprint
+
+
+def set_heuristic_solution(dh_model) -> float:
+    """Derive a feasible solution of a HeatNetworkModel with a greedy heuristic and set it as the values of the model
+    variables, e.g. to pass it as a warm start (MIP start) to the solver.
+
+    The heuristic works on the minimum spanning tree of the pipe candidates (the candidates of
+    clustering.propose_network already form this tree), rooted at the node of the cheapest boiler:
+
+    - the heat nodes are ranked by their demand density, i.e. the annual heat demand per connection and pipe costs
+      on the path to the root, and are connected greedily if the savings against local heat production cover the
+      connection, pipe and capacity costs
+    - waste heat units are added in the order of their costs if the heat they can deliver to the connected demand
+      covers their investment and pipe costs, the boiler at the root covers the remaining demand (greedy sizing of
+      vCentralHeatProdInv)
+    - the mass flows follow from the net demand of the subtrees, the pipe investments from the peak flows
+
+    TES units are not used. Requires fill_model_data and initialize_variables.
+
+    :param dh_model: heat network model with filled data and variables
+    :type dh_model: HeatNetworkModel
+    :return: total costs of the heuristic solution
+    :rtype: float
+    """
+
+    start = time.time()
+    cprint("Start: heuristic warm start")
+
+    nodes = list(dh_model.n)
+    hours = list(dh_model.h)
+    pipes = list(dh_model.pc)
+    node_pos = {n: i for i, n in enumerate(nodes)}
+    wh_pos = {wh: i for i, wh in enumerate(dh_model.wh)}
+
+    dT_cw = value((dh_model.pTsupply - dh_model.pTreturn) * dh_model.pCWater)
+    mass_flow_ini = value(dh_model.pMassFlowIni)
+    pipe_cost_ini = value(dh_model.pPipeCostIni)
+    pipe_length = {pc: value(dh_model.pPipeLength[pc]) for pc in pipes}
+    cost_connect = np.array([value(dh_model.pCostDHConnect[n]) for n in nodes])
+    cost_local = np.array([value(dh_model.pCostLocalHeatProd[n]) for n in nodes])
+    max_dh_power = np.array([value(dh_model.pMaxDHPower[n]) for n in nodes])
+    cost_central = {hg: value(dh_model.pCostCentrHeatProd[hg]) for hg in dh_model.hg}
+    cost_central_inv = {hg: value(dh_model.pCostCentralHeatProdInv[hg]) for hg in dh_model.hg}
+    unit_node = {}
+    for hg, n in dh_model.hgn:
+        unit_node.setdefault(hg, n)
+
+    # heat demand per node and hour, the network can supply it up to the maximum district heating power
+    heat_demand = dh_model.data_dict['heat_demand']
+    network_demand = np.minimum(heat_demand, max_dh_power[:, None])
+
+    # minimum spanning tree of the candidates, rooted at the node of the cheapest boiler
+    graph = nx.Graph()
+    graph.add_nodes_from(nodes)
+    for (n, m), length in pipe_length.items():
+        graph.add_edge(n, m, length=length)
+    tree = nx.minimum_spanning_tree(graph, weight='length')
+
+    boilers = [hb for hb in dh_model.hb if unit_node.get(hb) in node_pos]
+    connected = set()
+    built_edges = set()
+    production = {}
+    parent = {}
+    root = None
+
+    if len(boilers) == 0:
+        cprint("Warning: no boiler for the heuristic warm start, all nodes are supplied locally", 'yellow')
+    else:
+        root_unit = min(boilers, key=lambda hb: cost_central[hb])
+        root = unit_node[root_unit]
+        parent = dict(nx.bfs_predecessors(tree, root))
+
+        def new_edges(n):
+            # edges (parent, child) on the path from the root to the node that are not built yet
+            edges = []
+            while n != root:
+                if (parent[n], n) not in built_edges:
+                    edges.append((parent[n], n))
+                n = parent[n]
+            return edges
+
+        def edges_cost(edges):
+            return sum(pipe_cost_ini * pipe_length.get(e, pipe_length.get(e[::-1], 0)) for e in edges)
+
+        # rank the reachable nodes by their demand density and connect them greedily
+        annual_demand = network_demand.sum(axis=1)
+        peak_demand = network_demand.max(axis=1)
+        candidates = [n for n in parent if annual_demand[node_pos[n]] > 0]
+        density = {n: annual_demand[node_pos[n]] / (cost_connect[node_pos[n]] + edges_cost(new_edges(n)) + 1e-9) for n in candidates}
+
+        for n in sorted(candidates, key=lambda n: -density[n]):
+            i = node_pos[n]
+            edges = new_edges(n)
+            savings = (cost_local[i] - cost_central[root_unit]) * annual_demand[i]
+            costs = cost_connect[i] + edges_cost(edges) + cost_central_inv[root_unit] * peak_demand[i]
+            if savings > costs:
+                connected.add(n)
+                built_edges.update(edges)
+
+        # greedy sizing: waste heat in the order of its costs, the boiler at the root covers the rest
+        connected_pos = [node_pos[n] for n in connected]
+        remaining = network_demand[connected_pos].sum(axis=0) if connected else np.zeros(len(hours))
+        for wh in sorted(wh_pos, key=lambda wh: cost_central[wh]):
+            if unit_node.get(wh) not in parent or not connected:
+                continue
+            available = dh_model.data_dict['waste_heat_prof'][wh_pos[wh]] * dT_cw
+            delivered = np.minimum(available, remaining)
+            edges = new_edges(unit_node[wh])
+            gain = (cost_central[root_unit] - cost_central[wh]) * delivered.sum() - cost_central_inv[wh] * delivered.max() - edges_cost(edges)
+            if gain > 0:
+                production[wh] = delivered
+                remaining = remaining - delivered
+                built_edges.update(edges)
+        production[root_unit] = remaining
+
+    # operation of the nodes: network supply for connected nodes, local production (or non supplied heat) otherwise
+    is_connected = np.array([n in connected for n in nodes])
+    consumption = np.where(is_connected[:, None], network_demand, 0.0) / dT_cw
+    if value(dh_model.pAllowDoubleHeating) == 0:
+        local = np.where(is_connected[:, None], 0.0, np.minimum(heat_demand, max_dh_power[:, None]))
+    else:
+        local = np.where(is_connected[:, None], heat_demand - network_demand, heat_demand)
+    hns = heat_demand - local - consumption * dT_cw
+
+    injection = np.zeros_like(heat_demand)
+    for hg, prod in production.items():
+        injection[node_pos[unit_node[hg]]] += prod / dT_cw
+
+    # mass flows on the tree: the flow into a subtree is its net consumption, negative values flow back
+    net = {n: consumption[node_pos[n]] - injection[node_pos[n]] for n in nodes}
+    if root is not None:
+        for n in reversed(list(nx.bfs_tree(tree, root))):
+            if n in parent:
+                net[parent[n]] = net[parent[n]] + net[n]
+
+    flows = {pc: np.zeros(len(hours)) for pc in pipes}
+    for n, p in parent.items():
+        if (p, n) in flows:
+            flows[(p, n)] = np.maximum(net[n], 0.0)
+        if (n, p) in flows:
+            flows[(n, p)] = np.maximum(-net[n], 0.0)
+    # both directions of an undirected pipe share one investment
+    peak_flow = {edge: max(flows[pc].max() for pc in dh_model.edge_pc[edge]) for edge in dh_model.pe}
+
+    # set the values of the variables
+    dh_model.vDHconnect.set_values({n: float(n in connected) for n in nodes})
+    dh_model.vBinBuildPipe.set_values({edge: float(peak_flow[edge] > 1e-9) for edge in dh_model.pe})
+    dh_model.vPipeMassFlowInv.set_values({edge: max(peak_flow[edge] - mass_flow_ini, 0.0) if peak_flow[edge] > 1e-9 else 0.0 for edge in dh_model.pe})
+    dh_model.vMF.set_values({(n, m, h): f for (n, m) in pipes for h, f in zip(hours, flows[(n, m)].tolist())})
+
+    for var, values in ((dh_model.vMFConsumption, consumption), (dh_model.vMFInjection, injection),
+                        (dh_model.vLocalHeatProd, local), (dh_model.vHNS, hns)):
+        # the eliminated variables are expressions of the other variables (see eliminate_equality_variables)
+        if var.ctype is Var:
+            var.set_values({(n, h): v for n in nodes for h, v in zip(hours, values[node_pos[n]].tolist())})
+
+    dh_model.vCentralHeatProd.set_values({(hg, h): v for hg in dh_model.hg for h, v in zip(hours, production.get(hg, np.zeros(len(hours))).tolist())})
+    dh_model.vCentralHeatProdInv.set_values({hg: float(production[hg].max()) if hg in production else 0.0 for hg in dh_model.hg})
+
+    for var in (dh_model.vTESLevel, dh_model.vTESCharge, dh_model.vTESDischarge, dh_model.vTESCapacitivInv):
+        if var.ctype is Var:
+            var.set_values(dict.fromkeys(var.keys(), 0.0))
+    for name in ('vTESLevelInter', 'vTESLevelIntraMax', 'vTESLevelIntraMin'):
+        if dh_model.component(name) is not None:
+            dh_model.component(name).set_values(dict.fromkeys(dh_model.component(name).keys(), 0.0))
+
+    total_costs = sum(v for k, v in dh_model.calc_economic_results().items() if k != 'Total Costs')
+
+    cprint("Done: heuristic warm start with " + str(len(connected)) + " connected nodes and total costs of " + str(round(total_costs / 1e3, 1)) + " k€ (" + str(round(time.time() - start, 2)) + " s)", 'green')
+
+    return total_costs
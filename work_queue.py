@@ -0,0 +1,356 @@
+# this script contains a work queue on a shared file system (e.g. an NFS mount) to run the clustering and the
+# optimisation of the scenarios of a case study on several machines without a scheduler. The jobs are json files in
+# the scenario folder of the case study, the workers claim them with lock files and write heartbeats and results back.
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+import pandas as pd
+from termcolor import cprint
+
+import clustering
+import data
+import model
+
+
+TASKS = ['clustering', 'model']
+
+
+def get_queue_folder(case_study_name: str, config: dict) -> str:
+    """Return the folder of the work queue of a case study and create it if it does not exist.
+
+    :param case_study_name: name of the case study
+    :type case_study_name: str
+    :param config: configuration dictionary
+    :type config: dict
+    :return: path of the queue folder
+    :rtype: str
+    """
+
+    queue_folder = os.path.join(case_study_name, config['scenario_dir'], config['work_queue']['queue_dir'])
+    if not os.path.exists(queue_folder):
+        os.makedirs(queue_folder)
+
+    return queue_folder
+
+
+def _write_json(path: str, content: dict):
+    # write to a temporary file and rename it, so that other hosts never read a partially written file
+    tmp_path = path + '.' + uuid.uuid4().hex + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(content, file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def submit_jobs(case_study_name: str, scenario_names: list, task: str = 'model') -> list:
+    """Write one job per scenario to the job manifest of the case study. Jobs that already exist are not submitted again.
+
+    :param case_study_name: name of the case study
+    :type case_study_name: str
+    :param scenario_names: names of the scenarios
+    :type scenario_names: list
+    :param task: 'clustering' (clustering.perform_complete_clustering) or 'model' (model.run_model), defaults to 'model'
+    :type task: str, optional
+    :return: ids of the submitted jobs
+    :rtype: list
+    """
+
+    if task not in TASKS:
+        print("Error: Task not recognized")
+        return None
+
+    config = data.load_config()
+    queue_folder = get_queue_folder(case_study_name, config)
+
+    job_ids = []
+    for scenario_name in scenario_names:
+        job_id = task + '_' + scenario_name
+        job_path = os.path.join(queue_folder, job_id + '.job.json')
+        if os.path.exists(job_path):
+            cprint("Warning: job " + job_id + " already exists", 'yellow')
+            continue
+        _write_json(job_path, {'job_id': job_id, 'task': task, 'case_study_name': case_study_name,
+                               'scenario_name': scenario_name, 'submitted': time.time()})
+        job_ids.append(job_id)
+
+    print("Done: submitted " + str(len(job_ids)) + " jobs to " + queue_folder)
+
+    return job_ids
+
+
+def _fs_now(queue_folder: str, worker_id: str) -> float:
+    # current time of the file system: the modification time of a file touched by this worker. The heartbeats are
+    # compared with it instead of the local clock, so the clock skew between the hosts and the NFS server does not
+    # matter (os.utime without times sets the time of the server).
+    probe_path = os.path.join(queue_folder, '.clock.' + worker_id)
+    with open(probe_path, 'a'):
+        pass
+    os.utime(probe_path)
+    return os.path.getmtime(probe_path)
+
+
+def _lock_owner(lock_path: str) -> tuple:
+    # claim token and modification time (heartbeat) of a lock file, None if it does not exist
+    try:
+        return _read_json(lock_path) or {}, os.path.getmtime(lock_path)
+    except FileNotFoundError:
+        return None
+
+
+def claim_job(queue_folder: str, job_id: str, worker_id: str, stale_timeout: float) -> bool:
+    """Try to claim a job by creating its lock file. The creation with O_CREAT | O_EXCL is atomic, also on NFS (v3 and
+    later), so only one worker gets the job. A lock whose heartbeat is older than stale_timeout belongs to a crashed
+    worker, it is renamed (atomic as well) and the job is claimed again. If another worker reclaimed the job between
+    the check and the rename, the renamed lock is a fresh one: it is linked back and the job is left to that worker.
+    The heartbeat age is measured with the clock of the file system (see _fs_now), only the time between touching the
+    probe file and reading the lock is taken from different clocks.
+
+    :param queue_folder: path of the queue folder
+    :type queue_folder: str
+    :param job_id: id of the job
+    :type job_id: str
+    :param worker_id: id of the worker
+    :type worker_id: str
+    :param stale_timeout: age of the last heartbeat in seconds after which a lock is stale
+    :type stale_timeout: float
+    :return: True if the job was claimed
+    :rtype: bool
+    """
+
+    lock_path = os.path.join(queue_folder, job_id + '.lock')
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        owner = _lock_owner(lock_path)
+        if owner is None:
+            return False
+        heartbeat_age = _fs_now(queue_folder, worker_id) - owner[1]
+        if heartbeat_age < stale_timeout:
+            return False
+
+        stale_path = lock_path + '.stale.' + worker_id + '_' + uuid.uuid4().hex
+        try:
+            os.rename(lock_path, stale_path)
+        except FileNotFoundError:
+            # another worker reclaimed the job first
+            return False
+
+        # the renamed lock must still be the stale lock that was checked, otherwise another worker reclaimed the job
+        # in between and its fresh lock was renamed: put it back and leave the job to that worker
+        renamed = _lock_owner(stale_path)
+        if renamed is None or renamed[0].get('token') != owner[0].get('token') or renamed[1] != owner[1]:
+            try:
+                os.link(stale_path, lock_path)
+                os.remove(stale_path)
+            except FileExistsError:
+                cprint("Warning: lock of job " + job_id + " was replaced while restoring it, kept as " + stale_path, 'yellow')
+            return False
+
+        cprint("Warning: reclaimed job " + job_id + " after " + str(round(heartbeat_age)) + " s without heartbeat", 'yellow')
+        return claim_job(queue_folder, job_id, worker_id, stale_timeout)
+
+    with os.fdopen(fd, 'w') as file:
+        # the token identifies this claim, also if the same worker claims the job again
+        json.dump({'worker': worker_id, 'token': uuid.uuid4().hex, 'claimed': time.time()}, file)
+
+    return True
+
+
+def _heartbeat(lock_path: str, interval: float, stop: threading.Event):
+    # touch the lock file, its modification time is the heartbeat of the job
+    while not stop.wait(interval):
+        try:
+            os.utime(lock_path)
+        except FileNotFoundError:
+            return
+
+
+def run_job(job: dict, config: dict):
+    """Run the task of a job.
+
+    :param job: job from the manifest
+    :type job: dict
+    :param config: configuration dictionary
+    :type config: dict
+    :return: summary of model.run_model, None for the clustering
+    :rtype: dict
+    """
+
+    if job['task'] == 'clustering':
+        clustering.perform_complete_clustering(job['case_study_name'], job['scenario_name'])
+        return None
+
+    return model.run_model(job['case_study_name'], job['scenario_name'], config, isolated_logger=True)
+
+
+def run_worker(case_study_name: str, max_jobs: int = None, wait: bool = True) -> int:
+    """Claim and run the jobs of the case study until no open job is left. While a job runs, a heartbeat is written
+    to its lock file, the result (status, host, run time, summary or error) is written to its result file. Failed
+    jobs get a result as well and are not run again.
+
+    :param case_study_name: name of the case study
+    :type case_study_name: str
+    :param max_jobs: maximum number of jobs of this worker, defaults to no limit
+    :type max_jobs: int, optional
+    :param wait: wait for the jobs claimed by other workers to reclaim them if they become stale, defaults to True
+    :type wait: bool, optional
+    :return: number of jobs run by this worker
+    :rtype: int
+    """
+
+    config = data.load_config()
+    queue_config = config['work_queue']
+    if queue_config.get('threads') is not None:
+        config['threads'] = queue_config['threads']
+    queue_folder = get_queue_folder(case_study_name, config)
+    worker_id = socket.gethostname() + '_' + str(os.getpid())
+
+    cprint("Start: worker " + worker_id + " on " + queue_folder, 'green')
+
+    num_jobs = 0
+    while max_jobs is None or num_jobs < max_jobs:
+        open_jobs = []
+        for file_name in sorted(os.listdir(queue_folder)):
+            if file_name.endswith('.job.json'):
+                job_id = file_name[:-len('.job.json')]
+                if not os.path.exists(os.path.join(queue_folder, job_id + '.result.json')):
+                    open_jobs.append(job_id)
+
+        if len(open_jobs) == 0:
+            break
+
+        job_id = next((j for j in open_jobs if claim_job(queue_folder, j, worker_id, queue_config['stale_timeout'])), None)
+        if job_id is None:
+            if not wait:
+                break
+            # all open jobs are running on other workers
+            time.sleep(queue_config['poll_interval'])
+            continue
+
+        job = _read_json(os.path.join(queue_folder, job_id + '.job.json'))
+        lock_path = os.path.join(queue_folder, job_id + '.lock')
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(lock_path, queue_config['heartbeat_interval'], stop), daemon=True)
+        heartbeat.start()
+
+        print("Start: job " + job_id)
+        start = time.time()
+        result = {'job_id': job_id, 'worker': worker_id, 'status': 'done', 'summary': None, 'error': None}
+        try:
+            result['summary'] = run_job(job, config)
+        except Exception:
+            result['status'] = 'failed'
+            result['error'] = traceback.format_exc()
+            cprint("Warning: job " + job_id + " failed", 'yellow')
+        except BaseException:
+            # interrupted (e.g. Ctrl-C): release the lock, so the job is open again for the other workers
+            stop.set()
+            heartbeat.join()
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            cprint("Warning: job " + job_id + " interrupted, released its lock", 'yellow')
+            raise
+        result['time'] = time.time() - start
+
+        stop.set()
+        heartbeat.join()
+        _write_json(os.path.join(queue_folder, job_id + '.result.json'), result)
+        num_jobs += 1
+
+        print("Done: job " + job_id)
+        print("Time: ", result['time'])
+
+    print("Done: worker " + worker_id + " ran " + str(num_jobs) + " jobs")
+
+    return num_jobs
+
+
+def run_local_workers(case_study_name: str, num_workers: int, max_jobs: int = None) -> pd.DataFrame:
+    """Run several workers as processes on this machine, e.g. to test the queue or to use a single large machine.
+
+    :param case_study_name: name of the case study
+    :type case_study_name: str
+    :param num_workers: number of worker processes
+    :type num_workers: int
+    :param max_jobs: maximum number of jobs per worker, defaults to no limit
+    :type max_jobs: int, optional
+    :return: status of the jobs (see get_queue_status)
+    :rtype: pd.DataFrame
+    """
+
+    workers = [mp.Process(target=run_worker, args=(case_study_name, max_jobs)) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return get_queue_status(case_study_name)
+
+
+def get_queue_status(case_study_name: str) -> pd.DataFrame:
+    """Return the status of all jobs of the case study: open, running (with the age of the last heartbeat), done or failed.
+
+    :param case_study_name: name of the case study
+    :type case_study_name: str
+    :return: table of the jobs
+    :rtype: pd.DataFrame
+    """
+
+    config = data.load_config()
+    queue_folder = get_queue_folder(case_study_name, config)
+
+    rows = []
+    for file_name in sorted(os.listdir(queue_folder)):
+        if not file_name.endswith('.job.json'):
+            continue
+        job = _read_json(os.path.join(queue_folder, file_name))
+        if job is None:
+            continue
+        row = {'Job': job['job_id'], 'Task': job['task'], 'Scenario': job['scenario_name'], 'Status': 'open',
+               'Worker': None, 'Heartbeat Age in s': None, 'Time in s': None}
+
+        result = _read_json(os.path.join(queue_folder, job['job_id'] + '.result.json'))
+        lock_path = os.path.join(queue_folder, job['job_id'] + '.lock')
+        if result is not None:
+            row.update({'Status': result['status'], 'Worker': result['worker'], 'Time in s': result['time']})
+        elif os.path.exists(lock_path):
+            lock = _read_json(lock_path) or {}
+            try:
+                heartbeat_age = _fs_now(queue_folder, 'status_' + socket.gethostname()) - os.path.getmtime(lock_path)
+            except FileNotFoundError:
+                heartbeat_age = None
+            stale = heartbeat_age is not None and heartbeat_age > config['work_queue']['stale_timeout']
+            row.update({'Status': 'stale' if stale else 'running', 'Worker': lock.get('worker'), 'Heartbeat Age in s': heartbeat_age})
+        rows.append(row)
+
+    return pd.DataFrame(rows, columns=['Job', 'Task', 'Scenario', 'Status', 'Worker', 'Heartbeat Age in s', 'Time in s'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the workers of the work queue of a case study")
+    parser.add_argument('case_study_name', help="name of the case study")
+    parser.add_argument('--workers', type=int, default=1, help="number of worker processes on this machine")
+    parser.add_argument('--max-jobs', type=int, default=None, help="maximum number of jobs per worker")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        print(run_local_workers(args.case_study_name, args.workers, args.max_jobs).to_string(index=False))
+    else:
+        run_worker(args.case_study_name, max_jobs=args.max_jobs)